@@ -0,0 +1,245 @@
+"""
+Замеры разбора pdf, озвучки и перелистывания страниц.
+Замер и запись базовой линии:
+`python -m benchmarks.bench run --out baseline.json`
+Сравнение с базовой линией, код возврата 1 при замедлении больше порога:
+`python -m benchmarks.bench compare baseline.json --threshold 0.2`
+Большие книги собираются из страниц tests/test.pdf.
+"""
+
+import sys
+import json
+import random
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import median
+from typing import Callable
+import PyPDF2
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+from benchmarks.stubs import StubSpeaker
+from core.cache import DOCUMENTS
+from core.engine import Worker
+from core.index import drop_index, file_hash, index_path
+from core.speakers import PDFSpeaker
+
+
+log = logging.getLogger(__name__)
+
+TEST_FILE: Path = Path(__file__).resolve().parent.with_name("tests") / "test.pdf"
+# Размеры собираемых больших книг в страницах.
+LARGE_PAGES: tuple[int, ...] = (200, 1000)
+# Сколько раз повторяем каждый замер.
+REPEAT: int = 5
+# Допустимое замедление относительно базовой линии, доля.
+THRESHOLD: float = 0.2
+# Разница меньше этой считается шумом таймера, секунды.
+MIN_DELTA: float = 0.001
+
+
+def make_book(pages: int, file_name: Path, source: Path = TEST_FILE) -> Path:
+    """Собираем книгу из pages страниц повторяя страницы source."""
+
+    reader = PyPDF2.PdfReader(source)
+    writer = PyPDF2.PdfWriter()
+    for num in range(pages):
+        writer.add_page(reader.pages[num % len(reader.pages)])
+    with open(file_name, "wb") as f:
+        writer.write(f)
+    return file_name
+
+
+def make_text_book(
+    pages: int, file_name: Path, seed: int = 0, chars: int = 1500
+) -> Path:
+    """
+    Собираем книгу из pages страниц случайного текста примерно по chars символов.
+    Разные seed дают разный текст, поэтому озвучка книг не делится через кеш.
+    """
+
+    rnd = random.Random(seed)
+    words = [
+        "".join(
+            rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(2, 9))
+        )
+        for _ in range(500)
+    ]
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    resources = DictionaryObject(
+        {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+    )
+    writer = PyPDF2.PdfWriter()
+    for _ in range(pages):
+        lines: list[str] = []
+        size = 0
+        while size < chars:
+            line = " ".join(rnd.choices(words, k=12)) + "."
+            lines.append(f"({line}) Tj 0 -14 Td")
+            size += len(line)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 10 Tf 40 800 Td {' '.join(lines)} ET".encode())
+        page = PyPDF2.PageObject.create_blank_page(width=595, height=842)
+        page[NameObject("/Contents")] = content
+        page[NameObject("/Resources")] = resources
+        writer.add_page(page)
+    with open(file_name, "wb") as f:
+        writer.write(f)
+    return file_name
+
+
+def drop_caches(file_name: Path) -> None:
+    """Забываем разобранный файл и его индекс, следующий замер холодный."""
+
+    digest = file_hash(file_name)
+    drop_index(digest)
+    index_path(file_name, digest).unlink(missing_ok=True)
+    DOCUMENTS.clear()
+
+
+def timeit(
+    func: Callable[[], object], setup: Callable[[], object], repeat: int
+) -> dict:
+    """Время func в секундах, setup выполняется перед каждым повтором."""
+
+    runs: list[float] = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return {
+        "median_s": round(median(runs), 6),
+        "min_s": round(min(runs), 6),
+        "runs": repeat,
+    }
+
+
+def bench_book(name: str, file_name: Path, repeat: int) -> dict[str, dict]:
+    """Замеры одной книги."""
+
+    reader = PDFSpeaker(str(file_name), StubSpeaker)
+    pages = len(reader)
+    nothing: Callable[[], None] = lambda: None
+    cold: Callable[[], None] = lambda: drop_caches(file_name)
+
+    def iterate() -> None:
+        worker = Worker(PDFSpeaker(str(file_name), StubSpeaker))
+        for _ in range(pages):
+            next(worker)
+
+    results = {
+        "len_cold": timeit(lambda: len(reader), cold, repeat),
+        "len_warm": timeit(lambda: len(reader), nothing, repeat),
+        "extract_text_cold": timeit(
+            lambda: list(reader.extract_text_from_file()), cold, repeat
+        ),
+        "extract_text_warm": timeit(
+            lambda: list(reader.extract_text_from_file()), nothing, repeat
+        ),
+        "getitem": timeit(lambda: reader[pages // 2], nothing, repeat),
+        "worker_iter": timeit(iterate, nothing, repeat),
+    }
+    results["worker_iter"]["per_page_s"] = round(
+        results["worker_iter"]["median_s"] / pages, 6
+    )
+    return {f"{name}.{key}": value for key, value in results.items()}
+
+
+def run(repeat: int = REPEAT, large_pages: tuple[int, ...] = LARGE_PAGES) -> dict:
+    """Все замеры, вернёт базовую линию."""
+
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        books: dict[str, Path] = {"test_pdf": Path(shutil.copy(TEST_FILE, tmp))}
+        for pages in large_pages:
+            books[f"large_{pages}"] = make_book(pages, Path(tmp, f"large_{pages}.pdf"))
+        results: dict[str, dict] = {}
+        for name, file_name in books.items():
+            log.info("Замеряем %s", name)
+            results.update(bench_book(name, file_name, repeat))
+            drop_caches(file_name)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    threshold: float = THRESHOLD,
+    min_delta: float = MIN_DELTA,
+) -> list[str]:
+    """
+    Замеры медленнее базовой линии больше чем на threshold,
+    быстрые замеры отличающиеся меньше min_delta секунд не считаются.
+    """
+
+    regressions: list[str] = []
+    for name, old in baseline["results"].items():
+        new = current["results"].get(name)
+        if new is None or not old["median_s"]:
+            continue
+        change = new["median_s"] / old["median_s"] - 1
+        line = (
+            f"{name}: {old['median_s']:.6f}s -> {new['median_s']:.6f}s ({change:+.1%})"
+        )
+        print(line)
+        if change > threshold and new["median_s"] - old["median_s"] > min_delta:
+            regressions.append(line)
+    return regressions
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="замерить и записать результат")
+    run_parser.add_argument("--out", default="baseline.json")
+    compare_parser = commands.add_parser("compare", help="сравнить с базовой линией")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    compare_parser.add_argument("--min-delta", type=float, default=MIN_DELTA)
+    compare_parser.add_argument("--out", help="куда записать новый результат")
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--repeat", type=int, default=REPEAT)
+        sub.add_argument(
+            "--large", type=int, nargs="*", default=list(LARGE_PAGES), metavar="PAGES"
+        )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    current = run(args.repeat, tuple(args.large))
+    if args.out:
+        Path(args.out).write_text(json.dumps(current, indent=2))
+    if args.command == "run":
+        print(json.dumps(current["results"], indent=2))
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text())
+    regressions = compare(baseline, current, args.threshold, args.min_delta)
+    for line in regressions:
+        print(f"Замедление: {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,166 @@
+"""
+Размер озвучки и время отправки в разных форматах.
+`python -m benchmarks.formats --speaker gTTS --bitrates 16k 24k 32k --out formats.json`
+Одна и та же страница озвучивается в mp3 как есть и в Opus с каждым битрейтом.
+Отчёт: байт на минуту звука, время синтеза с кодированием и время отправки
+при скорости канала --uplink-mbps. С --chat озвучка ещё и реально
+отправляется в этот чат ботом speaker_bot и замеряется время ответа Telegram.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import median
+from core.chunks import audio_seconds
+from core.formats import FFMPEG, MP3, AudioFormat, is_voice, opus
+from core.settings import SPEAKERS
+from core.voices import SynthesisJob
+
+
+log = logging.getLogger(__name__)
+
+BITRATES: tuple[str, ...] = ("16k", "24k", "32k")
+# Скорость канала бота до Telegram, Мбит/с.
+UPLINK_MBPS: float = 10.0
+REPEAT: int = 3
+# Длина озвучиваемого текста, примерно одна страница.
+TEXT_CHARS: int = 1500
+
+
+def page_text(chars: int = TEXT_CHARS, seed: int = 0) -> str:
+    """Текст страницы из случайных русских слов."""
+
+    rnd = random.Random(seed)
+    letters = "абвгдеёжзийклмнопрстуфхцчшщыэюя"
+    words = [
+        "".join(rnd.choice(letters) for _ in range(rnd.randint(2, 9)))
+        for _ in range(300)
+    ]
+    text = ""
+    while len(text) < chars:
+        text += " ".join(rnd.choices(words, k=10)).capitalize() + ". "
+    return text.strip()
+
+
+def formats(bitrates: tuple[str, ...] = BITRATES) -> list[AudioFormat]:
+    """mp3 как есть и Opus с каждым битрейтом, если есть ffmpeg."""
+
+    if FFMPEG is None:
+        log.warning("Нет ffmpeg, замеряем только mp3.")
+        return [MP3]
+    return [MP3, *map(opus, bitrates)]
+
+
+def send_seconds(bot, chat: str, file_name: str) -> float:
+    """Время отправки файла в чат до ответа Telegram."""
+
+    send = bot.send_voice if is_voice(file_name) else bot.send_audio
+    start = time.perf_counter()
+    with open(file_name, "rb") as f:
+        send(chat, f)
+    return time.perf_counter() - start
+
+
+def bench_format(
+    speaker: type,
+    text: str,
+    fmt: AudioFormat,
+    tmp: Path,
+    repeat: int,
+    uplink_mbps: float,
+    bot=None,
+    chat: str | None = None,
+) -> dict:
+    """Замер одного формата."""
+
+    file_name = str(Path(tmp, f"page-{fmt.name}-{fmt.bitrate or 'native'}{fmt.suffix}"))
+    job = SynthesisJob(speaker, text, file_name, encoding=fmt if fmt.encoded else None)
+    runs: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        job()
+        runs.append(time.perf_counter() - start)
+    size = os.path.getsize(file_name)
+    seconds = audio_seconds(file_name)
+    synthesis = median(runs)
+    upload = size * 8 / (uplink_mbps * 1_000_000)
+    result = {
+        "bytes": size,
+        "audio_s": round(seconds, 3),
+        "bytes_per_audio_min": round(size / seconds * 60) if seconds else None,
+        "synthesis_s": round(synthesis, 4),
+        "upload_s": round(upload, 4),
+        "end_to_end_s": round(synthesis + upload, 4),
+    }
+    if bot is not None and chat:
+        sent = median(send_seconds(bot, chat, file_name) for _ in range(repeat))
+        result["telegram_send_s"] = round(sent, 4)
+        result["telegram_end_to_end_s"] = round(synthesis + sent, 4)
+    return result
+
+
+def run(
+    speaker_name: str = "gTTS",
+    bitrates: tuple[str, ...] = BITRATES,
+    repeat: int = REPEAT,
+    uplink_mbps: float = UPLINK_MBPS,
+    chars: int = TEXT_CHARS,
+    chat: str | None = None,
+) -> dict[str, dict]:
+    """Все форматы, ключ - 'формат-битрейт'."""
+
+    speaker: type = SPEAKERS[speaker_name]
+    bot = None
+    if chat:
+        import telebot
+
+        bot = telebot.TeleBot(os.environ["speaker_bot"])
+    text = page_text(chars)
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        return {
+            f"{fmt.name}-{fmt.bitrate or 'native'}": bench_format(
+                speaker, text, fmt, tmp, repeat, uplink_mbps, bot, chat
+            )
+            for fmt in formats(bitrates)
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--speaker", default="gTTS", choices=list(SPEAKERS))
+    parser.add_argument("--bitrates", nargs="*", default=list(BITRATES))
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--uplink-mbps", type=float, default=UPLINK_MBPS)
+    parser.add_argument("--chars", type=int, default=TEXT_CHARS)
+    parser.add_argument("--chat", help="куда реально отправить озвучку")
+    parser.add_argument("--out", help="куда записать результат в JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> dict[str, dict]:
+    args = parse_args(argv)
+    results = run(
+        args.speaker,
+        tuple(args.bitrates),
+        args.repeat,
+        args.uplink_mbps,
+        args.chars,
+        args.chat,
+    )
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:]), indent=2))
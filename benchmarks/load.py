@@ -0,0 +1,168 @@
+"""
+Нагрузочный замер: много пользователей листают книги с паузами на чтение.
+`python -m benchmarks.load --users 2000 --pages 5 --think 5 --out load.json`
+Озвучивает синтетический генератор голоса с задержкой --latency на вызов
+и --char-latency на символ, поэтому замер не зависит от движков синтеза и сети.
+Отчёт: задержка перелистывания p50/p95/p99, пропускная способность и память.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from statistics import quantiles
+from typing import Any, Callable
+from benchmarks.bench import make_text_book
+from core.engine import Engine, Worker
+from core.speakers import PDFSpeaker
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+log = logging.getLogger(__name__)
+
+SPEAKER: str = "synthetic"
+
+
+def max_rss_mb() -> dict[str, float | None]:
+    """Пиковая память бота и процессов пула озвучки, МБ."""
+
+    if resource is None:
+        return {"max_rss_mb": None, "children_max_rss_mb": None}
+    # На Linux ru_maxrss в килобайтах, на macOS в байтах.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1
+        ),
+        "children_max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1
+        ),
+    }
+
+
+def percentiles(latency: list[float]) -> dict[str, float]:
+    cuts = quantiles(latency, n=100) if len(latency) > 1 else latency * 99
+    if not cuts:
+        return {"p50_s": 0.0, "p95_s": 0.0, "p99_s": 0.0, "max_s": 0.0}
+    return {
+        "p50_s": round(cuts[49], 4),
+        "p95_s": round(cuts[94], 4),
+        "p99_s": round(cuts[98], 4),
+        "max_s": round(max(latency), 4),
+    }
+
+
+async def simulate(engine: Engine, args: argparse.Namespace) -> dict[str, Any]:
+    """Пользователи приходят за время ramp и листают pages страниц с паузами."""
+
+    rnd = random.Random(args.seed)
+    executor = ThreadPoolExecutor(args.threads, thread_name_prefix="load")
+    loop = asyncio.get_running_loop()
+
+    async def run(func: Callable, *a) -> Any:
+        return await loop.run_in_executor(executor, partial(func, *a))
+
+    names = [f"load_{num}" for num in range(args.users)]
+    books = [
+        make_text_book(args.book_pages, Path(engine.temp_path, f"book_{n}.pdf"), n)
+        for n in range(args.books)
+    ]
+    for num, name in enumerate(names):
+        upload = engine.upload_filename(name, PDFSpeaker)
+        shutil.copy(books[num % len(books)], upload)
+        await run(engine.index_document, name)
+    log.info("Загружено %s книг для %s пользователей", len(books), len(names))
+
+    latency: list[float] = []
+    errors: list[str] = []
+
+    def turn(name: str) -> float:
+        start = time.perf_counter()
+        parts = engine.get_worker(name).stream()
+        next(parts, None)
+        first = time.perf_counter() - start
+        list(parts)
+        return first
+
+    async def user(name: str) -> None:
+        await asyncio.sleep(rnd.uniform(0, args.ramp))
+        try:
+            await run(engine.set_worker, name, SPEAKER)
+            for _ in range(args.pages):
+                await asyncio.sleep(rnd.expovariate(1 / args.think))
+                latency.append(await run(turn, name))
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*map(user, names))
+    wall = time.perf_counter() - start
+    executor.shutdown()
+    return {
+        "users": args.users,
+        "books": args.books,
+        "pages": len(latency),
+        "errors": dict(Counter(errors)),
+        "wall_s": round(wall, 3),
+        "throughput_pages_s": round(len(latency) / wall, 3) if wall else 0.0,
+        **percentiles(latency),
+        "sessions": engine.generators.stats(),
+        "scheduler": engine.scheduler.stats(),
+        "pages_ready": dict(Worker.totals),
+    }
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=5, help="страниц на пользователя")
+    parser.add_argument("--think", type=float, default=5.0, help="средняя пауза, с")
+    parser.add_argument("--ramp", type=float, default=10.0, help="время прихода, с")
+    parser.add_argument("--books", type=int, default=20, help="разных книг")
+    parser.add_argument("--book-pages", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--char-latency", type=float, default=0.0001)
+    parser.add_argument("--workers", type=int, help="процессов озвучки")
+    parser.add_argument("--threads", type=int, default=256, help="потоков бота")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="куда записать отчёт в JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> dict[str, Any]:
+    args = parse_args(argv)
+    # Процессы пула озвучки читают задержку из окружения.
+    os.environ["speaker_synthetic_latency"] = str(args.latency)
+    os.environ["speaker_synthetic_char_latency"] = str(args.char_latency)
+    tmp = Path(tempfile.mkdtemp())
+    engine = Engine(temp_path=tmp)
+    if args.workers:
+        engine.scheduler.max_workers = args.workers
+    try:
+        result = asyncio.run(simulate(engine, args))
+    finally:
+        engine.scheduler.shutdown()
+        shutil.rmtree(tmp, ignore_errors=True)
+    # Память процессов пула видна только после их завершения.
+    result.update(max_rss_mb(), workers=engine.scheduler.max_workers)
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:]), indent=2))
@@ -0,0 +1,152 @@
+"""
+Память нескольких процессов бота которые обслуживают одну большую книгу.
+`python -m benchmarks.shared --processes 8 --size-mb 200 --out shared.json`
+Каждый процесс открывает книгу через DocumentCache и извлекает текст всех
+страниц, затем все процессы одновременно снимают память из
+/proc/self/smaps_rollup. Замер идёт дважды: с mmap и с чтением файла
+в память процесса, как было раньше. Только для Linux.
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+from statistics import mean
+import PyPDF2
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+from benchmarks.bench import make_text_book
+from core.cache import DocumentCache
+
+
+log = logging.getLogger(__name__)
+
+PROCESSES: int = 8
+SIZE_MB: int = 200
+PAGES: int = 20
+SMAPS: Path = Path("/proc/self/smaps_rollup")
+
+
+def make_large_book(size_mb: int, file_name: Path, pages: int = PAGES) -> Path:
+    """
+    Книга из pages страниц текста и ресурса-картинки на size_mb мегабайт,
+    как в сканах и книгах с иллюстрациями: текст лежит малой частью файла.
+    """
+
+    text = make_text_book(pages, file_name.with_suffix(".text.pdf"))
+    reader = PyPDF2.PdfReader(text)
+    writer = PyPDF2.PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    image = DecodedStreamObject()
+    image.set_data(os.urandom(size_mb * 1024 * 1024))
+    image.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+        }
+    )
+    first = writer.pages[0]
+    resources = first[NameObject("/Resources")].get_object()
+    resources[NameObject("/XObject")] = DictionaryObject(
+        {NameObject("/Pad"): writer._add_object(image)}
+    )
+    with open(file_name, "wb") as f:
+        writer.write(f)
+    text.unlink()
+    return file_name
+
+
+def memory_mb() -> dict[str, float]:
+    """Память процесса: rss, pss, private и shared, МБ."""
+
+    fields: dict[str, float] = {}
+    for line in SMAPS.read_text().splitlines()[1:]:
+        name, value = line.split(":", 1)
+        fields[name] = int(value.split()[0]) / 1024
+    return {
+        "rss_mb": round(fields.get("Rss", 0.0), 1),
+        "pss_mb": round(fields.get("Pss", 0.0), 1),
+        "private_mb": round(
+            fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1
+        ),
+        "shared_mb": round(
+            fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0), 1
+        ),
+    }
+
+
+def serve(file_name: str, use_mmap: bool, barrier, results) -> None:
+    """Процесс бота: разбираем книгу, извлекаем текст и ждём остальных."""
+
+    cache = DocumentCache(use_mmap=use_mmap)
+    with cache.open(file_name, PyPDF2.PdfReader) as reader:
+        pages = sum(1 for page in reader.pages if page.extract_text() is not None)
+        barrier.wait()
+        results.put({"pages": pages, **memory_mb()})
+        barrier.wait()
+
+
+def measure(file_name: Path, processes: int, use_mmap: bool) -> dict:
+    """Память processes процессов открывших одну книгу."""
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [
+        context.Process(target=serve, args=(str(file_name), use_mmap, barrier, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    found = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return {
+        "processes": processes,
+        "total_rss_mb": round(sum(r["rss_mb"] for r in found), 1),
+        "total_pss_mb": round(sum(r["pss_mb"] for r in found), 1),
+        "mean_private_mb": round(mean(r["private_mb"] for r in found), 1),
+        "mean_shared_mb": round(mean(r["shared_mb"] for r in found), 1),
+    }
+
+
+def run(processes: int = PROCESSES, size_mb: int = SIZE_MB) -> dict:
+    """Замер с mmap и с копией файла в памяти процесса."""
+
+    if not SMAPS.exists():
+        raise RuntimeError("Нужен Linux с /proc/self/smaps_rollup.")
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        book = make_large_book(size_mb, Path(tmp, "large.pdf"))
+        return {
+            "size_mb": round(book.stat().st_size / 1024 / 1024, 1),
+            "mmap": measure(book, processes, use_mmap=True),
+            "copy": measure(book, processes, use_mmap=False),
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--processes", type=int, default=PROCESSES)
+    parser.add_argument("--size-mb", type=int, default=SIZE_MB)
+    parser.add_argument("--out", help="куда записать результат в JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> dict:
+    args = parse_args(argv)
+    result = run(args.processes, args.size_mb)
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:]), indent=2))
@@ -0,0 +1,100 @@
+"""
+Замер холодного запуска: время импорта и пиковая память нового процесса.
+`python -m benchmarks.startup --repeat 5 --out startup.json`
+Каждый замер - отдельный интерпретатор: bot - модули бота, worker - процесс
+пула озвучки с прогревом генератора по умолчанию. Варианты с суффиксом
+'_eager' дополнительно импортируют все движки, как было до ленивой загрузки.
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+from statistics import median
+from core.settings import DEFAULT_SPEAKER
+
+
+ROOT: Path = Path(__file__).resolve().parent.parent
+REPEAT: int = 5
+# Все движки которые раньше импортировались при запуске.
+EAGER: str = "import pyttsx3, gtts, PyPDF2"
+
+_PROBE: str = """
+import json, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+try:
+    import resource
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+except ImportError:  # Windows
+    rss = None
+print(json.dumps({{"import_s": elapsed, "max_rss_mb": rss}}))
+"""
+
+
+def targets(speaker: str = DEFAULT_SPEAKER) -> dict[str, str]:
+    """Что импортирует каждый замер."""
+
+    bot = "import core.engine"
+    worker = (
+        "from core.settings import SPEAKERS\n"
+        "from core.voices import warm_speakers\n"
+        f"warm_speakers((SPEAKERS[{speaker!r}],))"
+    )
+    return {
+        "bot": bot,
+        "bot_eager": f"{EAGER}\n{bot}",
+        "worker": worker,
+        "worker_eager": f"{EAGER}\n{worker}",
+    }
+
+
+def probe(code: str) -> dict:
+    """Запускаем код в новом интерпретаторе, вернёт время и память."""
+
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(code=code)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(repeat: int = REPEAT, speaker: str = DEFAULT_SPEAKER) -> dict[str, dict]:
+    """Медианы замеров по каждой цели."""
+
+    results: dict[str, dict] = {}
+    for name, code in targets(speaker).items():
+        runs = [probe(code) for _ in range(repeat)]
+        rss = [run["max_rss_mb"] for run in runs if run["max_rss_mb"] is not None]
+        results[name] = {
+            "import_s": round(median(run["import_s"] for run in runs), 4),
+            "max_rss_mb": round(median(rss), 1) if rss else None,
+            "runs": repeat,
+        }
+    return results
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--speaker", default=DEFAULT_SPEAKER)
+    parser.add_argument("--out", help="куда записать результат в JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> dict[str, dict]:
+    args = parse_args(argv)
+    results = run(args.repeat, args.speaker)
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:]), indent=2))
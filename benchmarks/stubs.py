@@ -0,0 +1,27 @@
+"""
+Генератор голоса для замеров: пишет тишину длиной по тексту,
+поэтому время не зависит ни от движка синтеза, ни от сети.
+"""
+
+import wave
+
+
+# Частота тишины и сколько кадров приходится на символ текста.
+RATE: int = 8000
+FRAMES_PER_CHAR: int = 40
+
+
+class StubSpeaker:
+    """Пишет wav с тишиной, 5 мс на символ."""
+
+    def __init__(self, rate: int = RATE) -> None:
+        self.rate: int = rate
+
+    @property
+    def params(self) -> dict:
+        return {"rate": self.rate}
+
+    def save_to_file(self, text: str, file_name: str) -> None:
+        with wave.open(file_name, "wb") as f:
+            f.setparams((1, 2, self.rate, 0, "NONE", "not compressed"))
+            f.writeframes(b"\0\0" * FRAMES_PER_CHAR * len(text))
@@ -0,0 +1,175 @@
+"""
+Пакетная озвучка PDF книг без Telegram.
+`python cli.py books/ "more/**/*.pdf" --out audio --workers 4 --summary summary.json`
+Страницы пишутся в 'out/<имя книги>-<хеш>/<номер страницы>.mp3' (.ogg при
+speaker_audio_format=opus), уже озвученные пропускаются,
+поэтому прерванную озвучку можно просто запустить заново.
+Индексы книг лежат в 'out/.index', каталоги с книгами не меняются.
+"""
+
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from dataclasses import replace
+from concurrent.futures import Future
+from pathlib import Path
+from core import index
+from core.chunks import audio_seconds
+from core.engine import Engine
+from core.engine_types import Speaker, TextTeam
+from core.formats import AUDIO_FORMAT
+from core.index import file_hash
+from core.scheduler import SCHEDULER_WORKERS, Priority, Scheduler
+from core.voices import warm_speakers
+
+
+log = logging.getLogger(__name__)
+
+# Расширение файлов страниц.
+PAGE_SUFFIX: str = AUDIO_FORMAT.suffix
+# Сколько страниц на озвучиваемого процесса держать в очереди,
+# остальные ставятся по мере готовности, а не всем каталогом сразу.
+PENDING_PER_WORKER: int = 4
+
+
+def find_books(inputs: list[str], reader: TextTeam) -> list[Path]:
+    """Файлы книг: каталоги обходятся целиком, остальное - пути и шаблоны."""
+
+    books: dict[Path, None] = {}
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            found = sorted(path.rglob(f"*{reader.type}"))
+        else:
+            found = sorted(map(Path, glob.glob(item, recursive=True)))
+        for book in found:
+            if book.is_file() and book.suffix == reader.type:
+                books[book.resolve()] = None
+    return list(books)
+
+
+def book_key(book: Path) -> str:
+    """
+    Каталог озвучки книги: имя и начало хеша содержимого, книги
+    с одинаковым именем из разных каталогов не смешиваются.
+    """
+
+    return f"{book.stem}-{file_hash(book)[:12]}"
+
+
+def page_path(out: Path, book: Path, num_el: int) -> Path:
+    """Файл озвучки страницы книги."""
+
+    return Path(out, book_key(book), f"{num_el:05d}{PAGE_SUFFIX}")
+
+
+def convert(
+    books: list[Path],
+    out: Path,
+    speaker: Speaker,
+    reader: TextTeam,
+    scheduler: Scheduler,
+) -> dict:
+    """
+    Озвучиваем страницы книг на пуле планировщика,
+    в очереди не больше PENDING_PER_WORKER страниц на процесс.
+    Вернёт сводку: сколько страниц озвучено, пропущено и скорость.
+    """
+
+    result: dict = {
+        "books": len(books),
+        "pages": 0,
+        "converted": 0,
+        "skipped": 0,
+        "empty": 0,
+        "failed": 0,
+    }
+    futures: deque[Future] = deque()
+    limit: int = max(1, scheduler.max_workers * PENDING_PER_WORKER)
+    audio: float = 0.0
+    start = time.perf_counter()
+
+    def collect(future: Future) -> None:
+        nonlocal audio
+        try:
+            audio += audio_seconds(future.result())
+            result["converted"] += 1
+        except Exception as e:
+            log.info("Страница не озвучена: %s", e)
+            result["failed"] += 1
+
+    for book in books:
+        try:
+            text_reader: TextTeam = reader(str(book), speaker)
+            pages = len(text_reader)
+        except Exception as e:
+            log.exception(
+                "Книга не читается: %s", book, exc_info=False, extra={"Exception": e}
+            )
+            result["failed"] += 1
+            continue
+        log.info("Книга %s: %s страниц", book.name, pages)
+        key: str = book_key(book)
+        Path(out, key).mkdir(parents=True, exist_ok=True)
+        result["pages"] += pages
+        for num_el in range(pages):
+            target = page_path(out, book, num_el)
+            if target.is_file():
+                result["skipped"] += 1
+            elif text_reader.index.is_empty(num_el):
+                result["empty"] += 1
+            else:
+                if len(futures) >= limit:
+                    collect(futures.popleft())
+                job = text_reader.synthesis_job(text_reader.page_text(num_el))
+                futures.append(
+                    scheduler.submit(
+                        key, Priority.BATCH, replace(job, file_name=str(target))
+                    )
+                )
+    while futures:
+        collect(futures.popleft())
+    wall = time.perf_counter() - start
+    result["wall_s"] = round(wall, 3)
+    result["pages_per_s"] = round(result["converted"] / wall, 3) if wall else 0.0
+    result["audio_s"] = round(audio, 3)
+    result["audio_per_wall_s"] = round(audio / wall, 3) if wall else 0.0
+    return result
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("inputs", nargs="+", help="каталоги, файлы или шаблоны PDF")
+    parser.add_argument("--out", default="audio", help="куда писать озвучку")
+    parser.add_argument("--speaker", default="pyttsx3", choices=list(Engine.speakers))
+    parser.add_argument("--reader", default="pdf", choices=list(Engine.readers))
+    parser.add_argument("--workers", type=int, default=SCHEDULER_WORKERS)
+    parser.add_argument("--summary", help="куда записать сводку в JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> dict:
+    args = parse_args(argv)
+    speaker: Speaker = Engine.speakers[args.speaker]
+    reader: TextTeam = Engine.readers[args.reader]
+    books = find_books(args.inputs, reader)
+    index.INDEX_DIR = Path(args.out, ".index")
+    scheduler = Scheduler(
+        max_workers=args.workers, initializer=warm_speakers, initargs=((speaker,),)
+    )
+    try:
+        result = convert(books, Path(args.out), speaker, reader, scheduler)
+    finally:
+        scheduler.shutdown()
+    result.update(speaker=args.speaker, workers=args.workers)
+    if args.summary:
+        Path(args.summary).write_text(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:]), indent=2))
@@ -0,0 +1,202 @@
+"""
+Кеш озвученных страниц общий для всех пользователей.
+Ключ - хеш текста и настроек генератора голоса, поэтому у каждой страницы
+и каждого варианта озвучки свой файл. Файлы лежат в temp_path,
+при превышении квоты удаляются давно не нужные, старые убирает Janitor.
+"""
+
+import os
+import time
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from core.engine_types import Speaker
+from core.formats import AUDIO_FORMAT, AudioFormat
+from core.voices import AudioData, speaker_type
+
+
+log = logging.getLogger(__name__)
+
+# Квота кеша аудио на диске в байтах.
+AUDIO_CACHE_BYTES: int = 2 * 1024 * 1024 * 1024
+# Через сколько секунд недописанный временный файл считается брошенным.
+TEMP_MAX_AGE: float = 60 * 60
+
+
+def audio_key(text: str, speaker: Speaker, encoding: str = "") -> str:
+    """
+    Хеш текста, класса генератора голоса и его настроек,
+    encoding - метка формата перекодирования, AudioFormat.tag.
+    """
+
+    params: dict = getattr(speaker, "params", {})
+    extra: list[str] = [encoding] if encoding else []
+    raw = json.dumps(
+        [text, speaker_type(speaker).__name__, params, *extra],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class AudioCache:
+    """
+    Озвученные страницы по ключу audio_key.
+    root: Path - директория с файлами,
+    max_bytes: int - квота на диске,
+    format: AudioFormat - формат файлов озвучки,
+    hits, misses, evictions: int - счётчики работы кеша.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        max_bytes: int = AUDIO_CACHE_BYTES,
+        format: AudioFormat = AUDIO_FORMAT,
+    ) -> None:
+        self.root: Path = root
+        self.max_bytes: int = max_bytes
+        self.format: AudioFormat = format
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.__size: int = 0
+        self.__files: OrderedDict[str, int] | None = None
+        self.__lock = threading.Lock()
+        self.__writer: ThreadPoolExecutor | None = None
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__entries)
+
+    def __contains__(self, key: str) -> bool:
+        with self.__lock:
+            return key in self.__entries
+
+    @property
+    def size(self) -> int:
+        """Сколько байт занято на диске."""
+        return self.__size
+
+    @property
+    def __entries(self) -> OrderedDict[str, int]:
+        """Файлы кеша от старых к новым, при первом обращении читаем диск."""
+
+        if self.__files is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            suffix: str = self.format.suffix
+            found = [
+                (entry.stat().st_mtime_ns, entry.name[: -len(suffix)], entry)
+                for entry in os.scandir(self.root)
+                if entry.is_file()
+                and entry.name.endswith(suffix)
+                and not entry.name.startswith(".")
+            ]
+            self.__files = OrderedDict()
+            for _, key, entry in sorted(found):
+                self.__files[key] = entry.stat().st_size
+                self.__size += self.__files[key]
+        return self.__files
+
+    def path(self, key: str) -> Path:
+        """Путь к файлу озвучки по ключу."""
+        return Path(self.root, f"{key}{self.format.suffix}")
+
+    def get(self, key: str) -> Path | None:
+        """Вернёт путь к готовой озвучке или None."""
+
+        with self.__lock:
+            if key not in self.__entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__entries.move_to_end(key)
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self.__lock:
+                self.__size -= self.__entries.pop(key, 0)
+            return None
+        return path
+
+    def add(self, key: str) -> Path:
+        """Учитываем записанный в path(key) файл и соблюдаем квоту."""
+
+        path = self.path(key)
+        size = os.path.getsize(path)
+        with self.__lock:
+            entries = self.__entries
+            self.__size += size - entries.pop(key, 0)
+            entries[key] = size
+            self.__evict()
+        return path
+
+    def add_later(self, audio: AudioData) -> Future:
+        """
+        Озвучку из памяти пишем в path(key) в фоновом потоке и учитываем,
+        отправка не ждёт диска.
+        """
+
+        with self.__lock:
+            if self.__writer is None:
+                self.__writer = ThreadPoolExecutor(1, thread_name_prefix="audio_write")
+        return self.__writer.submit(self.__save, audio)
+
+    def __save(self, audio: AudioData) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.add(Path(audio.save()).stem)
+
+    def __evict(self) -> None:
+        """Удаляем давно не используемые файлы, последний оставляем."""
+
+        while self.__size > self.max_bytes and len(self.__entries) > 1:
+            key, size = self.__entries.popitem(last=False)
+            self.__size -= size
+            self.evictions += 1
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            log.debug("Озвучка %s вытеснена из кеша.", key)
+
+    def sweep(self, max_age: float) -> int:
+        """
+        Удаляем файлы к которым не обращались дольше max_age секунд
+        и брошенные временные файлы, вернёт сколько файлов удалено.
+        """
+
+        deadline: float = time.time() - max_age
+        removed: int = 0
+        with self.__lock:
+            entries = self.__entries
+            for key in list(entries):
+                try:
+                    if os.path.getmtime(self.path(key)) >= deadline:
+                        break
+                    os.remove(self.path(key))
+                except FileNotFoundError:
+                    pass
+                self.__size -= entries.pop(key)
+                removed += 1
+        deadline = time.time() - min(max_age, TEMP_MAX_AGE)
+        for entry in os.scandir(self.root):
+            if entry.name.startswith(".") and entry.stat().st_mtime < deadline:
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        """Счётчики работы кеша."""
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "files": len(self),
+            "bytes": self.size,
+        }
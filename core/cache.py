@@ -0,0 +1,209 @@
+"""
+Общий кеш разобранных документов.
+Ключ - путь к файлу и его mtime, вытеснение по бюджету памяти (LRU).
+Файлы открываются через mmap только для чтения: разборщик читает страницы
+прямо из страничного кеша ОС без копии файла в памяти процесса,
+поэтому все процессы бота держат популярную книгу в памяти один раз.
+DOCUMENTS: DocumentCache - кеш которым пользуются все обработчики файлов.
+"""
+
+import io
+import os
+import mmap
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Iterator
+
+
+log = logging.getLogger(__name__)
+
+# Бюджет памяти кеша документов в байтах.
+DOCUMENT_CACHE_BYTES: int = 256 * 1024 * 1024
+# Открывать документы через mmap, иначе файл читается в память процесса.
+DOCUMENT_MMAP: bool = True
+# Доля размера файла которую примерно занимают разобранные объекты.
+# Отображение лежит в страничном кеше ОС и в бюджет не входит.
+PARSED_SHARE: float = 0.25
+
+
+@dataclass
+class _Entry:
+    """
+    Запись кеша: разобранный документ и его примерный размер,
+    buffer - отображение файла, документ читает из него пока жив,
+    users - сколько потоков сейчас держат документ,
+    evicted - запись вытеснена, отображение закрывает последний из users.
+    """
+
+    document: Any
+    size: int
+    buffer: mmap.mmap | None = None
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    users: int = 0
+    evicted: bool = False
+
+    def close(self) -> None:
+        """Закрываем отображение файла, документ больше не читается."""
+
+        if self.buffer is None:
+            return
+        try:
+            self.buffer.close()
+        except BufferError as e:
+            # Кто-то держит срез отображения, оно закроется вместе с ним.
+            log.debug("Отображение не закрыто: %s", e)
+
+
+def map_file(path: str | Path) -> mmap.mmap | None:
+    """Отображаем файл в память только для чтения, пустой файл не отображается."""
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        # Отображение живёт и после закрытия файла.
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class DocumentCache:
+    """
+    LRU кеш разобранных документов с ограничением по памяти.
+    max_bytes: int - бюджет памяти,
+    use_mmap: bool - отдавать разборщику отображение файла вместо копии,
+    hits, misses, evictions: int - счётчики работы кеша.
+    """
+
+    def __init__(
+        self, max_bytes: int = DOCUMENT_CACHE_BYTES, use_mmap: bool = DOCUMENT_MMAP
+    ) -> None:
+        self.max_bytes: int = max_bytes
+        self.use_mmap: bool = use_mmap
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.__size: int = 0
+        self.__entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    @property
+    def size(self) -> int:
+        """Сколько байт сейчас занято."""
+        return self.__size
+
+    @staticmethod
+    def key(path: str | Path) -> tuple:
+        """Ключ документа: путь + mtime + размер файла."""
+
+        stat = os.stat(path)
+        return (str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def open(
+        self, path: str | Path, loader: Callable[[BinaryIO], Any]
+    ) -> Iterator[Any]:
+        """
+        Отдаёт разобранный документ, при промахе разбирает его loader-ом.
+        Пока контекст открыт документ заблокирован для других потоков,
+        разобранные объекты не потокобезопасны.
+        """
+
+        key = self.key(path)
+        with self.__lock:
+            entry: _Entry | None = self.__entries.get(key)
+            if entry:
+                self.hits += 1
+                entry.users += 1
+                self.__entries.move_to_end(key)
+            else:
+                self.misses += 1
+        if not entry:
+            entry = self.__load(key, path, loader)
+        try:
+            with entry.lock:
+                yield entry.document
+        finally:
+            with self.__lock:
+                entry.users -= 1
+                if entry.evicted and not entry.users:
+                    entry.close()
+
+    def __load(
+        self, key: tuple, path: str | Path, loader: Callable[[BinaryIO], Any]
+    ) -> _Entry:
+        """
+        Разбираем документ и кладём в кеш. С отображением в бюджет
+        идут только разобранные объекты, без него - весь файл.
+        """
+
+        buffer: mmap.mmap | None = map_file(path) if self.use_mmap else None
+        if buffer is not None:
+            size = int(len(buffer) * PARSED_SHARE)
+            entry = _Entry(document=loader(buffer), size=size, buffer=buffer, users=1)
+        else:
+            with open(path, "rb") as f:
+                data = f.read()
+            entry = _Entry(document=loader(io.BytesIO(data)), size=len(data), users=1)
+        with self.__lock:
+            old = self.__entries.pop(key, None)
+            if old:
+                self.__drop(old)
+            self.__entries[key] = entry
+            self.__size += entry.size
+            self.__evict()
+        return entry
+
+    def __drop(self, entry: _Entry) -> None:
+        """
+        Убираем запись из бюджета. Отображение закрывается сразу,
+        если документ сейчас читают - когда его отпустит последний поток.
+        """
+
+        self.__size -= entry.size
+        entry.evicted = True
+        if not entry.users:
+            entry.close()
+
+    def __evict(self) -> None:
+        """Вытесняем давно не используемые документы, последний оставляем."""
+
+        while self.__size > self.max_bytes and len(self.__entries) > 1:
+            key, entry = self.__entries.popitem(last=False)
+            self.__drop(entry)
+            self.evictions += 1
+            log.debug("Документ %s вытеснен из кеша.", key[0])
+
+    def discard(self, path: str | Path) -> None:
+        """Удаляем все версии документа из кеша."""
+
+        name = str(Path(path).resolve())
+        with self.__lock:
+            for key in [k for k in self.__entries if k[0] == name]:
+                self.__drop(self.__entries.pop(key))
+
+    def clear(self) -> None:
+        """Очищаем кеш."""
+
+        with self.__lock:
+            while self.__entries:
+                self.__drop(self.__entries.popitem()[1])
+            self.__size = 0
+
+    def stats(self) -> dict[str, int]:
+        """Счётчики работы кеша."""
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "documents": len(self),
+            "bytes": self.size,
+        }
+
+
+DOCUMENTS = DocumentCache()
@@ -0,0 +1,287 @@
+"""
+Озвучка длинного текста по кускам.
+Текст страницы режется по предложениям, куски озвучиваются параллельно
+и склеиваются по порядку, первый кусок можно отправить не дожидаясь остальных.
+"""
+
+import io
+import os
+import re
+import uuid
+import wave
+import tempfile
+import logging
+import threading
+from concurrent.futures import Future
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable
+from core.formats import concat_ogg, ogg_seconds
+from core.voices import AudioData, SynthesisJob, temp_name
+
+
+log = logging.getLogger(__name__)
+
+# Размер куска текста в символах, 0 - не резать.
+CHUNK_CHARS: int = 600
+
+_SENTENCE = re.compile(r"(?<=[.!?…;])\s+|\n+")
+
+
+def split_text(text: str, max_chars: int = CHUNK_CHARS) -> list[str]:
+    """Режем текст на куски не длиннее max_chars по границам предложений."""
+
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [text]
+    chunks: list[str] = []
+    current = ""
+    for sentence in filter(None, (s.strip() for s in _SENTENCE.split(text))):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            chunks.extend(filter(None, (current, sentence[:cut])))
+            current, sentence = "", sentence[cut:].strip()
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks or [text]
+
+
+def part_name(file_name: str, part: int | str, hidden: bool = False) -> str:
+    """
+    Имя файла куска рядом с итоговым файлом.
+    hidden - имя с точки, такие файлы не считаются готовой озвучкой.
+    """
+
+    path = Path(file_name)
+    dot = "." if hidden else ""
+    return str(path.with_name(f"{dot}{path.stem}-{part}{path.suffix}"))
+
+
+def join_audio(parts: list[str], file_name: str) -> str:
+    """
+    Склеиваем куски по порядку.
+    wav склеивается по кадрам, mp3 - просто подряд, кадры mp3 независимы,
+    Ogg/Opus - ffmpeg-ом в один поток.
+    """
+
+    tmp = temp_name(file_name)
+    with open(parts[0], "rb") as f:
+        magic = f.read(4)
+    if magic == b"OggS":
+        concat_ogg(parts, tmp)
+    elif magic == b"RIFF":
+        with wave.open(tmp, "wb") as out:
+            for num, part in enumerate(parts):
+                with wave.open(part, "rb") as src:
+                    if num == 0:
+                        out.setparams(src.getparams())
+                    out.writeframes(src.readframes(src.getnframes()))
+    else:
+        with open(tmp, "wb") as out:
+            for part in parts:
+                with open(part, "rb") as src:
+                    out.write(src.read())
+    os.replace(tmp, file_name)
+    return file_name
+
+
+def join_data(parts: list[AudioData], file_name: str) -> AudioData:
+    """
+    Склеиваем куски озвученные в память так же как join_audio.
+    Ogg/Opus склеивает ffmpeg, ему нужны файлы, они временные.
+    """
+
+    magic: bytes = parts[0].data[:4]
+    if magic == b"OggS":
+        with tempfile.TemporaryDirectory(prefix="join") as tmp:
+            names: list[str] = []
+            for num, part in enumerate(parts):
+                names.append(os.path.join(tmp, f"{num}.ogg"))
+                with open(names[-1], "wb") as f:
+                    f.write(part.data)
+            whole = concat_ogg(names, os.path.join(tmp, "whole.ogg"))
+            with open(whole, "rb") as f:
+                data = f.read()
+    elif magic == b"RIFF":
+        out = io.BytesIO()
+        with wave.open(out, "wb") as dst:
+            for num, part in enumerate(parts):
+                with wave.open(io.BytesIO(part.data), "rb") as src:
+                    if num == 0:
+                        dst.setparams(src.getparams())
+                    dst.writeframes(src.readframes(src.getnframes()))
+        data = out.getvalue()
+    else:
+        data = b"".join(part.data for part in parts)
+    return AudioData(file_name, data)
+
+
+# Битрейты mp3 layer III в кбит/с для MPEG1 и MPEG2/2.5 по индексу из заголовка.
+_MP3_BITRATES: dict[bool, tuple[int, ...]] = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+
+def audio_seconds(file_name: str | Path) -> float:
+    """
+    Длительность озвучки в секундах.
+    wav и Ogg/Opus считаются точно, mp3 - по битрейту первого кадра,
+    генераторы голоса пишут mp3 с постоянным битрейтом.
+    """
+
+    with open(file_name, "rb") as f:
+        head = f.read(10)
+        if head[:4] == b"OggS":
+            return ogg_seconds(file_name)
+        if head[:4] == b"RIFF":
+            with wave.open(str(file_name), "rb") as src:
+                return src.getnframes() / src.getframerate()
+        offset = 0
+        if head[:3] == b"ID3":
+            # Размер тега ID3v2 записан по 7 бит в байте.
+            offset = sum((head[6 + i] & 0x7F) << (7 * (3 - i)) for i in range(4)) + 10
+        f.seek(offset)
+        frame = f.read(4)
+    size = os.path.getsize(file_name) - offset
+    if len(frame) < 4 or frame[0] != 0xFF or frame[1] & 0xE0 != 0xE0:
+        return 0.0
+    bitrate = _MP3_BITRATES[bool(frame[1] & 0x08)][frame[2] >> 4]
+    return size * 8 / (bitrate * 1000) if bitrate else 0.0
+
+
+class ChunkedJob:
+    """
+    Задача озвучки разбитая на куски.
+    job: SynthesisJob - исходная задача,
+    parts: list[SynthesisJob] - задачи кусков по порядку.
+    """
+
+    def __init__(self, job: SynthesisJob, max_chars: int = CHUNK_CHARS) -> None:
+        self.job: SynthesisJob = job
+        # В кеш озвучки попадает только весь текст, куски и остаток живут
+        # до склейки и отправки. Одну страницу могут озвучивать несколько
+        # пользователей сразу, поэтому у них уникальные скрытые имена:
+        # склейка одного пользователя не удалит куски другого,
+        # а брошенные куски уберёт уборка.
+        self.unique: str = uuid.uuid4().hex[:12]
+        texts: list[str] = split_text(job.text, max_chars)
+        self.parts: list[SynthesisJob] = [
+            replace(
+                job,
+                text=text,
+                file_name=part_name(job.file_name, f"{num}.{self.unique}", True),
+            )
+            for num, text in enumerate(texts)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    def submit(
+        self,
+        submit: Callable[[SynthesisJob], Future],
+        then: Callable,
+    ) -> tuple[Future, Future, Future]:
+        """
+        Отдаём куски на озвучку через submit.
+        Вернёт Future первого куска, остальных склеенных кусков и всего текста,
+        then - учитывает готовый файл всего текста и возвращает путь к нему,
+        для кусков озвученных в память - учитывает AudioData.
+        Первый кусок и остаток - временные файлы, после отправки их убирает release.
+        Отмена Future всего текста отменяет ещё не начатые куски,
+        их Future лежат в атрибуте parts у Future всего текста.
+        """
+
+        first, rest, whole = Future(), Future(), Future()
+        futures = [submit(part) for part in self.parts]
+        whole.parts = futures
+        results: list[str | None] = [None] * len(futures)
+        lock = threading.Lock()
+
+        def cancel(future: Future) -> None:
+            if future.cancelled():
+                rest.cancel()
+                for part in futures:
+                    part.cancel()
+
+        def finish(num: int, part: Future) -> None:
+            try:
+                with lock:
+                    results[num] = part.result()
+                    if num == 0:
+                        _resolve(first, lambda: _result(results[0]))
+                    if all(results):
+                        self.__join(results, rest, whole, then)
+            except BaseException as e:
+                for future in (first, rest, whole):
+                    _fail(future, e)
+
+        whole.add_done_callback(cancel)
+        for num, part in enumerate(futures):
+            part.add_done_callback(lambda f, num=num: finish(num, f))
+        return first, rest, whole
+
+    def __join(
+        self, results: list, rest: Future, whole: Future, then: Callable
+    ) -> None:
+        """Все куски готовы: склеиваем остаток и весь текст."""
+
+        rest_name = part_name(self.job.file_name, f"rest.{self.unique}", True)
+        if isinstance(results[0], AudioData):
+            _resolve(rest, lambda: join_data(results[1:], rest_name))
+            _resolve(whole, lambda: then(join_data(results, self.job.file_name)))
+            return
+        _resolve(rest, lambda: Path(join_audio(results[1:], rest_name)))
+        _resolve(whole, lambda: then(join_audio(results, self.job.file_name)))
+        for part in results[1:]:
+            try:
+                os.remove(part)
+            except FileNotFoundError:
+                pass
+
+
+def release(first: Future, rest: Future, whole: Future) -> None:
+    """
+    Первый кусок и остаток отправлены или не понадобились:
+    удаляем их файлы когда весь текст склеен, склейка читает первый кусок.
+    """
+
+    def remove(_: Future) -> None:
+        for part in (first, rest):
+            if not part.done() or part.cancelled() or part.exception() is not None:
+                continue
+            result = part.result()
+            if not isinstance(result, AudioData):
+                try:
+                    os.remove(result)
+                except FileNotFoundError:
+                    pass
+
+    whole.add_done_callback(remove)
+
+
+def _result(result: "str | AudioData") -> "Path | AudioData":
+    """Результат куска: AudioData как есть, файл - путём."""
+    return result if isinstance(result, AudioData) else Path(result)
+
+
+def _resolve(future: Future, func: Callable) -> None:
+    """Отдаём результат func в future, если его ещё не отменили."""
+
+    if future.done():
+        return
+    try:
+        future.set_result(func())
+    except BaseException as e:
+        _fail(future, e)
+
+
+def _fail(future: Future, e: BaseException) -> None:
+    if not future.done():
+        future.set_exception(e)
@@ -0,0 +1,178 @@
+"""
+Хранилище загруженных книг по хешу содержимого.
+Одна книга лежит на диске один раз, пользователи держат на неё ссылки,
+поэтому разбор, индекс и озвучка популярной книги делятся между всеми.
+Книга удаляется когда на неё не остаётся ссылок.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from core.cache import DOCUMENTS
+from core.index import drop_index, file_hash, index_path, remember_hash
+from core.voices import temp_name
+
+
+log = logging.getLogger(__name__)
+
+# Файл со ссылками пользователей на книги.
+REFS_FILE: str = "refs.json"
+
+
+class DocumentStore:
+    """
+    Книги по хешу и ссылки на них.
+    root: Path - каталог книг, книга лежит как '<sha256><расширение>',
+    ссылка - 'имя_пользователя<расширение>' : (хеш, время последнего обращения).
+    Время обращения меняется только в памяти, на диск его пишет flush,
+    его вызывает уборка, ссылки пишутся сразу.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root: Path = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.__refs: dict[str, tuple[str, float]] = {}
+        self.__dirty: bool = False
+        self.__lock = threading.RLock()
+        self.__load()
+
+    def __load(self) -> None:
+        """Читаем ссылки, ссылки на пропавшие книги выкидываем."""
+
+        try:
+            refs = json.loads(Path(self.root, REFS_FILE).read_text())
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            log.warning("Ссылки на книги испорчены: %s", e)
+            return
+        for ref, (digest, used) in refs.items():
+            if self.blob(ref, digest).is_file():
+                self.__refs[ref] = (digest, used)
+
+    def __save(self) -> None:
+        """Пишем ссылки атомарно."""
+
+        path = str(Path(self.root, REFS_FILE))
+        tmp = temp_name(path)
+        with open(tmp, "w") as f:
+            json.dump(self.__refs, f)
+        os.replace(tmp, path)
+        self.__dirty = False
+
+    def flush(self) -> bool:
+        """Пишем накопленные времена обращения, вернёт были ли изменения."""
+
+        with self.__lock:
+            if not self.__dirty:
+                return False
+            self.__save()
+        return True
+
+    def blob(self, ref: str, digest: str) -> Path:
+        """Путь книги с хешем digest, расширение берётся из ссылки."""
+
+        return Path(self.root, f"{digest}{Path(ref).suffix}")
+
+    def add(self, ref: str, file_name: str | Path) -> Path:
+        """
+        Забираем загруженный файл в хранилище и ссылаемся на него.
+        Если такая книга уже есть, файл просто удаляется, вернёт путь книги.
+        """
+
+        digest: str = file_hash(file_name)
+        blob: Path = self.blob(ref, digest)
+        with self.__lock:
+            if blob.is_file():
+                os.remove(file_name)
+                log.debug("Книга %s уже загружена, ссылаемся на неё.", digest)
+            else:
+                os.replace(file_name, blob)
+                remember_hash(blob, digest)
+            old: tuple[str, float] | None = self.__refs.get(ref)
+            self.__refs[ref] = (digest, time.time())
+            self.__save()
+            if old is not None and old[0] != digest:
+                self.__collect(ref, old[0])
+        return blob
+
+    def resolve(self, ref: str) -> Path | None:
+        """Путь книги по ссылке или None, отмечает обращение к ней."""
+
+        with self.__lock:
+            found: tuple[str, float] | None = self.__refs.get(ref)
+            if found is None:
+                return None
+            self.__refs[ref] = (found[0], time.time())
+            self.__dirty = True
+            return self.blob(ref, found[0])
+
+    def release(self, ref: str) -> bool:
+        """Убираем ссылку, книга без ссылок удаляется."""
+
+        with self.__lock:
+            found: tuple[str, float] | None = self.__refs.pop(ref, None)
+            if found is None:
+                return False
+            self.__save()
+            self.__collect(ref, found[0])
+        return True
+
+    def expire(self, max_age: float) -> int:
+        """Убираем ссылки к которым не обращались max_age секунд."""
+
+        deadline: float = time.time() - max_age
+        with self.__lock:
+            old = [ref for ref, (_, used) in self.__refs.items() if used < deadline]
+            for ref in old:
+                self.release(ref)
+        return len(old)
+
+    def digests(self) -> set[str]:
+        """Хеши книг на которые есть ссылки."""
+
+        with self.__lock:
+            return {digest for digest, _ in self.__refs.values()}
+
+    def refcount(self, digest: str) -> int:
+        """Сколько ссылок на книгу."""
+
+        with self.__lock:
+            return sum(1 for found, _ in self.__refs.values() if found == digest)
+
+    def __collect(self, ref: str, digest: str) -> None:
+        """Удаляем книгу и её индекс если ссылок больше нет."""
+
+        if self.refcount(digest):
+            return
+        blob = self.blob(ref, digest)
+        drop_index(digest)
+        # Отображение открытого файла не даёт удалить его в Windows.
+        DOCUMENTS.discard(blob)
+        for path in (blob, index_path(str(blob), digest)):
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.debug("Не удалось удалить %s: %s", path, e)
+        log.debug("Книга %s удалена, ссылок не осталось.", digest)
+
+    def __contains__(self, ref: str) -> bool:
+        return ref in self.__refs
+
+    def __len__(self) -> int:
+        return len(self.__refs)
+
+    def stats(self) -> dict[str, int]:
+        """Ссылки, книги на диске и их размер."""
+
+        with self.__lock:
+            blobs = Counter(self.blob(ref, d) for ref, (d, _) in self.__refs.items())
+        return {
+            "refs": sum(blobs.values()),
+            "blobs": len(blobs),
+            "bytes": sum(p.stat().st_size for p in blobs if p.is_file()),
+        }
@@ -5,14 +5,67 @@
 
 import os
 import logging
-from typing import Generator, Literal, Self
+from collections import Counter
+from dataclasses import replace
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Generator, Iterator, Literal, Mapping, Self
 from pathlib import Path
+from core.audio import AudioCache
+from core.cache import DOCUMENTS
+from core.chunks import CHUNK_CHARS, ChunkedJob, release
+from core.documents import DocumentStore
 from core.engine_types import TextTeam, Speaker
-from core.settings import SPEAKERS, READERS
+from core.export import EXPORT_MAX_BYTES, Export
+from core.janitor import Janitor
+from core.metrics import stats
+from core.profiling import PROFILER
+from core.scheduler import Priority, Scheduler
+from core.sessions import SESSIONS_NAME, Session, SessionStore, SessionTable
+from core.settings import DEFAULT_READER, DEFAULT_SPEAKER, SPEAKERS, READERS
+from core.voices import (
+    SPEAKER_POOL,
+    AudioData,
+    SynthesisJob,
+    speaker_type,
+    warm_speakers,
+)
 
 
 log = logging.getLogger(__name__)
 
+# Сколько следующих страниц озвучивать заранее.
+READ_AHEAD: int = 2
+# Страницу которую ждёт пользователь озвучивать в память и отправлять
+# из неё, в кеш она пишется в фоне. Для медленного сетевого temp.
+IN_MEMORY: bool = os.environ.get("speaker_in_memory") == "1"
+# Короткие страницы подряд озвучиваются одним файлом до стольких символов,
+# пустые пропускаются. 0 - каждая страница отдельно.
+BATCH_CHARS: int = int(os.environ.get("speaker_batch_chars", 0))
+# Сколько потоков на всех озвучивают наперёд без планировщика.
+READ_AHEAD_THREADS: int = int(os.environ.get("speaker_read_ahead_threads", 2))
+_READ_AHEAD = ThreadPoolExecutor(
+    max_workers=READ_AHEAD_THREADS, thread_name_prefix="read_ahead"
+)
+
+
+def find_or_default(registry: Mapping, name: str, default: str):
+    """
+    Обработчик по имени, если его нет - по умолчанию, если и он
+    недоступен - первый который импортируется, иначе KeyError.
+    """
+
+    value = registry.get(name)
+    if value:
+        return value
+    log.debug("Значение %s не найдено.", name)
+    for key in dict.fromkeys([default, *registry]):
+        value = registry.get(key)
+        if value:
+            if key != default:
+                log.warning("%s недоступен, берём %s.", default, key)
+            return value
+    raise KeyError(f"Нет доступных обработчиков, {default} тоже недоступен.")
+
 
 class Worker:
     """
@@ -20,30 +73,213 @@ class Worker:
     полученым от одного конкретного пользователя.
     reader: TextTeam  - объект для работы работы с файлом и озвучки текста.
     generator: Generator  - Объект для итерации по страницам
+    read_ahead: int - сколько следующих страниц озвучивать заранее,
+    работает только с кешем озвучки, иначе страницы перезапишут один файл.
+    stats: Counter - ready/waited/missed, была ли страница готова к запросу,
+    scheduler: Scheduler | None - общий планировщик озвучки,
+    без него страницы озвучиваются в общих потоках read_ahead,
+    user: str - имя пользователя для очереди планировщика,
+    chunk_chars: int - озвучивать страницы длиннее этого по кускам
+    параллельно, работает с планировщиком, 0 - не резать,
+    in_memory: bool - страница которую ждут озвучивается в память
+    и приходит как AudioData, работает с планировщиком,
+    batch_chars: int - склеивать короткие страницы подряд в один файл
+    до стольких символов текста, пустые пропускаются, 0 - по странице,
+    on_page: Callable | None - вызывается с новой страницей при переходе.
     """
 
     reader: TextTeam
     generator: Generator
+    totals: Counter = Counter()
 
-    def __init__(self, reader: TextTeam, page: int = 0) -> None:
+    def __init__(
+        self,
+        reader: TextTeam,
+        page: int = 0,
+        read_ahead: int = 0,
+        scheduler: Scheduler | None = None,
+        user: str = "",
+        chunk_chars: int = 0,
+        in_memory: bool = False,
+        batch_chars: int = 0,
+        on_page: Callable[[int], None] | None = None,
+    ) -> None:
         self.reader: TextTeam = reader
         self.__page: int = page
+        self.read_ahead: int = read_ahead
+        self.scheduler: Scheduler | None = scheduler
+        self.user: str = user
+        self.chunk_chars: int = chunk_chars
+        self.in_memory: bool = in_memory
+        self.batch_chars: int = batch_chars
+        self.on_page: Callable[[int], None] | None = on_page
+        self.__spans: dict[int, range] = {}
+        self.stats: Counter = Counter()
+        self.__pending: dict[int, Future] = {}
+        self.__chunks: dict[int, tuple[Future, Future, Future]] = {}
 
     def __getitem__(self, num_el: int) -> Path:
         return self.reader[num_el]
 
+    def span(self, num_el: int) -> range:
+        """Страницы которые озвучиваются одним файлом начиная с num_el."""
+
+        if self.batch_chars <= 0 or num_el >= len(self.reader):
+            return range(num_el, num_el + 1)
+        if num_el not in self.__spans:
+            self.__spans[num_el] = self.reader.batch(num_el, self.batch_chars)
+        return self.__spans[num_el]
+
+    def __text(self, num_el: int) -> str:
+        """Текст страницы или пачки страниц с num_el."""
+
+        if self.batch_chars <= 0:
+            return self.reader.page_text(num_el)
+        return self.reader.batch_text(self.span(num_el))
+
+    def __voice(self, num_el: int) -> Path:
+        """Озвучка страницы или пачки страниц в этом потоке."""
+
+        if self.batch_chars <= 0:
+            return self.reader[num_el]
+        return self.reader.save_to_file(self.__text(num_el))
+
     def __iter__(self) -> Self:
         return self
 
-    def __next__(self) -> Path:
-        if 0 <= self.page <= len(self.reader):
-            v: Path = self.reader[self.page]
-            self.page = self.page + 1
-            return v
+    def __next__(self) -> Path | AudioData:
+        with PROFILER.profile("page", self.user, self.reader.file_name, self.page):
+            if 0 <= self.page <= len(self.reader):
+                future: Future = self.__take(self.page)
+                self.__release(self.page)
+                self.page = self.span(self.page).stop
+                self.prefetch()
+                return future.result()
         raise StopIteration
 
+    def stream(self) -> Iterator[Path | AudioData]:
+        """
+        Как next(), но длинная страница озвученная по кускам отдаётся двумя
+        файлами: первый кусок сразу как готов, затем остальное.
+        """
+
+        with PROFILER.profile("page", self.user, self.reader.file_name, self.page):
+            if not 0 <= self.page <= len(self.reader):
+                raise StopIteration
+            future: Future = self.__take(self.page)
+            parts = self.__chunks.pop(self.page, None)
+            self.page = self.span(self.page).stop
+            self.prefetch()
+            if parts is None or future.done():
+                if parts is not None:
+                    release(*parts)
+                return iter((future.result(),))
+        return self.__parts(parts)
+
+    @staticmethod
+    def __parts(parts: tuple[Future, Future, Future]) -> Iterator[Path | AudioData]:
+        """Первый кусок и остаток, их файлы убираются после отправки."""
+
+        try:
+            yield parts[0].result()
+            yield parts[1].result()
+        finally:
+            release(*parts)
+
+    def __release(self, num_el: int) -> None:
+        """Куски страницы больше не нужны."""
+
+        parts = self.__chunks.pop(num_el, None)
+        if parts is not None:
+            release(*parts)
+
+    @property
+    def prefetching(self) -> bool:
+        """Включено ли чтение наперёд."""
+        return (
+            self.read_ahead > 0
+            and getattr(self.reader, "audio_cache", None) is not None
+        )
+
+    def __take(self, num_el: int) -> Future:
+        """Озвучка страницы: готовая из фона или синтезируем сейчас."""
+
+        future: Future | None = self.__pending.pop(num_el, None)
+        if future is None or future.cancelled():
+            self.__count("missed")
+            if not self.prefetching and self.scheduler is None:
+                return _done(self.__voice(num_el))
+            return self.__submit(num_el, Priority.INTERACTIVE)
+        self.__count("ready" if future.done() else "waited")
+        if self.scheduler is not None:
+            for part in getattr(future, "parts", (future,)):
+                self.scheduler.promote(part, Priority.INTERACTIVE)
+        return future
+
+    def __count(self, name: str) -> None:
+        self.stats[name] += 1
+        self.totals[name] += 1
+
+    def __submit(self, num_el: int, priority: Priority) -> Future:
+        """Ставим озвучку страницы в очередь планировщика или фонового потока."""
+
+        if self.scheduler is not None:
+            text: str = self.__text(num_el)
+            path: Path | None = self.reader.cached(text)
+            if path is not None:
+                return _done(path)
+            job: SynthesisJob = self.reader.synthesis_job(text)
+            then: Callable = self.reader.commit
+            # Наперёд озвучиваем на диск, в памяти держим только ожидаемое.
+            if self.in_memory and priority == Priority.INTERACTIVE:
+                job, then = replace(job, in_memory=True), self.reader.keep
+            chunked = ChunkedJob(job, self.chunk_chars)
+            if len(chunked) > 1:
+                first, rest, whole = chunked.submit(
+                    lambda part: self.scheduler.submit(self.user, priority, part),
+                    then=then,
+                )
+                self.__chunks[num_el] = (first, rest, whole)
+                return whole
+            return self.scheduler.submit(self.user, priority, job, then=then)
+        return _READ_AHEAD.submit(self.__voice, num_el)
+
+    def prefetch(self) -> None:
+        """Начинаем озвучивать следующие страницы в фоне."""
+
+        if not self.prefetching:
+            return
+        for num_el in self.__ahead(self.page):
+            if num_el not in self.__pending:
+                self.__pending[num_el] = self.__submit(num_el, Priority.PREFETCH)
+
+    def __ahead(self, page: int) -> list[int]:
+        """Начала следующих read_ahead страниц или пачек страниц с page."""
+
+        starts: list[int] = []
+        while len(starts) < self.read_ahead and page < len(self.reader):
+            starts.append(page)
+            page = self.span(page).stop
+        return starts
+
+    def cancel(self) -> None:
+        """Отменяем всё что озвучивается наперёд."""
+
+        for future in self.__pending.values():
+            future.cancel()
+        self.__pending.clear()
+        for num_el in list(self.__chunks):
+            self.__release(num_el)
+
+    def close(self) -> None:
+        """Отменяем фоновую озвучку и освобождаем генератор голоса."""
+
+        self.cancel()
+        self.reader.close()
+
     def set_speaker(self, speaker: Speaker) -> bool:
         """Set new voice generator"""
+        self.cancel()
         return self.reader.set_engine(speaker)
 
     @property
@@ -54,9 +290,23 @@ class Worker:
     @page.setter
     def page(self, page: int) -> Literal[True]:
         self.__page = page
+        if self.on_page is not None:
+            self.on_page(page)
+        ahead: list[int] = self.__ahead(page) if self.__pending else []
+        for num_el in [n for n in self.__pending if n not in ahead]:
+            self.__pending.pop(num_el).cancel()
+            self.__release(num_el)
         return True
 
 
+def _done(result) -> Future:
+    """Уже выполненный Future."""
+
+    future: Future = Future()
+    future.set_result(result)
+    return future
+
+
 class Engine:
     """
     Класс связывает пользователей с обработчиками полученных файлов.
@@ -64,28 +314,100 @@ class Engine:
     speakers: dict[str, Speaker] - словарь доступных генераторов голоса,
     readers: dict[str, TextTeam] - словарь обработчиков файла
     по типу 'формат_файла' : 'обработчик',
-    generators: dict[str, Worker] - словарь связывающий имя пользователя
-    с обработчиком его файла 'имя_пользователя' : 'обработчик'.
+    generators: SessionStore - ограниченный словарь связывающий имя пользователя
+    с обработчиком его файла 'имя_пользователя' : 'обработчик',
+    sessions: SessionTable - описания обработчиков в temp_path, по ним
+    вытесненный или потерянный при перезапуске обработчик создаётся заново
+    при следующем обращении, с той же страницы и с готовой озвучкой из кеша,
+    audio_cache: AudioCache - общий для всех пользователей кеш озвучки,
+    read_ahead: int - окно чтения наперёд для новых обработчиков,
+    scheduler: Scheduler - пул процессов озвучки общий для всех пользователей,
+    chunk_chars: int - размер куска текста при озвучке страницы по кускам,
+    in_memory: bool - отдавать ожидаемую страницу из памяти, см. IN_MEMORY,
+    batch_chars: int - склеивать короткие страницы, см. BATCH_CHARS,
+    documents: DocumentStore - загруженные книги по хешу содержимого,
+    одинаковые книги разных пользователей хранятся и разбираются один раз,
+    janitor: Janitor - фоновая уборка temp_path, запускается ботом.
     """
 
     temp_path: Path = Path(__file__).resolve().parent.with_name("temp")
-    speakers: dict[str, Speaker] = SPEAKERS
-    readers: dict[str, TextTeam] = READERS
-    generators: dict[str, Worker] = {}
-
-    def __init__(self) -> None:
+    speakers: Mapping[str, Speaker] = SPEAKERS
+    readers: Mapping[str, TextTeam] = READERS
+    generators: SessionStore
+    sessions: SessionTable
+    read_ahead: int = READ_AHEAD
+    chunk_chars: int = CHUNK_CHARS
+    in_memory: bool = IN_MEMORY
+    batch_chars: int = BATCH_CHARS
+
+    def __init__(self, temp_path: Path | None = None) -> None:
+        if temp_path is not None:
+            self.temp_path = Path(temp_path)
         self.has_tmp_dir()
+        self.audio_cache = AudioCache(Path(self.temp_path, "audio"))
+        self.scheduler = Scheduler(
+            initializer=warm_speakers, initargs=(self.__warm_speakers(),)
+        )
+        self.documents = DocumentStore(Path(self.temp_path, "docs"))
+        self.janitor = Janitor(
+            self.temp_path, self.audio_cache, documents=self.documents
+        )
+        self.sessions = SessionTable(Path(self.temp_path, SESSIONS_NAME))
+        self.generators = SessionStore()
+        self.__register_metrics()
+
+    def __register_metrics(self) -> None:
+        """Статистика кешей, очередей и сессий в метриках."""
+
+        stats("speaker_audio_cache", "Кеш озвучки.", self.audio_cache.stats)
+        stats("speaker_document_cache", "Разобранные pdf в памяти.", DOCUMENTS.stats)
+        stats("speaker_documents", "Хранилище книг.", self.documents.stats)
+        stats("speaker_scheduler", "Очереди озвучки.", self.scheduler.stats)
+        stats("speaker_sessions", "Обработчики пользователей.", self.generators.stats)
+        stats("speaker_pages", "Была ли страница готова к запросу.", Worker.totals.copy)
+        stats("speaker_pool", "Генераторы голоса в этом процессе.", SPEAKER_POOL.stats)
+
+    def upload_filename(self, name: str, reader: TextTeam) -> Path:
+        """Куда бот кладёт только что загруженный файл пользователя."""
+
+        return Path(self.temp_path, f"temp_{name}{reader.type}")
 
     def get_filename(self, name: str, reader: TextTeam) -> str:
-        """Получаем имя+путь загруженному фаулу и путь."""
+        """
+        Получаем имя+путь файла пользователя.
+        Свежая загрузка забирается в хранилище книг, путь ведёт на общую книгу.
+        """
+
+        upload: Path = self.upload_filename(name, reader)
+        ref: str = f"{name}{reader.type}"
+        if upload.is_file():
+            return str(self.documents.add(ref, upload))
+        blob: Path | None = self.documents.resolve(ref)
+        return str(blob if blob is not None else upload)
 
-        return str(Path(self.temp_path, f"temp_{name}{reader.type}"))
+    def has_document(self, name: str, reader_name: str = "pdf") -> bool:
+        """Есть ли у пользователя загруженный файл."""
+
+        reader: TextTeam = self.__find_reader_or_dafault(reader_name)
+        return (
+            f"{name}{reader.type}" in self.documents
+            or self.upload_filename(name, reader).is_file()
+        )
+
+    def remove_document(self, name: str, reader_name: str = "pdf") -> bool:
+        """Убираем файл пользователя, книга удаляется если она больше ничья."""
+
+        reader: TextTeam = self.__find_reader_or_dafault(reader_name)
+        upload: Path = self.upload_filename(name, reader)
+        if upload.is_file():
+            os.remove(upload)
+        return self.documents.release(f"{name}{reader.type}")
 
     def set_worker(
         self,
         name: str,
-        speaker_name: str = "pyttsx3",
-        reader_name: str = "pdf",
+        speaker_name: str = DEFAULT_SPEAKER,
+        reader_name: str = DEFAULT_READER,
         page: int = 0,
     ) -> bool:
         """
@@ -95,38 +417,137 @@ class Engine:
         reader: TextTeam = self.__find_reader_or_dafault(reader_name)
         speaker: Speaker = self.__find_speaker_or_dafault(speaker_name)
         path: str = self.get_filename(name, reader)
-        worker = Worker(reader(path, speaker), page)
-        self.generators[name] = worker
+        worker = self.__new_worker(name, reader(path, speaker, self.audio_cache), page)
+        self.__replace_worker(name, worker)
+        self.sessions[name] = Session(speaker_name, reader_name, page)
         return True
 
+    def __new_worker(self, name: str, reader: TextTeam, page: int) -> Worker:
+        """
+        Обработчик пользователя с общим планировщиком озвучки,
+        каждая новая страница сразу запоминается в sessions.
+        """
+
+        return Worker(
+            reader,
+            page,
+            self.read_ahead,
+            self.scheduler,
+            name,
+            self.chunk_chars,
+            self.in_memory,
+            self.batch_chars,
+            lambda page: self.sessions.change(name, page=page),
+        )
+
+    def __replace_worker(self, name: str, worker: Worker) -> None:
+        """Меняем обработчик пользователя, старый перестаёт озвучивать наперёд."""
+
+        old: Worker | None = self.generators.get(name)
+        if old is not None:
+            old.close()
+        self.generators[name] = worker
+
+    def cancel(self, name: str) -> None:
+        """Пользователь ушёл со страниц книги, отменяем озвучку наперёд."""
+
+        worker: Worker | None = self.generators.get(name)
+        if worker is not None:
+            worker.cancel()
+
+    def export(
+        self,
+        name: str,
+        first: int = 0,
+        last: int | None = None,
+        progress: Callable[[int, int], None] | None = None,
+        max_bytes: int = EXPORT_MAX_BYTES,
+    ) -> Future:
+        """
+        Озвучиваем страницы с first по last включительно, по умолчанию всю книгу.
+        Страницы озвучиваются параллельно в пакетной очереди планировщика,
+        вернёт Future со списком файлов не больше max_bytes, их удаляет вызывающий.
+        """
+
+        worker: Worker | None = self.__find_worker(name)
+        if worker is None:
+            if not self.has_document(name):
+                raise KeyError(name)
+            self.set_worker(name)
+            worker = self.generators[name]
+        size: int = len(worker.reader)
+        stop: int = size if last is None else min(last + 1, size)
+        pages = range(max(first, 0), stop)
+        Path(self.temp_path, "export").mkdir(exist_ok=True)
+        target = Path(self.temp_path, "export", f"{name}-{pages.start}-{pages.stop}")
+        log.info("Выгрузка страниц %s пользователя %s", pages, name)
+        return Export(worker.reader, pages, target, max_bytes, progress).submit(
+            self.scheduler, name
+        )
+
+    def index_document(self, name: str, reader_name: str = "pdf") -> int:
+        """
+        Строим индекс текста загруженного файла, вернёт число страниц.
+        Вызывается сразу после загрузки, чтобы чтение страниц не разбирало файл.
+        """
+
+        reader: TextTeam = self.__find_reader_or_dafault(reader_name)
+        path: str = self.get_filename(name, reader)
+        with PROFILER.profile("index", name, path):
+            return len(reader.build_index(path))
+
     def __find_reader_or_dafault(self, reader_name: str) -> TextTeam:
-        """Ищем обработчик если не находим, берём первый."""
+        """Ищем обработчик если не находим, берём по умолчанию."""
 
-        reader: TextTeam | None = self.readers.get(reader_name)
-        if not reader:
-            log.debug("Значение %s не найдено.", reader_name)
-            reader = tuple(self.readers.values())[0]
-        return reader
+        return find_or_default(self.readers, reader_name, DEFAULT_READER)
 
     def __find_speaker_or_dafault(self, speaker_name: str) -> Speaker:
-        """Ищем обработчик если не находим, берём первый."""
+        """Ищем обработчик если не находим, берём по умолчанию."""
 
-        speaker: Speaker | None = self.speakers.get(speaker_name)
-        if not speaker:
-            log.debug("Значение %s не найдено.", speaker_name)
-            speaker = tuple(self.speakers.values())[1]
-        return speaker
+        return find_or_default(self.speakers, speaker_name, DEFAULT_SPEAKER)
 
     def get_reader(self, name: str) -> TextTeam | None:
         """
         Получаем обработчик текста по имени пользователя.
         """
-        gen = self.generators.get(name)
+        gen = self.__find_worker(name)
         if gen:
             log.debug("Ошибка получения обработчика файла для пользователя: %s", name)
             return gen.reader
         return None
 
+    def labels(self, name: str) -> dict[str, str]:
+        """
+        Метки метрик пользователя: генератор голоса и тип файла
+        из его сессии, без сессии - по умолчанию. Обработчик не создаётся.
+        """
+
+        session: Session | None = self.sessions.get(name)
+        speaker: Speaker = self.__find_speaker_or_dafault(
+            session.speaker_name if session else DEFAULT_SPEAKER
+        )
+        reader: TextTeam = self.__find_reader_or_dafault(
+            session.reader_name if session else DEFAULT_READER
+        )
+        return {"speaker": speaker.__name__, "reader": reader.type}
+
+    def warm(self) -> None:
+        """
+        Запускаем пул озвучки при старте бота, его процессы прогревают
+        генераторы голоса. В процессе бота озвучки нет, тут не прогреваем.
+        """
+
+        self.scheduler.start()
+
+    def __warm_speakers(self) -> tuple[Speaker, ...]:
+        """
+        Прогреваем только генератор по умолчанию, остальные
+        импортируются и создаются при первом выборе пользователем.
+        """
+
+        speaker: Speaker | None = self.speakers.get(DEFAULT_SPEAKER)
+        return (speaker,) if speaker else ()
+
     def has_tmp_dir(self) -> None:
         """Если нету директории temp создаём."""
 
@@ -137,7 +558,7 @@ class Engine:
         """Меняем обработчик текста."""
 
         reader: TextTeam | None = self.readers.get(reader_name)
-        worker: Worker | None = self.generators.get(name)
+        worker: Worker | None = self.__find_worker(name)
         if not worker or not reader:
             log.debug(
                 "Обработчик пользователя: %s, не смог изменить обработчик текста на: %s",
@@ -146,14 +567,17 @@ class Engine:
             )
             return False
         path: str = self.get_filename(name, reader)
-        speaker = worker.reader.get_engine.__class__
-        self.generators[name] = Worker(reader(path, speaker), page)
+        speaker = speaker_type(worker.reader.get_engine)
+        self.__replace_worker(
+            name, self.__new_worker(name, reader(path, speaker, self.audio_cache), page)
+        )
+        self.sessions.change(name, reader_name=reader_name, page=page)
         return True
 
     def set_speaker(self, name: str, speaker_name: str) -> bool:
         """Задаём новый генератор голоса."""
 
-        worker: Worker | None = self.generators.get(name)
+        worker: Worker | None = self.__find_worker(name)
         speaker: Speaker | None = self.speakers.get(speaker_name)
         if not worker or not speaker:
             log.debug(
@@ -163,11 +587,32 @@ class Engine:
             )
             return False
         worker.set_speaker(speaker)
+        self.sessions.change(name, speaker_name=speaker_name)
         return True
 
+    def __find_worker(self, name: str) -> Worker | None:
+        """Обработчик пользователя или None, вытесненный создаётся заново."""
+
+        try:
+            return self.get_worker(name)
+        except KeyError:
+            return None
+
     def get_worker(self, name: str) -> Worker:
         """
         Получаем генератор по имени пользователя для итерации по документу.
         """
 
+        worker: Worker | None = self.generators.get(name)
+        if worker is not None:
+            return worker
+        session: Session | None = self.sessions.get(name)
+        if session is None:
+            raise KeyError(name)
+        if not self.has_document(name, session.reader_name):
+            # Книгу убрали пока бот был выключен.
+            del self.sessions[name]
+            raise KeyError(name)
+        log.debug("Пересоздаём обработчик пользователя %s", name)
+        self.set_worker(name, session.speaker_name, session.reader_name, session.page)
         return self.generators[name]
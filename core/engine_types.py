@@ -18,8 +18,11 @@ class TextTeam(Protocol):
 
     file_name: Path
     file_name_mp3: Path
+    audio_cache: object | None
 
-    def __init__(self, file_name_path: str, speaker: Speaker) -> None:
+    def __init__(
+        self, file_name_path: str, speaker: Speaker, audio_cache=None
+    ) -> None:
         ...
 
     def __len__(self) -> int:
@@ -34,12 +37,44 @@ class TextTeam(Protocol):
     def set_engine(self, speaker: Speaker, *args, **kwargs) -> bool:
         ...
 
+    def close(self) -> None:
+        ...
+
     def extract_text_from_file(self, num_el: int) -> Generator:
         ...
 
+    def page_text(self, num_el: int) -> str:
+        ...
+
+    def batch(self, num_el: int, chars: int) -> range:
+        ...
+
+    def batch_text(self, pages: range) -> str:
+        ...
+
     def save_to_file(self, text: str):
         ...
 
+    def cached(self, text: str) -> Path | None:
+        ...
+
+    def synthesis_job(self, text: str):
+        ...
+
+    def commit(self, file_name: str) -> Path:
+        ...
+
+    def keep(self, audio):
+        ...
+
+    @property
+    def labels(self) -> dict[str, str]:
+        ...
+
+    @classmethod
+    def build_index(cls, file_name: str | Path):
+        ...
+
     @classmethod
     @property
     def type(cls) -> str:
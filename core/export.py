@@ -0,0 +1,165 @@
+"""
+Озвучка книги или диапазона страниц целиком.
+Страницы озвучиваются параллельно пакетными задачами планировщика,
+готовые страницы склеиваются по порядку в несколько файлов не больше лимита.
+"""
+
+import os
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+from core.chunks import join_audio
+from core.engine_types import TextTeam
+from core.scheduler import Priority, Scheduler
+
+
+log = logging.getLogger(__name__)
+
+# Максимальный размер одного файла выгрузки, Telegram не примет больше 50МБ.
+EXPORT_MAX_BYTES: int = 45 * 1024 * 1024
+# Потоки для прогресса и склейки томов, общие для всех выгрузок.
+EXPORT_THREADS: int = 2
+
+# Прогресс может звать Telegram, а склейка читает всю книгу,
+# поэтому они не выполняются в потоках планировщика.
+_EXECUTOR = ThreadPoolExecutor(EXPORT_THREADS, thread_name_prefix="export")
+
+
+def split_volumes(
+    parts: list[str], max_bytes: int = EXPORT_MAX_BYTES
+) -> list[list[str]]:
+    """Делим файлы страниц по порядку на тома не больше max_bytes."""
+
+    volumes: list[list[str]] = []
+    size: int = 0
+    for part in parts:
+        part_size = os.path.getsize(part)
+        if not volumes or (size + part_size > max_bytes and volumes[-1]):
+            volumes.append([])
+            size = 0
+        volumes[-1].append(part)
+        size += part_size
+    return volumes
+
+
+class Export:
+    """
+    Выгрузка диапазона страниц.
+    reader: TextTeam - обработчик файла, нужен кеш озвучки,
+    pages: range - номера страниц,
+    target: Path - файлы томов называются 'target-номер.расширение',
+    progress: Callable - вызывается с числом готовых страниц и числом всех,
+    прогресс и склейка томов выполняются в потоках выгрузки.
+    """
+
+    def __init__(
+        self,
+        reader: TextTeam,
+        pages: range,
+        target: Path,
+        max_bytes: int = EXPORT_MAX_BYTES,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> None:
+        if reader.audio_cache is None:
+            raise ValueError("Выгрузка страниц работает только с кешем озвучки.")
+        self.reader: TextTeam = reader
+        self.pages: range = pages
+        self.target: Path = Path(target)
+        self.max_bytes: int = max_bytes
+        self.progress: Callable[[int, int], None] | None = progress
+        self.done: int = 0
+        self.__shown: int = 0
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def submit(self, scheduler: Scheduler, user: str) -> Future:
+        """
+        Ставим страницы в очередь планировщика с пакетным приоритетом.
+        Вернёт Future со списком файлов томов,
+        его отмена отменяет ещё не начатые страницы.
+        """
+
+        result: Future = Future()
+        futures: list[Future] = []
+        for num_el in self.pages:
+            text: str = self.reader.page_text(num_el)
+            path: Path | None = self.reader.cached(text)
+            if path is not None:
+                future: Future = Future()
+                future.set_result(path)
+            else:
+                future = scheduler.submit(
+                    user,
+                    Priority.BATCH,
+                    self.reader.synthesis_job(text),
+                    then=self.reader.commit,
+                )
+            futures.append(future)
+        result.parts = futures
+
+        def cancel(future: Future) -> None:
+            if future.cancelled():
+                for part in futures:
+                    part.cancel()
+
+        def finish(part: Future) -> None:
+            try:
+                part.result()
+            except BaseException as e:
+                if not result.done():
+                    result.set_exception(e)
+                return
+            with self.__lock:
+                self.done += 1
+                done = self.done
+            if done == len(self):
+                _EXECUTOR.submit(self.__finish, futures, result)
+            elif self.progress is not None:
+                _EXECUTOR.submit(self.__report, done)
+
+        result.add_done_callback(cancel)
+        for future in futures:
+            future.add_done_callback(finish)
+        if not futures:
+            result.set_result([])
+        return result
+
+    def __report(self, done: int) -> None:
+        """Сообщаем прогресс, устаревшие значения не показываем."""
+
+        with self.__lock:
+            if done <= self.__shown:
+                return
+            self.__shown = done
+        try:
+            self.progress(done, len(self))
+        except Exception as e:
+            log.warning("Прогресс выгрузки %s не показан: %s", self.target.name, e)
+
+    def __finish(self, futures: list[Future], result: Future) -> None:
+        """Все страницы готовы: склеиваем тома."""
+
+        if self.progress is not None:
+            self.__report(len(self))
+        if result.done():
+            return
+        try:
+            result.set_result(self.join([str(f.result()) for f in futures]))
+        except BaseException as e:
+            if not result.done():
+                result.set_exception(e)
+
+    def join(self, parts: list[str]) -> list[Path]:
+        """Склеиваем страницы по порядку в тома."""
+
+        suffix: str = Path(parts[0]).suffix
+        files: list[Path] = []
+        for num, volume in enumerate(split_volumes(parts, self.max_bytes), 1):
+            name = self.target.with_name(f"{self.target.name}-{num}{suffix}")
+            files.append(Path(join_audio(volume, str(name))))
+        log.info("Выгрузка %s готова: %s файлов", self.target.name, len(files))
+        return files
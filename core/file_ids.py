@@ -0,0 +1,169 @@
+"""
+Идентификаторы уже загруженных в Telegram файлов.
+Telegram отвечает на отправку file_id, по нему файл отправляется повторно
+без загрузки. Ключ - хеш содержимого озвучки, для файлов кеша озвучки -
+их ключ audio_key из имени, он уже определяет содержимое и файл не читается.
+Страница популярной книги загружается один раз для всех пользователей.
+Хранится в SQLite.
+"""
+
+import re
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from core.index import hash_file
+from core.voices import AudioData
+
+
+log = logging.getLogger(__name__)
+
+# Файл базы в temp_path бота.
+FILE_IDS_NAME: str = "file_ids.sqlite"
+# Сколько последних использованных file_id хранить.
+FILE_IDS_KEEP: int = 100_000
+# Лишние записи удаляются раз в столько добавлений.
+_TRIM_EVERY: int = 1000
+# Имя файла кеша озвучки: audio_key и расширение.
+_AUDIO_KEY = re.compile(r"[0-9a-f]{64}")
+# Ответы Telegram 400 по которым file_id считается устаревшим.
+_STALE_ERRORS: tuple[str, ...] = (
+    "wrong file identifier",
+    "wrong remote file identifier",
+    "file not found",
+    "can't use file of type",
+)
+
+
+def is_stale(error: Exception) -> bool:
+    """
+    Отверг ли Telegram сам file_id. Остальные ошибки (429, бот заблокирован,
+    чат не найден) к file_id отношения не имеют, его забывать нельзя.
+    """
+
+    if getattr(error, "error_code", None) != 400:
+        return False
+    description: str = str(getattr(error, "description", "")).lower()
+    return any(marker in description for marker in _STALE_ERRORS)
+
+
+class FileIdCache:
+    """
+    Хеш содержимого файла -> file_id в Telegram.
+    path: Path - файл базы, keep: int - сколько записей хранить,
+    audio_root: Path | None - директория кеша озвучки, её файлы не хешируются,
+    kind - как файл отправлялся: audio, voice, document,
+    file_id одного вида нельзя отправить другим методом.
+    hits, misses, stale: int - счётчики, stale - file_id отвергнутые Telegram.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        keep: int = FILE_IDS_KEEP,
+        audio_root: str | Path | None = None,
+    ) -> None:
+        self.path: Path = Path(path)
+        self.keep: int = keep
+        self.audio_root: Path | None = (
+            Path(audio_root).resolve() if audio_root is not None else None
+        )
+        self.hits: int = 0
+        self.misses: int = 0
+        self.stale: int = 0
+        self.__puts: int = 0
+        self.__lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.__db = sqlite3.connect(self.path, check_same_thread=False)
+        # Запись на каждую отправку, без fsync на каждый commit.
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS file_ids (digest TEXT, kind TEXT, "
+            "file_id TEXT, used REAL, PRIMARY KEY (digest, kind))"
+        )
+        self.__db.commit()
+
+    def digest(self, audio: str | Path | AudioData) -> str:
+        """
+        Ключ озвучки из кеша (в том числе в памяти) - её audio_key,
+        остальное - хеш содержимого, файлы не запоминаются в file_hash.
+        """
+
+        name = Path(audio.file_name if isinstance(audio, AudioData) else audio)
+        if (
+            self.audio_root is not None
+            and _AUDIO_KEY.fullmatch(name.stem)
+            and name.parent.resolve() == self.audio_root
+        ):
+            return name.stem
+        if isinstance(audio, AudioData):
+            return hashlib.sha256(audio.data).hexdigest()
+        return hash_file(audio)
+
+    def get(self, digest: str, kind: str = "audio") -> str | None:
+        """file_id файла или None, отмечает использование."""
+
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT file_id FROM file_ids WHERE digest = ? AND kind = ?",
+                (digest, kind),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.__db.execute(
+                "UPDATE file_ids SET used = ? WHERE digest = ? AND kind = ?",
+                (time.time(), digest, kind),
+            )
+            self.__db.commit()
+        return row[0]
+
+    def put(self, digest: str, file_id: str, kind: str = "audio") -> None:
+        """Запоминаем file_id, давно не использованные сверх keep удаляются."""
+
+        with self.__lock:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO file_ids VALUES (?, ?, ?, ?)",
+                (digest, kind, file_id, time.time()),
+            )
+            self.__puts += 1
+            if self.__puts % _TRIM_EVERY == 0:
+                self.__db.execute(
+                    "DELETE FROM file_ids WHERE rowid NOT IN "
+                    "(SELECT rowid FROM file_ids ORDER BY used DESC LIMIT ?)",
+                    (self.keep,),
+                )
+            self.__db.commit()
+
+    def discard(self, digest: str, kind: str = "audio") -> None:
+        """Забываем file_id который Telegram не принял, например после смены токена."""
+
+        with self.__lock:
+            self.stale += 1
+            self.__db.execute(
+                "DELETE FROM file_ids WHERE digest = ? AND kind = ?", (digest, kind)
+            )
+            self.__db.commit()
+        log.info("file_id %s %s устарел.", kind, digest[:16])
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__db.execute("SELECT COUNT(*) FROM file_ids").fetchone()[0]
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__db.close()
+
+    def stats(self) -> dict[str, int]:
+        """Счётчики для метрик."""
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "ids": len(self),
+        }
@@ -0,0 +1,224 @@
+"""
+Формат озвучки после синтеза.
+mp3 - то что выдал генератор голоса, без перекодирования.
+opus - речь в Ogg/Opus с битрейтом OPUS_BITRATE, в разы меньше mp3,
+отправляется голосовым сообщением. Кодирует ffmpeg, если его нет - mp3.
+Формат задаётся переменными окружения speaker_audio_format и
+speaker_opus_bitrate, их видят и процессы пула озвучки.
+"""
+
+import os
+import shutil
+import logging
+import subprocess
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+
+log = logging.getLogger(__name__)
+
+FFMPEG: str | None = shutil.which("ffmpeg")
+# Битрейт речи в Opus, для голоса хватает 16-32 кбит/с.
+OPUS_BITRATE: str = "24k"
+
+
+class EncodeError(RuntimeError):
+    """ffmpeg не смог перекодировать озвучку."""
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """
+    Формат файлов озвучки.
+    name: str - имя формата, suffix: str - расширение файлов,
+    voice: bool - отправлять голосовым сообщением,
+    bitrate: str | None - битрейт кодирования, None - без перекодирования.
+    """
+
+    name: str
+    suffix: str
+    voice: bool = False
+    bitrate: str | None = None
+
+    @property
+    def encoded(self) -> bool:
+        """Нужно ли перекодировать выход генератора голоса."""
+        return self.bitrate is not None
+
+    @property
+    def tag(self) -> str:
+        """Метка формата для ключа кеша озвучки."""
+        return f"{self.name}-{self.bitrate}" if self.encoded else ""
+
+    def ffmpeg_args(self, source: str, target: str) -> list[str]:
+        """Команда перекодирования source в target, 'pipe:0' - читать stdin."""
+
+        return [
+            FFMPEG or "ffmpeg",
+            "-v", "error", "-y", "-i", source, "-vn", "-ac", "1",
+            "-c:a", "libopus", "-b:a", str(self.bitrate), "-application", "voip",
+            "-f", "ogg", target,
+        ]  # fmt: skip
+
+
+MP3 = AudioFormat("mp3", ".mp3")
+
+
+def opus(bitrate: str = OPUS_BITRATE) -> AudioFormat:
+    return AudioFormat("opus", ".ogg", voice=True, bitrate=bitrate)
+
+
+def audio_format(name: str | None = None, bitrate: str | None = None) -> AudioFormat:
+    """
+    Формат по имени, по умолчанию из окружения.
+    opus без ffmpeg недоступен, тогда mp3.
+    """
+
+    name = name or os.environ.get("speaker_audio_format", MP3.name)
+    bitrate = bitrate or os.environ.get("speaker_opus_bitrate", OPUS_BITRATE)
+    if name == MP3.name:
+        return MP3
+    if name != "opus":
+        log.warning("Неизвестный формат озвучки %s, пишем mp3.", name)
+        return MP3
+    if FFMPEG is None:
+        log.warning("Нет ffmpeg, озвучка будет в mp3 вместо opus.")
+        return MP3
+    return opus(bitrate)
+
+
+def is_voice(file_name: str | Path) -> bool:
+    """Файл отправляется голосовым сообщением."""
+    return Path(file_name).suffix == ".ogg"
+
+
+# Формат озвучки процесса.
+AUDIO_FORMAT: AudioFormat = audio_format()
+
+
+def _run(
+    args: list[str], stdin: int | None = None, stdout: int = subprocess.DEVNULL
+) -> subprocess.Popen:
+    if FFMPEG is None:
+        raise EncodeError("ffmpeg не найден.")
+    return subprocess.Popen(args, stdin=stdin, stdout=stdout, stderr=subprocess.PIPE)
+
+
+def _wait(process: subprocess.Popen) -> None:
+    error: bytes = process.stderr.read()
+    if process.wait() != 0:
+        raise EncodeError(error.decode(errors="replace").strip() or "ffmpeg упал.")
+
+
+def encode_file(source: str | Path, target: str | Path, fmt: AudioFormat) -> str:
+    """Перекодируем файл озвучки."""
+
+    process = _run(fmt.ffmpeg_args(str(source), str(target)))
+    _wait(process)
+    return str(target)
+
+
+def _feed(
+    process: subprocess.Popen, chunks: Iterable[bytes], readers: list[threading.Thread]
+) -> None:
+    """
+    Пишем куски в stdin ffmpeg и ждём его, readers читают его выход в фоне.
+    Если ffmpeg упал и закрыл вход - EncodeError с его stderr, а не BrokenPipeError.
+    """
+
+    errors: list[bytes] = []
+    # stderr читаем в фоне, иначе ffmpeg встанет на заполненном канале.
+    readers.append(
+        threading.Thread(target=lambda: errors.append(process.stderr.read()))
+    )
+    for reader in readers:
+        reader.start()
+    broken: bool = False
+    try:
+        for chunk in chunks:
+            process.stdin.write(chunk)
+    except BrokenPipeError:
+        broken = True
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            broken = True
+        for reader in readers:
+            reader.join()
+    if process.wait() != 0 or broken:
+        message = b"".join(errors).decode(errors="replace").strip()
+        raise EncodeError(message or "ffmpeg упал.")
+
+
+def encode_stream(chunks: Iterable[bytes], target: str | Path, fmt: AudioFormat) -> str:
+    """
+    Кодируем звук по мере синтеза: куски от генератора голоса
+    сразу уходят в ffmpeg без промежуточного файла.
+    """
+
+    process = _run(fmt.ffmpeg_args("pipe:0", str(target)), stdin=subprocess.PIPE)
+    _feed(process, chunks, [])
+    return str(target)
+
+
+def encode_bytes(chunks: Iterable[bytes], fmt: AudioFormat) -> bytes:
+    """Кодируем звук из памяти в память, ffmpeg пишет Ogg в stdout."""
+
+    process = _run(
+        fmt.ffmpeg_args("pipe:0", "pipe:1"),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    output: list[bytes] = []
+    _feed(
+        process,
+        chunks,
+        [threading.Thread(target=lambda: output.append(process.stdout.read()))],
+    )
+    return b"".join(output)
+
+
+def concat_ogg(parts: list[str], target: str) -> str:
+    """
+    Склеиваем куски Ogg/Opus без перекодирования.
+    Простая склейка файлов дала бы цепочку потоков Ogg,
+    которую многие плееры обрывают на первом куске.
+    """
+
+    listing = Path(target).with_name(f".{Path(target).name}.txt")
+    listing.write_text(
+        "".join(f"file '{Path(part).resolve().as_posix()}'\n" for part in parts),
+        encoding="utf-8",
+    )
+    try:
+        args = [FFMPEG or "ffmpeg", "-v", "error", "-y", "-f", "concat", "-safe", "0"]
+        process = _run([*args, "-i", str(listing), "-c", "copy", "-f", "ogg", target])
+        _wait(process)
+    finally:
+        listing.unlink(missing_ok=True)
+    return target
+
+
+def ogg_seconds(file_name: str | Path) -> float:
+    """Длительность Ogg/Opus по позиции последней страницы минус pre-skip."""
+
+    with open(file_name, "rb") as f:
+        head = f.read(64)
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 65536))
+        tail = f.read()
+    last = tail.rfind(b"OggS")
+    if last < 0 or len(tail) < last + 14:
+        return 0.0
+    granule = int.from_bytes(tail[last + 6 : last + 14], "little")
+    pre_skip = 0
+    found = head.find(b"OpusHead")
+    if found >= 0:
+        pre_skip = int.from_bytes(head[found + 10 : found + 12], "little")
+    return max(0, granule - pre_skip) / 48000
@@ -0,0 +1,233 @@
+"""
+Индекс текста страниц книги.
+Строится один раз при загрузке и хранится рядом с файлом в SQLite,
+ключ - хеш содержимого файла, поэтому одинаковые книги делят один индекс.
+"""
+
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable
+
+
+log = logging.getLogger(__name__)
+
+INDEX_SUFFIX: str = ".index.sqlite"
+# Каталог индексов, None - рядом с файлом книги.
+INDEX_DIR: Path | None = None
+# Сколько индексов держим открытыми, давно не использованные закрываются.
+INDEXES_MAX: int = 64
+_HASH_CHUNK: int = 1024 * 1024
+
+_hashes: dict[tuple, str] = {}
+_indexes: OrderedDict[str, "PageIndex"] = OrderedDict()
+# Блокировки построения индекса по хешу книги: большая книга
+# не задерживает первое обращение к другим.
+_building: dict[str, threading.Lock] = {}
+_lock = threading.Lock()
+
+
+def file_key(path: str | Path) -> tuple:
+    """Ключ файла для запоминания хеша: путь + mtime + размер."""
+
+    stat = os.stat(path)
+    return (str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+def remember_hash(path: str | Path, digest: str) -> None:
+    """Запоминаем уже посчитанный хеш файла."""
+
+    _hashes[file_key(path)] = digest
+
+
+def file_hash(path: str | Path) -> str:
+    """sha256 содержимого файла, повторно файл не читается пока он не изменился."""
+
+    key = file_key(path)
+    digest: str | None = _hashes.get(key)
+    if digest:
+        return digest
+    digest = _hashes[key] = hash_file(path)
+    return digest
+
+
+def hash_file(path: str | Path) -> str:
+    """sha256 содержимого файла без запоминания, для короткоживущих файлов."""
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_HASH_CHUNK):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def normalize(text: str | None) -> str:
+    """Схлопываем пробелы и выкидываем пустые строки."""
+
+    if not text:
+        return ""
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class PageIndex:
+    """
+    Нормализованный текст всех страниц книги.
+    path: Path - файл индекса,
+    digest: str - хеш содержимого книги,
+    empty: bytes - битовая карта пустых страниц.
+    Закрытый индекс снова открывается при обращении, файл только читается.
+    """
+
+    def __init__(self, path: Path, digest: str) -> None:
+        self.path: Path = path
+        self.digest: str = digest
+        self.__lock = threading.Lock()
+        self.__db: sqlite3.Connection | None = None
+        with self.__lock:
+            row = (
+                self.__connection().execute("SELECT pages, empty FROM meta").fetchone()
+            )
+        self.__pages: int = row[0]
+        self.empty: bytes = row[1]
+
+    def __connection(self) -> sqlite3.Connection:
+        """Соединение с файлом индекса, вызывается под __lock."""
+
+        if self.__db is None:
+            uri = f"{Path(self.path).resolve().as_uri()}?mode=ro"
+            self.__db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return self.__db
+
+    def __len__(self) -> int:
+        return self.__pages
+
+    def __getitem__(self, num_el: int) -> str:
+        return self.text(num_el)
+
+    def is_empty(self, num_el: int) -> bool:
+        """Пустая ли страница."""
+
+        if not 0 <= num_el < self.__pages:
+            raise IndexError
+        return bool(self.empty[num_el // 8] >> (num_el % 8) & 1)
+
+    def text(self, num_el: int) -> str:
+        """Текст страницы, пустая строка если текста нет."""
+
+        if not 0 <= num_el < self.__pages:
+            raise IndexError
+        if self.is_empty(num_el):
+            return ""
+        with self.__lock:
+            row = (
+                self.__connection()
+                .execute("SELECT text FROM pages WHERE num = ?", (num_el,))
+                .fetchone()
+            )
+        return row[0]
+
+    def close(self) -> None:
+        """Закрываем соединение с файлом индекса."""
+
+        with self.__lock:
+            if self.__db is not None:
+                self.__db.close()
+                self.__db = None
+
+    @staticmethod
+    def write(path: Path, digest: str, pages: Iterable[str]) -> None:
+        """Пишем индекс во временный файл и атомарно переименовываем."""
+
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        db = sqlite3.connect(tmp)
+        try:
+            db.execute("CREATE TABLE meta (digest TEXT, pages INTEGER, empty BLOB)")
+            db.execute("CREATE TABLE pages (num INTEGER PRIMARY KEY, text TEXT)")
+            empty = bytearray()
+            count = 0
+            for count, text in enumerate(map(normalize, pages), start=1):
+                num = count - 1
+                if num % 8 == 0:
+                    empty.append(0)
+                if not text:
+                    empty[-1] |= 1 << (num % 8)
+                    continue
+                db.execute("INSERT INTO pages VALUES (?, ?)", (num, text))
+            db.execute(
+                "INSERT INTO meta VALUES (?, ?, ?)", (digest, count, bytes(empty))
+            )
+            db.commit()
+        finally:
+            db.close()
+        os.replace(tmp, path)
+
+
+def index_path(file_name: str | Path, digest: str) -> Path:
+    """Путь к индексу книги: в INDEX_DIR или рядом с файлом книги."""
+
+    if INDEX_DIR is not None:
+        INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        return Path(INDEX_DIR, f"{digest}{INDEX_SUFFIX}")
+    return Path(file_name).with_name(f"{digest}{INDEX_SUFFIX}")
+
+
+def get_index(
+    file_name: str | Path, extract: Callable[[], Iterable[str]]
+) -> PageIndex:
+    """
+    Отдаём индекс книги, при первом обращении строим его.
+    extract - возвращает текст страниц книги по порядку.
+    """
+
+    digest = file_hash(file_name)
+    index: PageIndex | None = _opened(digest)
+    if index is not None:
+        return index
+    with _lock:
+        build = _building.setdefault(digest, threading.Lock())
+    try:
+        with build:
+            index = _opened(digest)
+            if index is not None:
+                return index
+            path = index_path(file_name, digest)
+            if not path.is_file():
+                log.info("Строим индекс страниц для %s", file_name)
+                PageIndex.write(path, digest, extract())
+            index = PageIndex(path, digest)
+            with _lock:
+                _indexes[digest] = index
+                evicted = [
+                    _indexes.popitem(last=False)[1]
+                    for _ in range(len(_indexes) - INDEXES_MAX)
+                ]
+    finally:
+        with _lock:
+            _building.pop(digest, None)
+    for old in evicted:
+        old.close()
+    return index
+
+
+def _opened(digest: str) -> PageIndex | None:
+    """Уже открытый индекс, отмечает обращение к нему."""
+
+    with _lock:
+        index: PageIndex | None = _indexes.get(digest)
+        if index is not None:
+            _indexes.move_to_end(digest)
+        return index
+
+
+def drop_index(digest: str) -> None:
+    """Забываем индекс удалённой книги и закрываем его."""
+
+    with _lock:
+        index: PageIndex | None = _indexes.pop(digest, None)
+    if index is not None:
+        index.close()
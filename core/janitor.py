@@ -0,0 +1,132 @@
+"""
+Уборка temp_path в фоне.
+Следит за квотой и возрастом озвучки, удаляет давно не открывавшиеся
+загруженные файлы и индексы книг которых больше нет.
+"""
+
+import os
+import time
+import logging
+import threading
+from pathlib import Path
+from core.audio import AudioCache
+from core.documents import DocumentStore
+from core.index import INDEX_SUFFIX, drop_index, file_hash
+
+
+log = logging.getLogger(__name__)
+
+# Как часто убираемся, секунды.
+JANITOR_INTERVAL: float = 10 * 60
+# Сколько живёт озвучка к которой не обращались, секунды.
+AUDIO_MAX_AGE: float = 7 * 24 * 60 * 60
+# Сколько живёт загруженный файл который не открывали, секунды.
+UPLOAD_MAX_AGE: float = 30 * 24 * 60 * 60
+
+
+class Janitor:
+    """
+    Фоновая уборка временных файлов.
+    temp_path: Path - где лежат загруженные файлы и индексы,
+    audio_cache: AudioCache - озвучка, квоту по размеру она держит сама,
+    documents: DocumentStore | None - книги, ссылки к которым давно
+    не обращались убираются, книга удаляется вместе с последней ссылкой.
+    """
+
+    def __init__(
+        self,
+        temp_path: Path,
+        audio_cache: AudioCache,
+        interval: float = JANITOR_INTERVAL,
+        audio_max_age: float = AUDIO_MAX_AGE,
+        upload_max_age: float = UPLOAD_MAX_AGE,
+        documents: DocumentStore | None = None,
+    ) -> None:
+        self.temp_path: Path = temp_path
+        self.audio_cache: AudioCache = audio_cache
+        self.interval: float = interval
+        self.audio_max_age: float = audio_max_age
+        self.upload_max_age: float = upload_max_age
+        self.documents: DocumentStore | None = documents
+        self.__stop = threading.Event()
+        self.__thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Запускаем уборку в фоновом потоке."""
+
+        if self.__thread is not None and self.__thread.is_alive():
+            return
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__run, name="janitor", daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """Останавливаем фоновый поток."""
+
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def __run(self) -> None:
+        while not self.__stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                log.exception(
+                    "Уборка не удалась.", exc_info=False, extra={"Exception": e}
+                )
+            self.__stop.wait(self.interval)
+
+    def run_once(self) -> dict[str, int]:
+        """Одна уборка, вернёт сколько чего удалено."""
+
+        result = {
+            "audio": self.audio_cache.sweep(self.audio_max_age),
+            "uploads": 0,
+            "indexes": 0,
+            "documents": 0,
+        }
+        if self.documents is not None:
+            result["documents"] = self.documents.expire(self.upload_max_age)
+            self.documents.flush()
+        deadline: float = time.time() - self.upload_max_age
+        digests: set[str] = set()
+        indexes: list[os.DirEntry] = []
+        for entry in os.scandir(self.temp_path):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(INDEX_SUFFIX):
+                indexes.append(entry)
+            elif entry.name.startswith("temp_"):
+                if entry.stat().st_mtime < deadline:
+                    result["uploads"] += _remove(entry.path)
+                else:
+                    digests.add(file_hash(entry.path))
+        # Индексы книг хранилища лежат рядом с книгами.
+        if self.documents is not None:
+            digests |= self.documents.digests()
+            indexes.extend(
+                entry
+                for entry in os.scandir(self.documents.root)
+                if entry.is_file() and entry.name.endswith(INDEX_SUFFIX)
+            )
+        for entry in indexes:
+            digest = entry.name[: -len(INDEX_SUFFIX)]
+            if digest not in digests and entry.stat().st_mtime < deadline:
+                drop_index(digest)
+                result["indexes"] += _remove(entry.path)
+        if any(result.values()):
+            log.info("Уборка temp: %s", result)
+        return result
+
+
+def _remove(path: str) -> int:
+    """Удаляем файл, открытый файл (на Windows) оставляем до следующей уборки."""
+
+    try:
+        os.remove(path)
+    except OSError as e:
+        log.debug("Не удалось удалить %s: %s", path, e)
+        return 0
+    return 1
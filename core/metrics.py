@@ -0,0 +1,258 @@
+"""
+Метрики бота в текстовом формате Prometheus.
+Гистограммы времени этапов: загрузка, разбор pdf, извлечение текста,
+озвучка и отправка, счётчики ошибок и снимки статистики кешей и очередей.
+Отдаются по http на METRICS_HOST:METRICS_PORT и админской командой бота.
+"""
+
+import math
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator
+
+
+log = logging.getLogger(__name__)
+
+# Где слушает http сервер метрик, наружу не открываем.
+METRICS_HOST: str = "127.0.0.1"
+METRICS_PORT: int = 9108
+# Границы корзин гистограмм в секундах.
+BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf
+)  # fmt: skip
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], **extra) -> str:
+    """Метки в формате '{a="1",b="2"}'."""
+
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Счётчик с метками, только растёт."""
+
+    kind: str = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name: str = name
+        self.help: str = help
+        self.labels: tuple[str, ...] = labels
+        self.__values: dict[tuple[str, ...], float] = {}
+        self.__lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        return self.__values.get(key, 0)
+
+    def samples(self) -> Iterator[str]:
+        with self.__lock:
+            values = sorted(self.__values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labels, key)} {_number(value)}"
+
+
+class Histogram:
+    """Гистограмма с метками, корзины накопительные как в Prometheus."""
+
+    kind: str = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = BUCKETS,
+    ) -> None:
+        self.name: str = name
+        self.help: str = help
+        self.labels: tuple[str, ...] = labels
+        self.buckets: tuple[float, ...] = buckets
+        self.__values: dict[tuple[str, ...], list] = {}
+        self.__lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with self.__lock:
+            counts, total = self.__values.setdefault(
+                key, [[0] * len(self.buckets), 0.0]
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            self.__values[key][1] = total + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Замеряем время блока."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        found = self.__values.get(key)
+        return sum(found[0]) if found else 0
+
+    def samples(self) -> Iterator[str]:
+        with self.__lock:
+            values = sorted((k, (list(c), s)) for k, (c, s) in self.__values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _labels(self.labels, key, le=_number(bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, key)} {cumulative}"
+
+
+class Stats:
+    """
+    Снимок словаря статистики (например AudioCache.stats()) при каждом чтении,
+    ключи словаря становятся метриками 'name_ключ' типа gauge.
+    """
+
+    kind: str = "gauge"
+
+    def __init__(self, name: str, help: str, func: Callable[[], dict]) -> None:
+        self.name: str = name
+        self.help: str = help
+        self.func: Callable[[], dict] = func
+
+    def samples(self) -> Iterator[str]:
+        try:
+            values = self.func()
+        except Exception as e:
+            log.debug("Статистика %s недоступна: %s", self.name, e)
+            return
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)):
+                yield f"# HELP {self.name}_{key} {self.help} {key}"
+                yield f"# TYPE {self.name}_{key} gauge"
+                yield f"{self.name}_{key} {_number(value)}"
+
+
+class Registry:
+    """Все метрики процесса, повторная регистрация имени заменяет метрику."""
+
+    def __init__(self) -> None:
+        self.__metrics: dict[str, Counter | Histogram | Stats] = {}
+
+    def register(self, metric):
+        self.__metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+
+        lines: list[str] = []
+        for metric in list(self.__metrics.values()):
+            if not isinstance(metric, Stats):
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Время этапов обработки.
+STAGE_SECONDS: Histogram = REGISTRY.register(
+    Histogram(
+        "speaker_stage_seconds",
+        "Время этапов: download, index, parse, extract, page, synthesis, queue, send,"
+        " update.",
+        ("stage", "speaker", "reader"),
+    )
+)
+# Ошибки по этапам.
+ERRORS: Counter = REGISTRY.register(
+    Counter("speaker_errors_total", "Ошибки по этапам.", ("stage",))
+)
+
+
+def stats(name: str, help: str, func: Callable[[], dict]) -> Stats:
+    """Регистрируем снимок статистики."""
+
+    return REGISTRY.register(Stats(name, help, func))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        log.debug("metrics: " + format, *args)
+
+
+class MetricsServer:
+    """Http сервер метрик в фоновом потоке."""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.__server: ThreadingHTTPServer | None = None
+
+    def start(self) -> None:
+        """Запускаем сервер, если порт занят - бот работает без него."""
+
+        if self.__server is not None:
+            return
+        try:
+            self.__server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        except OSError as e:
+            log.error("Сервер метрик не запущен на %s:%s: %s", self.host, self.port, e)
+            return
+        self.port = self.__server.server_address[1]
+        threading.Thread(
+            target=self.__server.serve_forever, name="metrics", daemon=True
+        ).start()
+        log.info("Метрики на http://%s:%s/metrics", self.host, self.port)
+
+    def stop(self) -> None:
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+
+def summary() -> str:
+    """Короткий вид метрик для чата: без корзин гистограмм и комментариев."""
+
+    return "\n".join(
+        line
+        for line in REGISTRY.render().splitlines()
+        if line and not line.startswith("#") and "_bucket{" not in line
+    )
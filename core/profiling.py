@@ -0,0 +1,181 @@
+"""
+Профилирование медленных запросов по требованию.
+Включается переменной окружения speaker_profile=1 или админской командой.
+Перелистывание страницы, построение индекса и озвучка выполняются
+под cProfile, память отслеживает tracemalloc. Если запрос дольше порога,
+в PROFILE_DIR пишется дамп с пользователем, хешем книги и номером страницы.
+Выключенный режим стоит одну проверку флага.
+"""
+
+import os
+import time
+import logging
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import ContextManager, Iterator
+from core.index import file_hash
+
+
+log = logging.getLogger(__name__)
+
+# Куда пишутся дампы.
+PROFILE_DIR: Path = Path(__file__).resolve().parent.with_name("temp") / "profiles"
+# Запросы дольше этого профилируются в дамп, секунды.
+PROFILE_THRESHOLD: float = float(os.environ.get("speaker_profile_threshold", 5))
+# Сколько последних дампов хранить.
+PROFILE_KEEP: int = 200
+# Сколько строк с наибольшим расходом памяти писать в дамп.
+MEMORY_TOP: int = 25
+
+_NULL = nullcontext()
+
+
+class Profiler:
+    """
+    Профилировщик медленных запросов.
+    enabled: bool - включен ли режим, выключенный ничего не замеряет,
+    threshold: float - порог длительности запроса в секундах,
+    root: Path - каталог дампов, dumps: int - сколько дампов записано.
+    """
+
+    def __init__(
+        self,
+        root: Path = PROFILE_DIR,
+        threshold: float = PROFILE_THRESHOLD,
+        enabled: bool = False,
+    ) -> None:
+        self.root: Path = Path(root)
+        self.threshold: float = threshold
+        self.enabled: bool = False
+        self.dumps: int = 0
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        if enabled:
+            self.enable()
+
+    def enable(self) -> None:
+        """Включаем профилирование и отслеживание памяти."""
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+        log.info("Профилирование включено, порог %s с.", self.threshold)
+
+    def disable(self) -> None:
+        """Выключаем, память больше не отслеживается."""
+
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        log.info("Профилирование выключено.")
+
+    def profile(
+        self,
+        kind: str,
+        user: str = "",
+        file_name: str | Path | None = None,
+        page: int | None = None,
+        tag: str = "",
+    ) -> ContextManager:
+        """
+        Профилируем блок, kind - что делаем: page, index, synthesis,
+        tag - метка для имени дампа когда нет пользователя и книги.
+        Вложенный блок в том же потоке входит в профиль внешнего.
+        """
+
+        if not self.enabled or getattr(self.__local, "active", False):
+            return _NULL
+        return self.__profile(kind, user, file_name, page, tag)
+
+    @contextmanager
+    def __profile(
+        self,
+        kind: str,
+        user: str,
+        file_name: str | Path | None,
+        page: int | None,
+        tag: str,
+    ) -> Iterator[None]:
+        profiler = cProfile.Profile()
+        memory: int = tracemalloc.get_traced_memory()[0]
+        self.__local.active = True
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            self.__local.active = False
+            if elapsed >= self.threshold:
+                try:
+                    self.__dump(
+                        profiler, elapsed, memory, kind, user, file_name, page, tag
+                    )
+                except Exception as e:
+                    log.warning("Не удалось записать профиль: %s", e)
+
+    def __dump(
+        self,
+        profiler: cProfile.Profile,
+        elapsed: float,
+        memory: int,
+        kind: str,
+        user: str,
+        file_name: str | Path | None,
+        page: int | None,
+        tag: str,
+    ) -> Path:
+        """Пишем профиль '.prof' и сводку по памяти '.txt' рядом."""
+
+        digest: str = ""
+        if file_name is not None and os.path.isfile(file_name):
+            digest = file_hash(file_name)[:16]
+        parts = [
+            time.strftime("%Y%m%d-%H%M%S"),
+            kind,
+            user or "-",
+            digest or "-",
+            "-" if page is None else f"p{page}",
+            *filter(None, [tag]),
+            f"{elapsed:.1f}s",
+        ]
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = Path(self.root, f"{'_'.join(parts)}_{os.getpid()}.prof")
+        profiler.dump_stats(path)
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"kind: {kind}",
+            f"user: {user}",
+            f"file: {file_name}",
+            f"sha256: {file_hash(file_name) if digest else ''}",
+            f"page: {page}",
+            f"tag: {tag}",
+            f"elapsed_s: {elapsed:.3f}",
+            f"memory_delta_bytes: {current - memory}",
+            f"memory_peak_bytes: {peak}",
+            "",
+        ]
+        if tracemalloc.is_tracing():
+            stats = tracemalloc.take_snapshot().statistics("lineno")[:MEMORY_TOP]
+            lines.extend(str(stat) for stat in stats)
+        path.with_suffix(".txt").write_text("\n".join(lines), encoding="utf-8")
+        with self.__lock:
+            self.dumps += 1
+            self.__rotate()
+        log.info("Медленный запрос %s %.1f с, профиль %s", kind, elapsed, path.name)
+        return path
+
+    def __rotate(self) -> None:
+        """Оставляем только PROFILE_KEEP последних дампов."""
+
+        dumps = sorted(self.root.glob("*.prof"), key=lambda p: p.stat().st_mtime)
+        for old in dumps[:-PROFILE_KEEP]:
+            for path in (old, old.with_suffix(".txt")):
+                path.unlink(missing_ok=True)
+
+
+PROFILER = Profiler(enabled=os.environ.get("speaker_profile") == "1")
@@ -0,0 +1,110 @@
+"""
+Ленивый реестр обработчиков: модуль обработчика импортируется
+при первом обращении по имени, а не при запуске бота.
+Сторонние обработчики подключаются через entry points пакетов.
+"""
+
+import logging
+import threading
+from importlib import import_module
+from importlib.metadata import entry_points
+from typing import Any, Iterator, Mapping
+
+
+log = logging.getLogger(__name__)
+
+# Группы entry points для сторонних генераторов речи и обработчиков файлов.
+SPEAKERS_GROUP: str = "speaker.speakers"
+READERS_GROUP: str = "speaker.readers"
+
+
+def load_object(ref: str) -> Any:
+    """Импортируем объект по ссылке 'модуль:атрибут'."""
+
+    module, _, attr = ref.partition(":")
+    obj: Any = import_module(module)
+    for name in filter(None, attr.split(".")):
+        obj = getattr(obj, name)
+    return obj
+
+
+class LazyRegistry(Mapping):
+    """
+    Словарь имя -> обработчик, значения задаются ссылками 'модуль:атрибут'
+    или готовыми объектами. Имена доступны без импорта, модуль импортируется
+    при первом обращении к значению. Если модуль не импортируется,
+    обращение даёт KeyError, как для неизвестного имени, имя запоминается
+    и больше не импортируется и не видно в списке обработчиков.
+    group: str | None - группа entry points, читается при первом обращении.
+    """
+
+    def __init__(self, refs: dict[str, Any], group: str | None = None) -> None:
+        self.__refs: dict[str, Any] = dict(refs)
+        self.__loaded: dict[str, Any] = {}
+        self.__failed: set[str] = set()
+        self.__group: str | None = group
+        self.__lock = threading.Lock()
+
+    def __discover(self) -> None:
+        """Добавляем обработчики из entry points, встроенные не заменяются."""
+
+        if self.__group is None:
+            return
+        with self.__lock:
+            group, self.__group = self.__group, None
+            try:
+                found = entry_points(group=group)
+            except Exception as e:
+                log.warning("Не удалось прочитать entry points %s: %s", group, e)
+                return
+            for point in found:
+                if point.name in self.__refs:
+                    log.warning("Обработчик %s уже есть, пропускаем.", point.name)
+                    continue
+                self.__refs[point.name] = point
+
+    def __getitem__(self, name: str) -> Any:
+        self.__discover()
+        if name in self.__loaded:
+            return self.__loaded[name]
+        if name in self.__failed:
+            raise KeyError(name)
+        ref: Any = self.__refs[name]
+        try:
+            if isinstance(ref, str):
+                obj = load_object(ref)
+            elif hasattr(ref, "load") and hasattr(ref, "group"):
+                obj = ref.load()
+            else:
+                obj = ref
+        except Exception as e:
+            log.warning("Обработчик %s недоступен: %s", name, e)
+            self.__failed.add(name)
+            raise KeyError(name) from e
+        self.__loaded[name] = obj
+        return obj
+
+    def __contains__(self, name: object) -> bool:
+        self.__discover()
+        return name in self.__refs and name not in self.__failed
+
+    def __iter__(self) -> Iterator[str]:
+        self.__discover()
+        return iter([name for name in self.__refs if name not in self.__failed])
+
+    def __len__(self) -> int:
+        self.__discover()
+        return len(self.__refs) - len(self.__failed)
+
+    def loaded(self) -> list[str]:
+        """Имена уже импортированных обработчиков."""
+
+        return list(self.__loaded)
+
+    def failed(self) -> list[str]:
+        """Имена обработчиков которые не удалось импортировать."""
+
+        return list(self.__failed)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)})"
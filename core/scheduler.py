@@ -0,0 +1,302 @@
+"""
+Планировщик озвучки страниц на ограниченном пуле процессов.
+У каждого пользователя своя очередь, очереди обходятся по кругу,
+поэтому один пользователь читающий наперёд всю книгу не задерживает остальных.
+Запросы пользователя важнее чтения наперёд, а оно важнее пакетной озвучки.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import (
+    CancelledError,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable
+from core.metrics import ERRORS, STAGE_SECONDS
+
+
+log = logging.getLogger(__name__)
+
+# Размер пула процессов озвучки.
+SCHEDULER_WORKERS: int = os.cpu_count() or 1
+# Сколько завершённых задач помнить для статистики.
+SCHEDULER_HISTORY: int = 1000
+# Потоки в которых выполняются then и колбэки готовых задач.
+SCHEDULER_CALLBACK_THREADS: int = 4
+
+
+class Priority(IntEnum):
+    """Приоритет задачи, меньше - важнее."""
+
+    INTERACTIVE = 0
+    PREFETCH = 1
+    BATCH = 2
+
+
+@dataclass
+class Job:
+    """
+    Задача озвучки.
+    depth: int - длина очереди в момент постановки,
+    wait, run: float - сколько задача ждала и выполнялась в секундах.
+    """
+
+    user: str
+    priority: Priority
+    func: Callable
+    args: tuple
+    then: Callable | None
+    future: Future
+    depth: int = 0
+    queued_at: float = field(default_factory=time.monotonic)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    @property
+    def wait(self) -> float:
+        """Время в очереди."""
+        return (self.started_at or time.monotonic()) - self.queued_at
+
+    @property
+    def run(self) -> float:
+        """Время выполнения."""
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+
+class Scheduler:
+    """
+    Очереди задач по приоритетам и пользователям перед пулом процессов.
+    max_workers: int - сколько задач выполняется одновременно,
+    initializer, initargs - подготовка процесса пула, например прогрев
+    генераторов голоса,
+    history: deque[Job] - последние завершённые задачи.
+    Если процесс пула упал (segfault движка, OOM), падают только задачи
+    которые выполнялись, следующие идут в новый пул.
+    Результат задачи отдаётся (then и колбэки Future) в отдельных потоках,
+    поток пула получающий результаты только запускает следующие задачи.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = SCHEDULER_WORKERS,
+        executor: Executor | None = None,
+        initializer: Callable | None = None,
+        initargs: tuple = (),
+    ) -> None:
+        self.max_workers: int = max_workers
+        self.__initializer: Callable | None = initializer
+        self.__initargs: tuple = initargs
+        self.history: deque[Job] = deque(maxlen=SCHEDULER_HISTORY)
+        self.__executor: Executor | None = executor
+        self.__queues: dict[Priority, OrderedDict[str, deque[Job]]] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self.__running: int = 0
+        self.__lock = threading.RLock()
+        self.__callbacks = ThreadPoolExecutor(
+            SCHEDULER_CALLBACK_THREADS, thread_name_prefix="scheduler"
+        )
+
+    @property
+    def executor(self) -> Executor:
+        """Пул процессов, создаётся при первой задаче."""
+
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=self.__initializer,
+                initargs=self.__initargs,
+            )
+        return self.__executor
+
+    def start(self) -> None:
+        """
+        Запускаем процессы пула заранее: initializer прогревает их
+        при старте бота, а не на первой странице пользователя.
+        """
+
+        executor = self.executor
+        for _ in range(self.max_workers):
+            executor.submit(os.getpid)
+
+    @property
+    def depth(self) -> int:
+        """Сколько задач ждёт в очередях."""
+
+        with self.__lock:
+            return sum(
+                len(jobs) for queue in self.__queues.values() for jobs in queue.values()
+            )
+
+    @property
+    def running(self) -> int:
+        """Сколько задач выполняется."""
+        return self.__running
+
+    def submit(
+        self,
+        user: str,
+        priority: Priority,
+        func: Callable,
+        *args,
+        then: Callable[[Any], Any] | None = None,
+    ) -> Future:
+        """
+        Ставим func(*args) в очередь пользователя.
+        then - выполняется в этом процессе над результатом,
+        у возвращённого Future есть атрибут job со статистикой задачи.
+        """
+
+        future: Future = Future()
+        with self.__lock:
+            job = Job(user, priority, func, args, then, future, depth=self.depth)
+            future.job = job
+            self.__queues[priority].setdefault(user, deque()).append(job)
+            self.__dispatch()
+        return future
+
+    def promote(self, future: Future, priority: Priority) -> bool:
+        """Поднимаем приоритет задачи ещё не начавшей выполняться."""
+
+        job: Job | None = getattr(future, "job", None)
+        if job is None or job.priority <= priority:
+            return False
+        with self.__lock:
+            jobs = self.__queues[job.priority].get(job.user)
+            if not jobs or job not in jobs:
+                return False
+            jobs.remove(job)
+            if not jobs:
+                del self.__queues[job.priority][job.user]
+            job.priority = priority
+            self.__queues[priority].setdefault(job.user, deque()).append(job)
+            self.__dispatch()
+        return True
+
+    def __next_job(self) -> Job | None:
+        """Берём задачу: сначала по приоритету, внутри - пользователи по кругу."""
+
+        for queue in self.__queues.values():
+            while queue:
+                user, jobs = next(iter(queue.items()))
+                job = jobs.popleft()
+                queue.pop(user)
+                if jobs:
+                    queue[user] = jobs
+                if job.future.set_running_or_notify_cancel():
+                    return job
+        return None
+
+    def __dispatch(self) -> None:
+        """Отдаём задачи в пул пока есть свободные процессы."""
+
+        while self.__running < self.max_workers:
+            job = self.__next_job()
+            if job is None:
+                return
+            self.__running += 1
+            job.started_at = time.monotonic()
+            executor = self.executor
+            try:
+                try:
+                    pool_future = executor.submit(job.func, *job.args)
+                except BrokenProcessPool:
+                    # Пул упал раньше чем об этом узнал __done, задача ещё не шла.
+                    self.__reset(executor)
+                    executor = self.executor
+                    pool_future = executor.submit(job.func, *job.args)
+            except Exception as e:
+                self.__running -= 1
+                job.future.set_exception(e)
+                continue
+            pool_future.add_done_callback(
+                lambda f, job=job, executor=executor: self.__done(job, f, executor)
+            )
+
+    def __reset(self, executor: Executor) -> None:
+        """Упавший пул больше не принимает задачи, следующая создаст новый."""
+
+        with self.__lock:
+            if self.__executor is not executor:
+                return
+            self.__executor = None
+        log.error("Процесс пула озвучки упал, пул будет создан заново.")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def __done(self, job: Job, pool_future: Future, executor: Executor) -> None:
+        """Задача выполнена: запускаем следующую и отдаём результат в фоне."""
+
+        job.finished_at = time.monotonic()
+        if not pool_future.cancelled() and isinstance(
+            pool_future.exception(), BrokenProcessPool
+        ):
+            self.__reset(executor)
+        with self.__lock:
+            self.__running -= 1
+            self.history.append(job)
+            self.__dispatch()
+        try:
+            self.__callbacks.submit(self.__resolve, job, pool_future)
+        except RuntimeError:
+            # Планировщик остановлен, отдаём результат здесь.
+            self.__resolve(job, pool_future)
+
+    def __resolve(self, job: Job, pool_future: Future) -> None:
+        """Выполняем then над результатом и отдаём его в Future задачи."""
+
+        # Задачи озвучки (SynthesisJob) подписываем генератором голоса.
+        speaker: type | None = getattr(job.func, "speaker", None)
+        stage: str = "job" if speaker is None else "synthesis"
+        labels = {"speaker": getattr(speaker, "__name__", "")}
+        STAGE_SECONDS.observe(job.wait, stage="queue", **labels)
+        try:
+            result = pool_future.result()
+            if job.then is not None:
+                result = job.then(result)
+        except BaseException as e:
+            log.debug("Задача пользователя %s упала: %s", job.user, e)
+            if not isinstance(e, CancelledError):
+                ERRORS.inc(stage=stage)
+            job.future.set_exception(e)
+        else:
+            STAGE_SECONDS.observe(job.run, stage=stage, **labels)
+            job.future.set_result(result)
+
+    def stats(self) -> dict[str, float]:
+        """Глубина очередей и среднее время ожидания/выполнения задач."""
+
+        with self.__lock:
+            jobs = list(self.history)
+            result: dict[str, float] = {
+                f"depth_{priority.name.lower()}": sum(map(len, queue.values()))
+                for priority, queue in self.__queues.items()
+            }
+        result["running"] = self.__running
+        result["finished"] = len(jobs)
+        result["wait_avg_s"] = sum(j.wait for j in jobs) / len(jobs) if jobs else 0.0
+        result["run_avg_s"] = sum(j.run for j in jobs) / len(jobs) if jobs else 0.0
+        return result
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Отменяем очереди и останавливаем пул."""
+
+        with self.__lock:
+            for queue in self.__queues.values():
+                for jobs in queue.values():
+                    for job in jobs:
+                        job.future.cancel()
+                queue.clear()
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=wait)
+        self.__callbacks.shutdown(wait=wait)
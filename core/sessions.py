@@ -0,0 +1,202 @@
+"""
+Сессии пользователей: ограниченная таблица обработчиков.
+Неактивные дольше TTL и лишние сверх лимита (давно не использованные)
+вытесняются с освобождением генератора голоса,
+по описанию Session обработчик быстро создаётся заново.
+Описания хранятся в SQLite и переживают перезапуск бота.
+"""
+
+import time
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import astuple, dataclass, fields
+from pathlib import Path
+from typing import Any, Callable, Iterator, MutableMapping
+
+
+log = logging.getLogger(__name__)
+
+# Сколько обработчиков держим в памяти.
+SESSIONS_MAX: int = 1000
+# Через сколько секунд простоя обработчик вытесняется.
+SESSION_TTL: float = 60 * 60
+# Файл описаний сессий в temp_path.
+SESSIONS_NAME: str = "sessions.sqlite"
+
+
+@dataclass
+class Session:
+    """Всё что нужно чтобы пересоздать обработчик пользователя."""
+
+    speaker_name: str
+    reader_name: str
+    page: int = 0
+
+
+class SessionStore(MutableMapping[str, Any]):
+    """
+    Словарь 'имя_пользователя' : 'обработчик' с TTL и LRU вытеснением.
+    max_sessions: int - лимит обработчиков в памяти,
+    ttl: float - время простоя до вытеснения в секундах,
+    on_evict: Callable - вызывается с именем и обработчиком при вытеснении,
+    evictions, expired: int - сколько вытеснено по лимиту и по TTL.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSIONS_MAX,
+        ttl: float = SESSION_TTL,
+        on_evict: Callable[[str, Any], None] | None = None,
+    ) -> None:
+        self.max_sessions: int = max_sessions
+        self.ttl: float = ttl
+        self.on_evict: Callable[[str, Any], None] | None = on_evict
+        self.evictions: int = 0
+        self.expired: int = 0
+        self.__items: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self.__lock = threading.RLock()
+
+    def __getitem__(self, name: str) -> Any:
+        with self.__lock:
+            self.expire()
+            worker, _ = self.__items[name]
+            self.__items[name] = (worker, time.monotonic())
+            self.__items.move_to_end(name)
+            return worker
+
+    def __setitem__(self, name: str, worker: Any) -> None:
+        with self.__lock:
+            self.__items.pop(name, None)
+            self.__items[name] = (worker, time.monotonic())
+            self.expire()
+            while len(self.__items) > self.max_sessions:
+                self.__evict(next(iter(self.__items)))
+                self.evictions += 1
+
+    def __delitem__(self, name: str) -> None:
+        with self.__lock:
+            del self.__items[name]
+
+    def __iter__(self) -> Iterator[str]:
+        with self.__lock:
+            return iter(list(self.__items))
+
+    def __len__(self) -> int:
+        return len(self.__items)
+
+    def expire(self) -> int:
+        """Вытесняем простаивающие дольше ttl, вернёт сколько вытеснено."""
+
+        deadline: float = time.monotonic() - self.ttl
+        expired: int = 0
+        with self.__lock:
+            while self.__items:
+                name, (_, used) = next(iter(self.__items.items()))
+                if used >= deadline:
+                    break
+                self.__evict(name)
+                expired += 1
+        self.expired += expired
+        return expired
+
+    def __evict(self, name: str) -> None:
+        """Убираем обработчик и освобождаем его ресурсы."""
+
+        worker, _ = self.__items.pop(name)
+        log.debug("Обработчик пользователя %s вытеснен.", name)
+        if self.on_evict is not None:
+            self.on_evict(name, worker)
+        close = getattr(worker, "close", None)
+        if close is not None:
+            close()
+
+    def stats(self) -> dict[str, int]:
+        """Живые сессии и вытеснения."""
+
+        return {
+            "live": len(self),
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+
+class SessionTable(MutableMapping[str, Session]):
+    """
+    Словарь 'имя_пользователя' : Session в SQLite.
+    Пишется сразу при изменении, читается при обращении к пользователю,
+    поэтому после перезапуска обработчик пересоздаётся с той же страницы
+    при первом сообщении, а не при старте бота.
+    Session отдаётся копией, менять её поля - через change.
+    path: Path - файл базы.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path: Path = Path(path)
+        self.__lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.__db = sqlite3.connect(self.path, check_same_thread=False)
+        # Страница пишется на каждое перелистывание, без fsync на каждый commit.
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (name TEXT PRIMARY KEY, "
+            "speaker_name TEXT, reader_name TEXT, page INTEGER)"
+        )
+        self.__db.commit()
+
+    def __getitem__(self, name: str) -> Session:
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT speaker_name, reader_name, page FROM sessions WHERE name = ?",
+                (name,),
+            ).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return Session(*row)
+
+    def __setitem__(self, name: str, session: Session) -> None:
+        with self.__lock:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                (name, *astuple(session)),
+            )
+            self.__db.commit()
+
+    def __delitem__(self, name: str) -> None:
+        with self.__lock:
+            deleted = self.__db.execute("DELETE FROM sessions WHERE name = ?", (name,))
+            self.__db.commit()
+        if not deleted.rowcount:
+            raise KeyError(name)
+
+    def __iter__(self) -> Iterator[str]:
+        with self.__lock:
+            rows = self.__db.execute("SELECT name FROM sessions").fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def change(self, name: str, **values: Any) -> bool:
+        """Меняем поля Session пользователя, вернёт False если его нет."""
+
+        names = {field.name for field in fields(Session)}
+        if not names.issuperset(values):
+            raise ValueError(f"Нет таких полей Session: {sorted(set(values) - names)}")
+        if not values:
+            return name in self
+        columns = ", ".join(f"{column} = ?" for column in values)
+        with self.__lock:
+            changed = self.__db.execute(
+                f"UPDATE sessions SET {columns} WHERE name = ?",
+                (*values.values(), name),
+            )
+            self.__db.commit()
+        return changed.rowcount > 0
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__db.close()
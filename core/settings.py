@@ -1,25 +1,40 @@
 """
 Тут настройки обработчиков текста, генераторов голоса и логера.
 Если что-то надо добавить то это делать тут!
-SPEAKERS: dict[str, Speaker] - перечислены все доступные генераторы речи
-READERS: dict[str, TextTeam] - перечисленны все обработчики файлов
+SPEAKERS: Mapping[str, Speaker] - перечислены все доступные генераторы речи
+READERS: Mapping[str, TextTeam] - перечисленны все обработчики файлов
+Обработчики задаются ссылками 'модуль:класс' и импортируются при первом
+обращении, сторонние подключаются entry points групп
+'speaker.speakers' и 'speaker.readers'.
 """
 
 import logging
+from typing import Mapping
 from core.engine_types import Speaker, TextTeam
-from core.speakers import PDFSpeaker
-from core.voices import SpeakerGTTS, SpeakerPyttsx3
+from core.registry import READERS_GROUP, SPEAKERS_GROUP, LazyRegistry
 
 
 # Генераторы речи
-SPEAKERS: dict[str, Speaker] = {
-    "gTTS": SpeakerGTTS,
-    "pyttsx3": SpeakerPyttsx3,
-}
+SPEAKERS: Mapping[str, Speaker] = LazyRegistry(
+    {
+        "gTTS": "core.voices:SpeakerGTTS",
+        "pyttsx3": "core.voices:SpeakerPyttsx3",
+        # Тишина без движка синтеза, для нагрузочных замеров.
+        "synthetic": "core.voices:SpeakerSynthetic",
+    },
+    group=SPEAKERS_GROUP,
+)
 # Обработчики текстовых файлов
-READERS: dict[str, TextTeam] = {
-    "pdf": PDFSpeaker,
-}
+READERS: Mapping[str, TextTeam] = LazyRegistry(
+    {
+        "pdf": "core.speakers:PDFSpeaker",
+    },
+    group=READERS_GROUP,
+)
+# Генератор речи и обработчик файлов по умолчанию,
+# прогревается при запуске только генератор по умолчанию.
+DEFAULT_SPEAKER: str = "pyttsx3"
+DEFAULT_READER: str = "pdf"
 
 logging.basicConfig(
     level=logging.INFO, format="%(name)s %(asctime)s %(levelname)s %(message)s"
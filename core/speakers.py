@@ -2,12 +2,21 @@
 Обработчик текста.
 """
 
+import inspect
 import logging
 from pathlib import Path
-from typing import Generator
+from typing import TYPE_CHECKING, Generator
 from abc import ABC, abstractmethod
-import PyPDF2
+from core.audio import AudioCache, audio_key
+from core.cache import DOCUMENTS, DocumentCache
 from core.engine_types import Speaker
+from core.formats import AUDIO_FORMAT, AudioFormat
+from core.index import PageIndex, get_index
+from core.metrics import STAGE_SECONDS
+from core.voices import AudioData, PooledSpeaker, SynthesisJob, speaker_type
+
+if TYPE_CHECKING:
+    import PyPDF2
 
 
 log = logging.getLogger(__name__)
@@ -16,11 +25,18 @@ log = logging.getLogger(__name__)
 class TextSpeakerABC(ABC):
     """
     __file_type: задаёт тип рабочих файлов например '.pdf'
+    audio_cache: AudioCache | None - общий кеш озвученных страниц
     """
 
     __file_type: str
 
-    def __init__(self, file_name_path: str, speaker: Speaker) -> None:
+    def __init__(
+        self,
+        file_name_path: str,
+        speaker: Speaker,
+        audio_cache: AudioCache | None = None,
+    ) -> None:
+        self.audio_cache: AudioCache | None = audio_cache
         if not self.set_path_file(file_name_path):
             raise ValueError(
                 "Невозможно создать файл с таким именем по данному пути, \
@@ -30,7 +46,7 @@ class TextSpeakerABC(ABC):
             raise ValueError("Невозможно создать объект озвучки текста.")
 
     def __repr__(self) -> str:
-        return f"name: {self.__class__.__name__}, audio gen: {self.get_engine.__class__.__name__}, \
+        return f"name: {self.__class__.__name__}, audio gen: {speaker_type(self.get_engine).__name__}, \
           read file: {self.file_name}, audio file: {self.file_name_mp3}"
 
     def __str__(self) -> str:
@@ -39,10 +55,9 @@ class TextSpeakerABC(ABC):
     def __eq__(self, __value: object) -> bool:
         if __value is None or not isinstance(__value, self.__class__):
             return False
-        return (
-            self.file_name == __value.file_name
-            and self.get_engine.__class__ == __value.get_engine.__class__
-        )
+        return self.file_name == __value.file_name and speaker_type(
+            self.get_engine
+        ) == speaker_type(__value.get_engine)
 
     def is_my_file_name(self, file_name: str) -> bool:
         """Вернёт True если это имя pdf файла, или выбросит ошибку"""
@@ -89,11 +104,28 @@ class TextSpeakerABC(ABC):
         """Расширение рабочего файла."""
         return getattr(cls, f"_{cls.__name__}__file_type")
 
+    @property
+    def labels(self) -> dict[str, str]:
+        """Метки метрик: генератор голоса и тип файла."""
+        return {"speaker": speaker_type(self.get_engine).__name__, "reader": self.type}
+
+    @property
+    def audio_format(self) -> AudioFormat:
+        """Формат озвучки: формат кеша, без кеша - формат процесса."""
+        if self.audio_cache is not None:
+            return self.audio_cache.format
+        return AUDIO_FORMAT
+
     @property
     def get_engine(self) -> Speaker:
         """Получаем обект озвучки."""
         return self._engine
 
+    def close(self) -> None:
+        """Освобождаем генератор голоса, дальше объект не используется."""
+
+        self.__dict__.pop("_engine", None)
+
     @abstractmethod
     def save_to_file(self, text: str):
         """Сохранение текста в файл."""
@@ -115,6 +147,15 @@ class TextSpeakerABC(ABC):
     def extract_text_from_file(self, num_el: int = 0) -> Generator:
         """Генератор для итерации по тексту файла."""
 
+    @abstractmethod
+    def page_text(self, num_el: int = 0) -> str:
+        """Текст страницы для озвучки."""
+
+    @classmethod
+    @abstractmethod
+    def build_index(cls, file_name: str | Path) -> PageIndex:
+        """Строим индекс текста страниц файла."""
+
     @abstractmethod
     def get_tmp_filename(self, name: str) -> str:
         """Задаём имя загруженному фаулу."""
@@ -127,20 +168,85 @@ class PDFSpeaker(TextSpeakerABC):
     """
 
     __file_type: str = ".pdf"
+    documents: DocumentCache = DOCUMENTS
 
     def __getitem__(self, num_el: int = 0) -> Path:
-        with open(self.file_name, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            if not 0 <= num_el < len(reader.pages):
-                raise IndexError
-            text = reader.pages[num_el].extract_text()
-            if not text:
-                text = "Сттраница пуста."
-            return self.save_to_file(text=f"Страница {num_el} \n {text}")
+        with STAGE_SECONDS.time(stage="page", **self.labels):
+            return self.save_to_file(text=self.page_text(num_el))
 
     def __len__(self) -> int:
-        with open(self.file_name, "rb") as f:
-            return len(PyPDF2.PdfReader(f).pages)
+        return len(self.index)
+
+    @property
+    def index(self) -> PageIndex:
+        """Индекс текста страниц, строится при первом обращении."""
+        return self.build_index(self.file_name)
+
+    @classmethod
+    def build_index(cls, file_name: str | Path) -> PageIndex:
+        """Строим (или находим готовый) индекс текста страниц книги."""
+
+        def load(data) -> "PyPDF2.PdfReader":
+            import PyPDF2
+
+            with STAGE_SECONDS.time(stage="parse", reader=cls.type):
+                return PyPDF2.PdfReader(data)
+
+        def extract() -> Generator:
+            try:
+                with cls.documents.open(file_name, load) as reader:
+                    for page in reader.pages:
+                        with STAGE_SECONDS.time(stage="extract", reader=cls.type):
+                            text = page.extract_text()
+                        yield text
+            finally:
+                # Текст уже в индексе, разобранный документ больше не читается.
+                cls.documents.discard(file_name)
+
+        return get_index(file_name, extract)
+
+    def page_text(self, num_el: int = 0) -> str:
+        """Текст страницы для озвучки."""
+
+        text = self.index.text(num_el)
+        if not text:
+            text = "Сттраница пуста."
+        return f"Страница {num_el} \n {text}"
+
+    def batch(self, num_el: int, chars: int) -> range:
+        """
+        Страницы с num_el которые озвучиваются одним файлом: подряд идущие
+        страницы пока их текст не длиннее chars, пустые не считаются.
+        Первая непустая страница входит всегда, даже если она длиннее.
+        """
+
+        index = self.index
+        end: int = num_el
+        total: int = 0
+        while end < len(index):
+            if not index.is_empty(end):
+                size: int = len(index.text(end))
+                if total and total + size > chars:
+                    break
+                total += size
+            end += 1
+        return range(num_el, max(end, num_el + 1))
+
+    def batch_text(self, pages: range) -> str:
+        """Текст нескольких страниц для озвучки одним файлом, пустые пропускаются."""
+
+        index = self.index
+        found = [
+            f"Страница {num} \n {index.text(num)}"
+            for num in pages
+            if not index.is_empty(num)
+        ]
+        if found:
+            return "\n".join(found)
+        # Пустые страницы в конце книги, каждая не озвучивается отдельно.
+        if len(pages) == 1:
+            return f"Страница {pages.start} пуста."
+        return f"Страницы с {pages.start} по {pages.stop - 1} пусты."
 
     def extract_text_from_file(self, num_el: int = 0) -> Generator:
         """
@@ -150,24 +256,23 @@ class PDFSpeaker(TextSpeakerABC):
         """
 
         log.info("Создаём генератор для чтения документа %s", self.file_name)
-        with open(self.file_name, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            for page_num in reader.pages[num_el:]:
-                text = page_num.extract_text()
-                if not text:
-                    num_el += 1
-                    continue
-                yield f"Страница {num_el} \n {text}"
-                num_el += 1
+        index = self.index
+        for page_num in range(num_el, len(index)):
+            if not index.is_empty(page_num):
+                yield f"Страница {page_num} \n {index.text(page_num)}"
 
     def set_engine(self, speaker: Speaker, *args, **kwargs) -> bool:
-        """Создаём объект озвучки на основе pyttsx3, и задаём скорость озвучки."""
+        """
+        Задаём генератор голоса и его настройки, например скорость озвучки.
+        Сам генератор берётся из SPEAKER_POOL только на время озвучки.
+        """
 
         try:
-            self._engine = speaker(*args, **kwargs)
+            params = inspect.signature(speaker).bind_partial(*args, **kwargs)
+            self._engine = PooledSpeaker(speaker, params.arguments)
         except Exception as e:
             log.exception(
-                "Невозможно получить  объект озвучки на основе pyttsx3.",
+                "Невозможно получить  объект озвучки.",
                 exc_info=False,
                 extra={"Exception": e},
             )
@@ -175,13 +280,57 @@ class PDFSpeaker(TextSpeakerABC):
         return True
 
     def save_to_file(self, text) -> Path:
-        """Запись текста в файл."""
+        """
+        Запись текста в файл.
+        Если задан кеш озвучки, готовый файл берётся из него без синтеза.
+        """
 
-        self.get_engine.save_to_file(
+        path: Path | None = self.cached(text)
+        if path:
+            return path
+        with STAGE_SECONDS.time(stage="synthesis", **self.labels):
+            file_name = self.synthesis_job(text)(self.get_engine)
+        return self.commit(file_name)
+
+    def cached(self, text: str) -> Path | None:
+        """Готовая озвучка текста из кеша."""
+
+        if self.audio_cache is None:
+            return None
+        return self.audio_cache.get(self.audio_key(text))
+
+    def audio_key(self, text: str) -> str:
+        """Ключ озвучки текста в кеше."""
+        return audio_key(text, self.get_engine, self.audio_format.tag)
+
+    def synthesis_job(self, text: str) -> SynthesisJob:
+        """Задача озвучки текста, может выполняться в другом процессе."""
+
+        fmt: AudioFormat = self.audio_format
+        file_name: Path = self.file_name_mp3.with_suffix(fmt.suffix)
+        if self.audio_cache is not None:
+            file_name = self.audio_cache.path(self.audio_key(text))
+        return SynthesisJob(
+            speaker=speaker_type(self.get_engine),
             text=text,
-            file_name=str(self.file_name_mp3),
+            file_name=str(file_name),
+            params=getattr(self.get_engine, "params", {}),
+            encoding=fmt if fmt.encoded else None,
         )
-        return self.file_name_mp3
+
+    def commit(self, file_name: str) -> Path:
+        """Озвучка записана в file_name, учитываем её в кеше."""
+
+        if self.audio_cache is None:
+            return Path(file_name)
+        return self.audio_cache.add(Path(file_name).stem)
+
+    def keep(self, audio: AudioData) -> AudioData:
+        """Озвучка в памяти отдаётся сразу, в кеш она пишется в фоне."""
+
+        if self.audio_cache is not None:
+            self.audio_cache.add_later(audio)
+        return audio
 
     def get_tmp_filename(self, name: str) -> str:
         """Задаём имя загруженному фаулу."""
@@ -0,0 +1,101 @@
+"""
+Потоковая загрузка файлов на диск.
+Файл пишется кусками во временный файл и атомарно переименовывается,
+хеш считается по ходу записи, слишком большой файл отбрасывается сразу,
+поэтому память не зависит от размера документа.
+"""
+
+import os
+import hashlib
+import logging
+from pathlib import Path
+from typing import Iterable
+import requests
+from core.index import remember_hash
+from core.voices import temp_name
+
+
+log = logging.getLogger(__name__)
+
+# Максимальный размер загружаемого файла в байтах.
+MAX_UPLOAD_BYTES: int = 200 * 1024 * 1024
+# Размер куска при загрузке.
+UPLOAD_CHUNK: int = 64 * 1024
+# Таймаут соединения и чтения при загрузке, секунды.
+UPLOAD_TIMEOUT: tuple[float, float] = (10, 60)
+
+
+class UploadTooLarge(ValueError):
+    """Файл больше допустимого размера."""
+
+
+class UploadWriter:
+    """
+    Запись загружаемого файла кусками.
+    file_name: Path - куда положить файл,
+    size: int - сколько записано, digest: str - sha256 после commit().
+    """
+
+    def __init__(self, file_name: str | Path, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.file_name: Path = Path(file_name)
+        self.max_bytes: int = max_bytes
+        self.size: int = 0
+        self.digest: str = ""
+        self.__sha = hashlib.sha256()
+        self.__tmp: str = temp_name(str(self.file_name))
+        self.__file = open(self.__tmp, "wb")
+
+    def __enter__(self) -> "UploadWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None or not self.digest:
+            self.abort()
+
+    def write(self, chunk: bytes) -> None:
+        """Пишем кусок, выбросит UploadTooLarge если файл вышел за лимит."""
+
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"Файл больше {self.max_bytes} байт")
+        self.__sha.update(chunk)
+        self.__file.write(chunk)
+
+    def commit(self) -> str:
+        """Переименовываем готовый файл на место, вернёт sha256."""
+
+        self.__file.close()
+        os.replace(self.__tmp, self.file_name)
+        self.digest = self.__sha.hexdigest()
+        remember_hash(self.file_name, self.digest)
+        return self.digest
+
+    def abort(self) -> None:
+        """Удаляем недописанный файл."""
+
+        self.__file.close()
+        if os.path.isfile(self.__tmp):
+            os.remove(self.__tmp)
+
+
+def save_stream(
+    chunks: Iterable[bytes], file_name: str | Path, max_bytes: int = MAX_UPLOAD_BYTES
+) -> str:
+    """Пишем поток кусков в файл, вернёт sha256 содержимого."""
+
+    with UploadWriter(file_name, max_bytes) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+        return writer.commit()
+
+
+def download(url: str, file_name: str | Path, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """Скачиваем файл по url потоком, вернёт sha256 содержимого."""
+
+    with requests.get(url, stream=True, timeout=UPLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        length = int(response.headers.get("Content-Length") or 0)
+        if length > max_bytes:
+            raise UploadTooLarge(f"Файл больше {max_bytes} байт")
+        log.debug("Качаем %s байт в %s", length, file_name)
+        return save_stream(response.iter_content(UPLOAD_CHUNK), file_name, max_bytes)
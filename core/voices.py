@@ -2,19 +2,45 @@
 Объекты генераторов речи.
 """
 
+import io
+import os
+import time
+import shutil
+import inspect
 import logging
+import tempfile
+import threading
 from abc import ABC, abstractmethod
-import pyttsx3
-from gtts import gTTS
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+from core.formats import AudioFormat, encode_bytes, encode_file, encode_stream
+from core.profiling import PROFILER
 
 
 log = logging.getLogger(__name__)
 
+# Сколько генераторов голоса с одними настройками держит пул.
+# Не потокобезопасные генераторы всегда по одному, см. _Pinned.
+SPEAKER_POOL_SIZE: int = 4
+# Задержка синтетического генератора: на вызов и на символ текста, секунды.
+# Переопределяется переменными окружения, их видят и процессы пула озвучки.
+SYNTHETIC_LATENCY: float = 0.05
+SYNTHETIC_CHAR_LATENCY: float = 0.0001
+# Скорость синтетической речи, символов в секунду.
+SYNTHETIC_CHARS_PER_SECOND: float = 15
+# Кадр тишины mp3: MPEG2 layer III, 24 кГц, 32 кбит/с, моно, 24 мс звука.
+_SILENT_FRAME: bytes = b"\xff\xf3\x44\xc4" + bytes(92)
+_SILENT_FRAME_SECONDS: float = 576 / 24000
+
 
 class SpeakersABC(ABC):
     """Абстрактный класс для генераторов голоса."""
 
     _name: str  # module use
+    thread_safe: bool = True  # можно ли вызывать из разных потоков
 
     @abstractmethod
     def __init__(self) -> None:
@@ -26,22 +52,56 @@ class SpeakersABC(ABC):
     def __str__(self) -> str:
         return f"name: {self.__class__.__name__}, module use: {self._name}"
 
+    @property
+    def params(self) -> dict:
+        """
+        Настройки влияющие на звучание, входят в ключ кеша озвучки.
+        Ключи совпадают с аргументами __init__.
+        """
+        return {}
+
     @abstractmethod
     def save_to_file(self, text: str, file_name: str):
         """Тут мы преобразуем текст в голос и сохраняем в файл."""
 
+    def write_to_fp(self, text: str, fp: BinaryIO):
+        """
+        Озвучка в поток или буфер fp без файла на диске. Генераторы
+        с потоковой озвучкой пишут куски по мере синтеза, остальные
+        через временный файл.
+        """
+
+        stream = getattr(self, "stream", None)
+        if stream is None:
+            return write_via_file(self, text, fp)
+        for chunk in stream(text):
+            fp.write(chunk)
+
 
 class SpeakerPyttsx3(SpeakersABC):
-    """Озвучка голосом Windows диктора."""
+    """
+    Озвучка голосом Windows диктора.
+    pyttsx3.init() отдаёт один движок на процесс, экземпляры с разной
+    скоростью делят его, поэтому скорость задаётся перед каждой озвучкой.
+    """
 
     _name: str = "pyttsx3"
+    thread_safe: bool = False
 
     def __init__(self, speed: int = 125) -> None:
         super().__init__()
+        import pyttsx3
+
+        self.__speed: int = speed
         self.__engine = pyttsx3.init()
         self.__engine.setProperty("rate", speed)
 
+    @property
+    def params(self) -> dict:
+        return {"speed": self.__speed}
+
     def save_to_file(self, text: str, file_name: str):
+        self.__engine.setProperty("rate", self.__speed)
         self.__engine.save_to_file(
             text=text,
             filename=file_name,
@@ -56,6 +116,401 @@ class SpeakerGTTS(SpeakersABC):
 
     _name: str = "gTTS"
 
+    def __init__(self, lang: str = "ru") -> None:
+        super().__init__()
+        self.__lang: str = lang
+
+    @property
+    def params(self) -> dict:
+        return {"lang": self.__lang}
+
     def save_to_file(self, text: str, file_name: str):
-        speaker = gTTS(text, lang="ru")
+        from gtts import gTTS
+
+        speaker = gTTS(text, lang=self.__lang)
         speaker.save(file_name)
+
+    def write_to_fp(self, text: str, fp: BinaryIO):
+        from gtts import gTTS
+
+        gTTS(text, lang=self.__lang).write_to_fp(fp)
+
+    def stream(self, text: str) -> Iterator[bytes]:
+        """mp3 по мере ответа Google, для кодирования без промежуточного файла."""
+
+        from gtts import gTTS
+
+        yield from gTTS(text, lang=self.__lang).stream()
+
+
+class SpeakerSynthetic(SpeakersABC):
+    """
+    Генератор без движка синтеза для нагрузочных замеров.
+    Пишет тишину в mp3 длиной по тексту и отвечает с задержкой
+    latency + char_latency * длина текста.
+    Задержки по умолчанию берутся из переменных окружения
+    speaker_synthetic_latency и speaker_synthetic_char_latency.
+    """
+
+    _name: str = "synthetic"
+
+    def __init__(
+        self, latency: float | None = None, char_latency: float | None = None
+    ) -> None:
+        super().__init__()
+        if latency is None:
+            latency = float(
+                os.environ.get("speaker_synthetic_latency", SYNTHETIC_LATENCY)
+            )
+        if char_latency is None:
+            char_latency = float(
+                os.environ.get("speaker_synthetic_char_latency", SYNTHETIC_CHAR_LATENCY)
+            )
+        self.__latency: float = latency
+        self.__char_latency: float = char_latency
+
+    @property
+    def params(self) -> dict:
+        return {"latency": self.__latency, "char_latency": self.__char_latency}
+
+    def save_to_file(self, text: str, file_name: str):
+        with open(file_name, "wb") as f:
+            for chunk in self.stream(text):
+                f.write(chunk)
+
+    def stream(self, text: str) -> Iterator[bytes]:
+        time.sleep(self.__latency + self.__char_latency * len(text))
+        seconds = len(text) / SYNTHETIC_CHARS_PER_SECOND
+        frames = max(1, round(seconds / _SILENT_FRAME_SECONDS))
+        for start in range(0, frames, 1000):
+            yield _SILENT_FRAME * min(1000, frames - start)
+
+
+def write_via_file(engine, text: str, fp: BinaryIO) -> None:
+    """Озвучка в fp для генераторов которые умеют писать только в файл."""
+
+    with tempfile.TemporaryDirectory(prefix="speak") as tmp:
+        file_name = os.path.join(tmp, "speech.mp3")
+        engine.save_to_file(text=text, file_name=file_name)
+        with open(file_name, "rb") as f:
+            shutil.copyfileobj(f, fp)
+
+
+def write_to_fp(engine, text: str, fp: BinaryIO) -> None:
+    """Озвучка в fp любым генератором голоса."""
+
+    if hasattr(engine, "write_to_fp"):
+        engine.write_to_fp(text, fp)
+    else:
+        write_via_file(engine, text, fp)
+
+
+def temp_name(file_name: str) -> str:
+    """
+    Имя временного файла рядом с file_name, уникальное для потока.
+    Начинается с точки, такие файлы не считаются готовой озвучкой.
+    """
+
+    path = Path(file_name)
+    unique = f"{os.getpid()}-{threading.get_ident()}"
+    return str(path.with_name(f".{path.stem}.{unique}{path.suffix}"))
+
+
+def speaker_params(speaker: type, params: dict | None = None) -> dict:
+    """Настройки генератора голоса вместе со значениями по умолчанию."""
+
+    try:
+        signature = inspect.signature(speaker.__init__)
+    except (TypeError, ValueError):
+        return dict(params or {})
+    defaults = {
+        name: arg.default
+        for name, arg in signature.parameters.items()
+        if arg.default is not inspect.Parameter.empty
+        and arg.kind is arg.POSITIONAL_OR_KEYWORD
+    }
+    return {**defaults, **(params or {})}
+
+
+def speaker_type(engine) -> type:
+    """Класс генератора голоса, в том числе за PooledSpeaker."""
+
+    return getattr(engine, "speaker_type", type(engine))
+
+
+class _Pinned:
+    """
+    Генератор голоса привязанный к потоку своего класса,
+    для библиотек которые нельзя вызывать из разных потоков.
+    Поток один на класс в процессе: такие библиотеки часто держат один
+    движок на процесс, и экземпляры с разными настройками вызываются по очереди.
+    """
+
+    __threads: dict[type, ThreadPoolExecutor] = {}
+    __lock = threading.Lock()
+
+    def __init__(self, speaker: type, params: dict) -> None:
+        with self.__lock:
+            if speaker not in self.__threads:
+                self.__threads[speaker] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=speaker.__name__
+                )
+            self.__thread = self.__threads[speaker]
+        self.__engine = self.__thread.submit(speaker, **params).result()
+
+    def save_to_file(self, text: str, file_name: str):
+        return self.__thread.submit(
+            self.__engine.save_to_file, text=text, file_name=file_name
+        ).result()
+
+    def write_to_fp(self, text: str, fp: BinaryIO):
+        return self.__thread.submit(write_to_fp, self.__engine, text, fp).result()
+
+
+class SpeakerPool:
+    """
+    Пул готовых генераторов голоса по классу и настройкам.
+    Генератор берётся на одну озвучку и возвращается,
+    поэтому создание генератора не попадает на путь пользователя.
+    size: int - сколько генераторов с одними настройками можно создать,
+    не потокобезопасных - один,
+    created: int - сколько создано, waits: int - сколько раз ждали свободный.
+    """
+
+    def __init__(self, size: int = SPEAKER_POOL_SIZE) -> None:
+        self.size: int = size
+        self.created: int = 0
+        self.waits: int = 0
+        self.__idle: dict[tuple, list] = {}
+        self.__count: dict[tuple, int] = {}
+        self.__ready = threading.Condition()
+
+    @staticmethod
+    def key(speaker: type, params: dict) -> tuple:
+        return (speaker, tuple(sorted(params.items())))
+
+    def limit(self, speaker: type) -> int:
+        """Сколько генераторов класса speaker с одними настройками можно создать."""
+        return self.size if getattr(speaker, "thread_safe", True) else 1
+
+    def __create(self, speaker: type, params: dict):
+        log.info("Создаём генератор голоса %s %s", speaker.__name__, params)
+        self.created += 1
+        if getattr(speaker, "thread_safe", True):
+            return speaker(**params)
+        return _Pinned(speaker, params)
+
+    def warm(self, speaker: type, params: dict | None = None, count: int = 1) -> int:
+        """Создаём генераторы заранее, вернёт сколько их готово."""
+
+        params = speaker_params(speaker, params)
+        key = self.key(speaker, params)
+        limit: int = self.limit(speaker)
+        while True:
+            with self.__ready:
+                idle = self.__idle.setdefault(key, [])
+                if len(idle) >= count or self.__count.get(key, 0) >= limit:
+                    return len(idle)
+                self.__count[key] = self.__count.get(key, 0) + 1
+            try:
+                engine = self.__create(speaker, params)
+            except BaseException:
+                with self.__ready:
+                    self.__count[key] -= 1
+                raise
+            with self.__ready:
+                idle.append(engine)
+                self.__ready.notify()
+
+    @contextmanager
+    def checkout(self, speaker: type, params: dict | None = None) -> Iterator:
+        """Берём генератор голоса, после блока он возвращается в пул."""
+
+        params = speaker_params(speaker, params)
+        key = self.key(speaker, params)
+        limit: int = self.limit(speaker)
+        engine = None
+        with self.__ready:
+            idle = self.__idle.setdefault(key, [])
+            if not idle and self.__count.get(key, 0) >= limit:
+                self.waits += 1
+                self.__ready.wait_for(lambda: idle or self.__count.get(key, 0) < limit)
+            if idle:
+                engine = idle.pop()
+            else:
+                self.__count[key] = self.__count.get(key, 0) + 1
+        if engine is None:
+            try:
+                engine = self.__create(speaker, params)
+            except BaseException:
+                with self.__ready:
+                    self.__count[key] -= 1
+                    self.__ready.notify()
+                raise
+        try:
+            yield engine
+        finally:
+            with self.__ready:
+                idle.append(engine)
+                self.__ready.notify()
+
+    def stats(self) -> dict[str, int]:
+        """Сколько генераторов создано, свободно и сколько раз ждали."""
+
+        with self.__ready:
+            idle = sum(map(len, self.__idle.values()))
+        return {"created": self.created, "idle": idle, "waits": self.waits}
+
+
+SPEAKER_POOL = SpeakerPool()
+
+
+def warm_speakers(speakers: Iterable[type]) -> None:
+    """Прогреваем пул генераторами голоса с настройками по умолчанию."""
+
+    for speaker in speakers:
+        try:
+            SPEAKER_POOL.warm(speaker)
+        except Exception as e:
+            log.warning("Генератор голоса %s недоступен: %s", speaker.__name__, e)
+
+
+class PooledSpeaker:
+    """
+    Генератор голоса из SPEAKER_POOL: хранит только класс и настройки,
+    на время озвучки берёт готовый генератор из пула.
+    """
+
+    def __init__(self, speaker: type, params: dict | None = None) -> None:
+        self.speaker_type: type = speaker
+        self.params: dict = speaker_params(speaker, params)
+
+    def __repr__(self) -> str:
+        return f"name: {self.speaker_type.__name__}, pooled, params: {self.params}"
+
+    def save_to_file(self, text: str, file_name: str):
+        with SPEAKER_POOL.checkout(self.speaker_type, self.params) as engine:
+            return engine.save_to_file(text=text, file_name=file_name)
+
+    @property
+    def streams(self) -> bool:
+        """Умеет ли генератор отдавать звук по мере синтеза."""
+        return hasattr(self.speaker_type, "stream")
+
+    def stream(self, text: str) -> Iterator[bytes]:
+        with SPEAKER_POOL.checkout(self.speaker_type, self.params) as engine:
+            yield from engine.stream(text)
+
+    def write_to_fp(self, text: str, fp: BinaryIO):
+        with SPEAKER_POOL.checkout(self.speaker_type, self.params) as engine:
+            return write_to_fp(engine, text, fp)
+
+
+@dataclass
+class AudioData:
+    """
+    Озвучка в памяти.
+    file_name: str - файл в кеше озвучки куда она будет записана,
+    по нему же имя при отправке, data: bytes - звук.
+    """
+
+    file_name: str
+    data: bytes
+
+    @property
+    def name(self) -> str:
+        return Path(self.file_name).name
+
+    def open(self) -> io.BytesIO:
+        """Поток для отправки, с именем файла."""
+
+        fp = io.BytesIO(self.data)
+        fp.name = self.name
+        return fp
+
+    def save(self) -> str:
+        """Пишем на диск во временный файл и переименовываем."""
+
+        tmp: str = temp_name(self.file_name)
+        try:
+            with open(tmp, "wb") as f:
+                f.write(self.data)
+            os.replace(tmp, self.file_name)
+        finally:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+        return self.file_name
+
+
+@dataclass
+class SynthesisJob:
+    """
+    Озвучка текста в файл.
+    Объект передаётся в другой процесс, поэтому хранит класс генератора
+    голоса и его настройки, а не сам генератор.
+    """
+
+    speaker: type
+    text: str
+    file_name: str
+    params: dict = field(default_factory=dict)
+    # Формат в который перекодируется выход генератора, None - как есть.
+    encoding: AudioFormat | None = None
+    # Вернуть озвучку в памяти (AudioData), а не писать файл.
+    in_memory: bool = False
+
+    def __call__(self, engine=None) -> "str | AudioData":
+        """
+        Озвучиваем во временный файл и переименовываем,
+        поэтому файл который сейчас отправляется не перезаписывается.
+        Вернёт путь к файлу, с in_memory - AudioData без записи на диск.
+        """
+
+        if engine is None:
+            engine = PooledSpeaker(self.speaker, self.params)
+        if self.in_memory:
+            return AudioData(self.file_name, self.to_bytes(engine))
+        tmp: str = temp_name(self.file_name)
+        try:
+            with PROFILER.profile("synthesis", tag=Path(self.file_name).stem[:16]):
+                if self.encoding is None or not self.encoding.encoded:
+                    engine.save_to_file(text=self.text, file_name=tmp)
+                else:
+                    self.__encode(engine, tmp)
+            os.replace(tmp, self.file_name)
+        finally:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+        return self.file_name
+
+    def to_bytes(self, engine=None) -> bytes:
+        """Озвучка в память без временных файлов, если генератор умеет."""
+
+        if engine is None:
+            engine = PooledSpeaker(self.speaker, self.params)
+        with PROFILER.profile("synthesis", tag=Path(self.file_name).stem[:16]):
+            if self.encoding is not None and self.encoding.encoded:
+                if getattr(engine, "streams", hasattr(engine, "stream")):
+                    return encode_bytes(engine.stream(self.text), self.encoding)
+            fp = io.BytesIO()
+            write_to_fp(engine, self.text, fp)
+            if self.encoding is not None and self.encoding.encoded:
+                return encode_bytes((fp.getvalue(),), self.encoding)
+            return fp.getvalue()
+
+    def __encode(self, engine, tmp: str) -> None:
+        """
+        Синтез с перекодированием: генератор который отдаёт звук по мере
+        синтеза пишет прямо в ffmpeg, остальные - через временный файл.
+        """
+
+        if getattr(engine, "streams", hasattr(engine, "stream")):
+            encode_stream(engine.stream(self.text), tmp, self.encoding)
+            return
+        raw: str = temp_name(tmp)
+        try:
+            engine.save_to_file(text=self.text, file_name=raw)
+            encode_file(raw, tmp, self.encoding)
+        finally:
+            if os.path.isfile(raw):
+                os.remove(raw)
@@ -1,13 +1,21 @@
 """Бот для озвучки текста."""
 
-
 import os
 import logging
+import threading
+from concurrent.futures import Future
 from pathlib import Path
+from typing import Callable, Iterator
 import telebot
 from dotenv import load_dotenv
-from telebot import types
+from telebot import apihelper, types
 from core.engine import Engine
+from core.file_ids import FILE_IDS_NAME, FileIdCache, is_stale
+from core.formats import is_voice
+from core.metrics import ERRORS, STAGE_SECONDS, MetricsServer, stats, summary
+from core.profiling import PROFILER
+from core.uploads import MAX_UPLOAD_BYTES, UploadTooLarge, download
+from core.voices import AudioData
 
 
 # Извлекаем токен в окружение
@@ -20,6 +28,13 @@ bot = telebot.TeleBot(TOKEN)
 log = logging.getLogger(__name__)
 # Обработчики файлов.
 GENERATORS = Engine()
+# file_id уже отправленной озвучки, повторно не загружаем.
+FILE_IDS = FileIdCache(
+    Path(GENERATORS.temp_path, FILE_IDS_NAME), audio_root=GENERATORS.audio_cache.root
+)
+stats("speaker_file_ids", "file_id отправленной озвучки.", FILE_IDS.stats)
+# Пользователи которым доступны команды /metrics и /profile, через запятую в .env.
+ADMINS: set[str] = set(filter(None, os.environ.get("speaker_admins", "").split(",")))
 
 button_menu = types.KeyboardButton("Домой")
 button_download_pdf = types.KeyboardButton("Загрузить PDF файл")
@@ -34,10 +49,17 @@ def get_filename(message: types.Message) -> str:
     return f"temp_{message.chat.username}.pdf"
 
 
-def get_file(file_name: str) -> bool:
-    """Ищем сохраненный файл."""
+def get_file_url(file_path: str) -> str:
+    """Ссылка на скачивание файла с серверов Telegram."""
+
+    url: str = apihelper.FILE_URL or "https://api.telegram.org/file/bot{0}/{1}"
+    return url.format(TOKEN, file_path)
+
+
+def get_file(name: str) -> bool:
+    """Ищем сохраненный файл пользователя."""
 
-    return os.path.isfile(Path(GENERATORS.temp_path, file_name))
+    return GENERATORS.has_document(name)
 
 
 @bot.message_handler(commands=["start", "Домой", "H", "Д"])
@@ -49,6 +71,102 @@ def send_welcome(message: types.Message):
     menu(message)
 
 
+def parse_pages(text: str | None) -> tuple[int, int | None]:
+    """Диапазон страниц из '/export [первая [последняя]]'."""
+
+    numbers = [int(n) for n in (text or "").split()[1:3] if n.isdigit()]
+    first: int = numbers[0] if numbers else 0
+    last: int | None = numbers[1] if len(numbers) > 1 else None
+    return first, last
+
+
+@bot.message_handler(commands=["export"])
+def export_book(message: types.Message):
+    """Озвучиваем всю книгу или диапазон страниц несколькими файлами."""
+
+    first, last = parse_pages(message.text)
+    status = bot.send_message(message.chat.id, "Озвучиваю книгу...")
+    shown: list[int] = [0]
+
+    def progress(done: int, total: int) -> None:
+        percent = done * 100 // total
+        if percent - shown[0] >= 10 or done == total:
+            shown[0] = percent
+            bot.edit_message_text(
+                f"Озвучено страниц: {done} из {total}",
+                message.chat.id,
+                status.message_id,
+            )
+
+    try:
+        future: Future = GENERATORS.export(message.chat.username, first, last, progress)
+    except KeyError:
+        bot.reply_to(message, "Сначала загрузите PDF файл.")
+        return menu(message)
+    except Exception as e:
+        log.exception("Выгрузка не удалась.", exc_info=False, extra={"Exception": e})
+        bot.send_message(message.chat.id, "Возникли проблемы с озвучкой книги.")
+        return menu(message)
+    # Обработчик не ждёт всю книгу, тома отправляются в своём потоке
+    # когда будут готовы, чтобы не занимать потоки выгрузки загрузкой в Telegram.
+    future.add_done_callback(
+        lambda done: threading.Thread(
+            target=send_export, args=(message, done), name="send_export"
+        ).start()
+    )
+
+
+def send_export(message: types.Message, future: Future):
+    """Отправляем готовые тома выгрузки и удаляем их."""
+
+    try:
+        files: list[Path] = future.result()
+    except Exception as e:
+        log.exception("Выгрузка не удалась.", exc_info=False, extra={"Exception": e})
+        bot.send_message(message.chat.id, "Возникли проблемы с озвучкой книги.")
+        return menu(message)
+    try:
+        for file in files:
+            send_audio(message, file)
+    finally:
+        for file in files:
+            os.remove(file)
+    menu(message)
+
+
+@bot.message_handler(commands=["metrics"])
+def send_metrics(message: types.Message):
+    """Метрики для администраторов, остальным команда не видна."""
+
+    if message.chat.username not in ADMINS:
+        return menu(message)
+    text: str = summary() or "Метрик пока нет."
+    for start in range(0, len(text), 4000):
+        bot.send_message(message.chat.id, text[start : start + 4000])
+
+
+@bot.message_handler(commands=["profile"])
+def switch_profile(message: types.Message):
+    """
+    Профилирование медленных запросов для администраторов: /profile on|off.
+    Процессы пула озвучки включаются только переменной speaker_profile.
+    """
+
+    if message.chat.username not in ADMINS:
+        return menu(message)
+    arg: str = (message.text or "").partition(" ")[2].strip().lower()
+    if arg == "on":
+        PROFILER.enable()
+    elif arg == "off":
+        PROFILER.disable()
+    state: str = "включено" if PROFILER.enabled else "выключено"
+    bot.send_message(
+        message.chat.id,
+        f"Профилирование {state}, порог {PROFILER.threshold} с, "
+        f"дампов {PROFILER.dumps} в {PROFILER.root}",
+    )
+
+
 @bot.message_handler(content_types=["text"])
 def keyboard_actions(message: types.Message):
     """
@@ -69,11 +187,12 @@ def keyboard_actions(message: types.Message):
 def menu(message: types.Message):
     """Главное меню бота."""
 
+    GENERATORS.cancel(message.chat.username)
     markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
     buts: list[types.KeyboardButton] = []
     buts.append(button_download_pdf)
 
-    if get_file(get_filename(message)):
+    if get_file(message.chat.username):
         buts.append(button_use_old)
     bot.send_message(
         message.chat.id,
@@ -159,8 +278,11 @@ def speak_text(message: types.Message):
     """Озвучиваем текст."""
 
     try:
-        gen = iter(GENERATORS.get_worker(message.chat.username))
-        audio_path: Path = next(gen)
+        # Длинная страница приходит двумя файлами, первый кусок сразу.
+        audio_paths: Iterator[Path] = GENERATORS.get_worker(
+            message.chat.username
+        ).stream()
+        audio_path: Path = next(audio_paths)
     except (StopIteration, IndexError):
         bot.reply_to(message, "Книга закончилась")
         log.debug(
@@ -177,6 +299,8 @@ def speak_text(message: types.Message):
         return menu(message)
 
     send_audio(message, audio_path)
+    for audio_path in audio_paths:
+        send_audio(message, audio_path)
     bot.send_message(
         message.chat.id,
         "Страницы с картинками не будут озвучены. Жми далее или в меню.",
@@ -202,12 +326,37 @@ def get_speak_text_button() -> types.ReplyKeyboardMarkup:
     return markup
 
 
-def send_audio(message: types.Message, audio_file):
-    """Send audio file to user."""
+def send_audio(message: types.Message, audio_file: Path | AudioData):
+    """
+    Send audio file to user.
+    Уже загруженная озвучка отправляется по file_id без загрузки,
+    Ogg/Opus уходит голосовым сообщением, AudioData - прямо из памяти.
+    """
+    in_memory: bool = isinstance(audio_file, AudioData)
+    voice: bool = is_voice(audio_file.file_name if in_memory else audio_file)
+    kind: str = "voice" if voice else "audio"
+    send: Callable = bot.send_voice if voice else bot.send_audio
     try:
-        with open(audio_file, "rb") as f:
-            bot.send_audio(message.chat.id, audio=f)
+        with STAGE_SECONDS.time(
+            stage="send", **GENERATORS.labels(message.chat.username)
+        ):
+            digest: str = FILE_IDS.digest(audio_file)
+            file_id: str | None = FILE_IDS.get(digest, kind)
+            if file_id is not None:
+                try:
+                    send(message.chat.id, file_id)
+                    return
+                except apihelper.ApiTelegramException as e:
+                    if not is_stale(e):
+                        raise
+                    FILE_IDS.discard(digest, kind)
+            with audio_file.open() if in_memory else open(audio_file, "rb") as f:
+                sent: types.Message = send(message.chat.id, f)
+            media = sent.voice if voice else sent.audio
+            if media:
+                FILE_IDS.put(digest, media.file_id, kind)
     except Exception as e:
+        ERRORS.inc(stage="send")
         log.exception("Аудио не ушло.", exc_info=True, extra={"Exception": e})
         bot.send_message(message.chat.id, "Возникли проблемы с отправкой.")
         menu(message)
@@ -217,6 +366,9 @@ def send_audio(message: types.Message, audio_file):
 def handle_document(message: types.Message):
     """Загружаем и сохраняем pdf файл."""
 
+    if (message.document.file_size or 0) > MAX_UPLOAD_BYTES:
+        bot.send_message(message.chat.id, "Файл слишком большой.")
+        return menu(message)
     file: types.File
     try:
         file = bot.get_file(message.document.file_id)
@@ -235,16 +387,39 @@ def handle_document(message: types.Message):
             "Размер: ": message.document.file_size,
         },
     )
-    downloaded_file: bytes = bot.download_file(file.file_path)
-
-    with open(Path(GENERATORS.temp_path, get_filename(message)), "wb") as f:
-        f.write(downloaded_file)
+    try:
+        with STAGE_SECONDS.time(
+            stage="download", **GENERATORS.labels(message.chat.username)
+        ):
+            download(
+                get_file_url(file.file_path),
+                Path(GENERATORS.temp_path, get_filename(message)),
+            )
+    except UploadTooLarge:
+        bot.send_message(message.chat.id, "Файл слишком большой.")
+        return menu(message)
+    except Exception as e:
+        ERRORS.inc(stage="download")
+        log.exception("Файл не загрузился.", exc_info=False, extra={"Exception": e})
+        bot.send_message(message.chat.id, "Возникли проблемы с заггрузкой файла.")
+        return menu(message)
 
+    try:
+        with STAGE_SECONDS.time(stage="index"):
+            GENERATORS.index_document(message.chat.username)
+    except Exception as e:
+        ERRORS.inc(stage="index")
+        log.exception("Файл не читается.", exc_info=False, extra={"Exception": e})
+        bot.send_message(message.chat.id, "Не получается прочитать файл.")
+        return menu(message)
     bot.send_message(message.chat.id, "Файл успешно загружен.")
     start_read(message)
 
 
 if __name__ == "__main__":
     log.info("Поехали")
+    GENERATORS.warm()
+    GENERATORS.janitor.start()
+    MetricsServer().start()
     bot.infinity_polling()
     log.info("Приехали.")
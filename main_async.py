@@ -0,0 +1,465 @@
+"""
+Асинхронный бот для озвучки текста.
+Разбор pdf и синтез речи уходят в пул потоков, поэтому один пользователь
+с тяжёлой страницей не блокирует остальных.
+Замер задержки: `python main_async.py --simulate 50 --file tests/test.pdf`
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+from collections import Counter
+from functools import partial, wraps
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator
+from dotenv import load_dotenv
+from telebot import asyncio_helper, types
+from telebot.async_telebot import AsyncTeleBot
+from benchmarks.load import percentiles
+from core.engine import Engine
+from core.file_ids import FILE_IDS_NAME, FileIdCache, is_stale
+from core.formats import is_voice
+from core.metrics import ERRORS, STAGE_SECONDS, MetricsServer, stats, summary
+from core.profiling import PROFILER
+from core.speakers import PDFSpeaker
+from core.uploads import MAX_UPLOAD_BYTES, UPLOAD_CHUNK, UploadTooLarge, UploadWriter
+from core.voices import AudioData
+
+
+# Извлекаем токен в окружение
+load_dotenv()
+
+bot = AsyncTeleBot(os.environ.get("speaker_bot", ""))
+
+log = logging.getLogger(__name__)
+# Обработчики файлов.
+GENERATORS = Engine()
+# file_id уже отправленной озвучки, повторно не загружаем.
+FILE_IDS = FileIdCache(
+    Path(GENERATORS.temp_path, FILE_IDS_NAME), audio_root=GENERATORS.audio_cache.root
+)
+stats("speaker_file_ids", "file_id отправленной озвучки.", FILE_IDS.stats)
+# Пользователи которым доступны команды /metrics и /profile, через запятую в .env.
+ADMINS: set[str] = set(filter(None, os.environ.get("speaker_admins", "").split(",")))
+# Потоки для разбора файлов и синтеза речи.
+EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="speak")
+
+button_menu = types.KeyboardButton("Домой")
+button_download_pdf = types.KeyboardButton("Загрузить PDF файл")
+button_use_old = types.KeyboardButton("Использовать загруженый файл")
+button_start_page = types.KeyboardButton("С начала")
+button_next = types.KeyboardButton("Следующая страница")
+
+# Чаты от которых ждём номер страницы.
+waiting_page: set[int] = set()
+# Страницы одного чата озвучиваются по очереди.
+chat_locks: dict[int, asyncio.Lock] = {}
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Выполняем блокирующий вызов в пуле потоков."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EXECUTOR, partial(func, *args, **kwargs))
+
+
+def timed(handler: Callable) -> Callable:
+    """Замеряем время обработки сообщения в метрике этапа update."""
+
+    @wraps(handler)
+    async def wrapper(*args, **kwargs):
+        with STAGE_SECONDS.time(stage="update"):
+            return await handler(*args, **kwargs)
+
+    return wrapper
+
+
+def get_filename(message: types.Message) -> str:
+    """Задаём имя загруженному фаулу."""
+
+    return f"temp_{message.chat.username}.pdf"
+
+
+@bot.message_handler(commands=["start", "Домой", "H", "Д"])
+@timed
+async def send_welcome(message: types.Message):
+    """Обработчик команды start"""
+
+    log.info("Приперся тут один.", extra={str(message.chat.id): message.chat.username})
+    await bot.send_message(message.chat.id, "Привет! Я озвучиваю PDF книги")
+    await menu(message)
+
+
+def parse_pages(text: str | None) -> tuple[int, int | None]:
+    """Диапазон страниц из '/export [первая [последняя]]'."""
+
+    numbers = [int(n) for n in (text or "").split()[1:3] if n.isdigit()]
+    first: int = numbers[0] if numbers else 0
+    last: int | None = numbers[1] if len(numbers) > 1 else None
+    return first, last
+
+
+@bot.message_handler(commands=["export"])
+@timed
+async def export_book(message: types.Message):
+    """Озвучиваем всю книгу или диапазон страниц несколькими файлами."""
+
+    first, last = parse_pages(message.text)
+    status = await bot.send_message(message.chat.id, "Озвучиваю книгу...")
+    loop = asyncio.get_running_loop()
+    shown: list[int] = [0]
+
+    def progress(done: int, total: int) -> None:
+        percent = done * 100 // total
+        if percent - shown[0] >= 10 or done == total:
+            shown[0] = percent
+            asyncio.run_coroutine_threadsafe(
+                bot.edit_message_text(
+                    f"Озвучено страниц: {done} из {total}",
+                    message.chat.id,
+                    status.message_id,
+                ),
+                loop,
+            )
+
+    try:
+        future = await run_blocking(
+            GENERATORS.export, message.chat.username, first, last, progress
+        )
+        files: list[Path] = await asyncio.wrap_future(future)
+    except KeyError:
+        await bot.reply_to(message, "Сначала загрузите PDF файл.")
+        return await menu(message)
+    except Exception as e:
+        log.exception("Выгрузка не удалась.", exc_info=False, extra={"Exception": e})
+        await bot.send_message(message.chat.id, "Возникли проблемы с озвучкой книги.")
+        return await menu(message)
+    try:
+        for file in files:
+            if not await send_audio(message, file):
+                break
+    finally:
+        for file in files:
+            os.remove(file)
+    await menu(message)
+
+
+@bot.message_handler(commands=["metrics"])
+@timed
+async def send_metrics(message: types.Message):
+    """Метрики для администраторов, остальным команда не видна."""
+
+    if message.chat.username not in ADMINS:
+        return await menu(message)
+    text: str = summary() or "Метрик пока нет."
+    for start in range(0, len(text), 4000):
+        await bot.send_message(message.chat.id, text[start : start + 4000])
+
+
+@bot.message_handler(commands=["profile"])
+@timed
+async def switch_profile(message: types.Message):
+    """
+    Профилирование медленных запросов для администраторов: /profile on|off.
+    Процессы пула озвучки включаются только переменной speaker_profile.
+    """
+
+    if message.chat.username not in ADMINS:
+        return await menu(message)
+    arg: str = (message.text or "").partition(" ")[2].strip().lower()
+    if arg == "on":
+        PROFILER.enable()
+    elif arg == "off":
+        PROFILER.disable()
+    state: str = "включено" if PROFILER.enabled else "выключено"
+    await bot.send_message(
+        message.chat.id,
+        f"Профилирование {state}, порог {PROFILER.threshold} с, "
+        f"дампов {PROFILER.dumps} в {PROFILER.root}",
+    )
+
+
+@bot.message_handler(content_types=["text"])
+@timed
+async def keyboard_actions(message: types.Message):
+    """Обработка кнопок и номера страницы."""
+
+    text: str = message.text or ""
+    if message.chat.id in waiting_page and text not in (
+        button_menu.text,
+        button_download_pdf.text,
+    ):
+        waiting_page.discard(message.chat.id)
+        if text == button_start_page.text:
+            return await create_gen(message)
+        if text.isdigit():
+            return await create_gen(message, page=int(text))
+        await bot.reply_to(message=message, text="Возникли проблемы с вашими руками!")
+        return await start_read(message)
+    if text == button_download_pdf.text:
+        await bot.send_message(message.chat.id, "Отправьте PDF файл.")
+    elif text == button_use_old.text:
+        await bot.send_message(message.chat.id, "Принято.")
+        await start_read(message)
+    elif text == button_next.text:
+        await speak_text(message)
+    else:
+        await menu(message)
+
+
+async def menu(message: types.Message):
+    """Главное меню бота."""
+
+    GENERATORS.cancel(message.chat.username)
+    waiting_page.discard(message.chat.id)
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    buts: list[types.KeyboardButton] = [button_download_pdf]
+    if GENERATORS.has_document(message.chat.username):
+        buts.append(button_use_old)
+    await bot.send_message(
+        message.chat.id,
+        "Отправь мне прикреплённый PDF файл, я могу озвучить его текст. \
+            \nЕсли я найду старый файл мы можем прослушать его.",
+        reply_markup=markup.row(*buts),
+    )
+
+
+async def start_read(message: types.Message):
+    """Спрашиваем начальную страницу чтения."""
+
+    waiting_page.add(message.chat.id)
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    markup.row(button_start_page, button_menu)
+    await bot.send_message(
+        message.chat.id,
+        "Читаем с начала? Или введи номер страницы.",
+        reply_markup=markup,
+    )
+
+
+async def create_gen(message: types.Message, page: int = 1):
+    """Создаем генератор и записываем его в словарь {имя_пользователя/генератор}"""
+
+    try:
+        await run_blocking(GENERATORS.set_worker, name=message.chat.username, page=page)
+        return await speak_text(message)
+    except ValueError as e:
+        log.info("Не создан обработчик: %s", e)
+        await bot.send_message(
+            message.chat.id, "Возникла внутренняя ошибка, вас выернут в меню."
+        )
+    return await menu(message)
+
+
+def next_page(name: str, engine: Engine = GENERATORS) -> Iterator[Path]:
+    """
+    Озвучиваем следующую страницу пользователя, блокирующий вызов.
+    Длинная страница приходит двумя файлами, первый кусок сразу.
+    Конец книги - IndexError: StopIteration нельзя вернуть из run_in_executor,
+    await такого вызова никогда не завершится.
+    """
+
+    try:
+        return engine.get_worker(name).stream()
+    except StopIteration:
+        raise IndexError(name) from None
+
+
+async def speak_text(message: types.Message):
+    """Озвучиваем текст."""
+
+    lock = chat_locks.setdefault(message.chat.id, asyncio.Lock())
+    async with lock:
+        try:
+            audio_paths = await run_blocking(next_page, message.chat.username)
+            audio_path: Path | None = await run_blocking(next, audio_paths, None)
+        except IndexError:
+            await bot.reply_to(message, "Книга закончилась")
+            return await menu(message)
+        except KeyError:
+            await bot.reply_to(message, "Что-то пошло не так")
+            log.info(
+                "Пропал обработчик файла.",
+                extra={str(message.chat.id): message.chat.username},
+            )
+            return await menu(message)
+        while audio_path is not None:
+            if not await send_audio(message, audio_path):
+                return await menu(message)
+            audio_path = await run_blocking(next, audio_paths, None)
+    markup = types.ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    markup.row(button_next, button_menu)
+    await bot.send_message(
+        message.chat.id,
+        "Страницы с картинками не будут озвучены. Жми далее или в меню.",
+        reply_markup=markup,
+    )
+
+
+async def send_audio(message: types.Message, audio_file: Path | AudioData) -> bool:
+    """
+    Send audio file to user.
+    Уже загруженная озвучка отправляется по file_id без загрузки,
+    Ogg/Opus уходит голосовым сообщением, AudioData - прямо из памяти.
+    """
+
+    in_memory: bool = isinstance(audio_file, AudioData)
+    voice: bool = is_voice(audio_file.file_name if in_memory else audio_file)
+    kind: str = "voice" if voice else "audio"
+    send: Callable = bot.send_voice if voice else bot.send_audio
+    try:
+        with STAGE_SECONDS.time(
+            stage="send", **GENERATORS.labels(message.chat.username)
+        ):
+            digest: str = await run_blocking(FILE_IDS.digest, audio_file)
+            file_id: str | None = await run_blocking(FILE_IDS.get, digest, kind)
+            if file_id is not None:
+                try:
+                    await send(message.chat.id, file_id)
+                    return True
+                except asyncio_helper.ApiTelegramException as e:
+                    if not is_stale(e):
+                        raise
+                    await run_blocking(FILE_IDS.discard, digest, kind)
+            with audio_file.open() if in_memory else open(audio_file, "rb") as f:
+                sent: types.Message = await send(message.chat.id, f)
+            media = sent.voice if voice else sent.audio
+            if media:
+                await run_blocking(FILE_IDS.put, digest, media.file_id, kind)
+    except Exception as e:
+        ERRORS.inc(stage="send")
+        log.exception("Аудио не ушло.", exc_info=True, extra={"Exception": e})
+        await bot.send_message(message.chat.id, "Возникли проблемы с отправкой.")
+        return False
+    return True
+
+
+@bot.message_handler(content_types=["document"])
+@timed
+async def handle_document(message: types.Message):
+    """Загружаем и сохраняем pdf файл."""
+
+    if (message.document.file_size or 0) > MAX_UPLOAD_BYTES:
+        await bot.send_message(message.chat.id, "Файл слишком большой.")
+        return await menu(message)
+    try:
+        file: types.File = await bot.get_file(message.document.file_id)
+        with STAGE_SECONDS.time(
+            stage="download", **GENERATORS.labels(message.chat.username)
+        ):
+            await download(
+                file.file_path, Path(GENERATORS.temp_path, get_filename(message))
+            )
+    except UploadTooLarge:
+        await bot.send_message(message.chat.id, "Файл слишком большой.")
+        return await menu(message)
+    except Exception as e:
+        ERRORS.inc(stage="download")
+        log.exception(
+            "Невозможно загрузить файл.", exc_info=False, extra={"Exception": e}
+        )
+        await bot.send_message(message.chat.id, "Возникли проблемы с заггрузкой файла.")
+        return await menu(message)
+    try:
+        with STAGE_SECONDS.time(stage="index"):
+            await run_blocking(GENERATORS.index_document, message.chat.username)
+    except Exception as e:
+        ERRORS.inc(stage="index")
+        log.exception("Файл не читается.", exc_info=False, extra={"Exception": e})
+        await bot.send_message(message.chat.id, "Не получается прочитать файл.")
+        return await menu(message)
+    await bot.send_message(message.chat.id, "Файл успешно загружен.")
+    await start_read(message)
+
+
+async def download(file_path: str, file_name: Path) -> str:
+    """Качаем файл с серверов Telegram потоком, вернёт sha256 содержимого."""
+
+    url: str = asyncio_helper.FILE_URL or "https://api.telegram.org/file/bot{0}/{1}"
+    session = await asyncio_helper.session_manager.get_session()
+    async with session.get(url.format(bot.token, file_path)) as response:
+        if response.status != 200:
+            raise asyncio_helper.ApiHTTPException("Download file", response)
+        if (response.content_length or 0) > MAX_UPLOAD_BYTES:
+            raise UploadTooLarge(f"Файл больше {MAX_UPLOAD_BYTES} байт")
+        # Запись на диск в потоках EXECUTOR, цикл событий не ждёт диск.
+        with UploadWriter(file_name) as writer:
+            async for chunk in response.content.iter_chunked(UPLOAD_CHUNK):
+                await run_blocking(writer.write, chunk)
+            return await run_blocking(writer.commit)
+
+
+async def simulate(chats: int, pages: int, file_name: str, speaker: str) -> dict:
+    """
+    Имитируем chats одновременных пользователей листающих pages страниц
+    без Telegram, замеряем задержку перелистывания. Озвучка идёт
+    в отдельном временном Engine, temp бота не трогаем.
+    """
+
+    tmp = tempfile.mkdtemp()
+    engine = Engine(temp_path=tmp)
+    names = [f"simulated_{num}" for num in range(chats)]
+    latency: list[float] = []
+    errors: list[str] = []
+
+    async def user(name: str) -> None:
+        shutil.copy(file_name, engine.upload_filename(name, PDFSpeaker))
+        try:
+            await run_blocking(engine.set_worker, name=name, speaker_name=speaker)
+            for _ in range(pages):
+                start = time.perf_counter()
+                audio_paths = await run_blocking(next_page, name, engine)
+                await run_blocking(next, audio_paths, None)
+                # Задержка до первого звука, остаток страницы догружается.
+                latency.append(time.perf_counter() - start)
+                await run_blocking(list, audio_paths)
+        except IndexError:
+            pass
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*map(user, names))
+    finally:
+        wall = time.perf_counter() - start
+        engine.scheduler.shutdown()
+        engine.sessions.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        "chats": chats,
+        "pages": len(latency),
+        "errors": dict(Counter(errors)),
+        "wall_s": round(wall, 3),
+        **percentiles(latency),
+    }
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--simulate", type=int, metavar="CHATS")
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument(
+        "--file", default=str(Path(__file__).with_name("tests") / "test.pdf")
+    )
+    parser.add_argument("--speaker", default="synthetic")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+    if args.simulate:
+        print(asyncio.run(simulate(args.simulate, args.pages, args.file, args.speaker)))
+    else:
+        log.info("Поехали")
+        GENERATORS.warm()
+        GENERATORS.janitor.start()
+        MetricsServer().start()
+        asyncio.run(bot.infinity_polling())
+        log.info("Приехали.")
@@ -0,0 +1,23 @@
+"""
+Генератор голоса для тестов: пишет текст вместо звука,
+поэтому озвучку можно сравнить с текстом страницы.
+"""
+
+from pathlib import Path
+
+
+class StubSpeaker:
+    """Генератор голоса который пишет текст вместо звука."""
+
+    calls: int = 0
+
+    def __init__(self, rate: int = 100) -> None:
+        self.rate = rate
+
+    @property
+    def params(self) -> dict:
+        return {"rate": self.rate}
+
+    def save_to_file(self, text: str, file_name: str):
+        StubSpeaker.calls += 1
+        Path(file_name).write_bytes(text.encode())
@@ -0,0 +1,69 @@
+"""
+Тесты кеша озвученных страниц."""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from core.audio import AudioCache, audio_key
+from core.speakers import PDFSpeaker
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestAudioCache(TestCase):
+    """Тестируем кеш озвучки."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.cache = AudioCache(Path(self.tmp, "audio"))
+        StubSpeaker.calls = 0
+        return super().setUp()
+
+    def test_key(self):
+        """Ключ зависит от текста и настроек генератора."""
+
+        self.assertEqual(audio_key("a", StubSpeaker()), audio_key("a", StubSpeaker()))
+        self.assertNotEqual(audio_key("a", StubSpeaker()), audio_key("b", StubSpeaker()))
+        self.assertNotEqual(
+            audio_key("a", StubSpeaker(100)), audio_key("a", StubSpeaker(200))
+        )
+
+    def test_quota(self):
+        """Старые файлы удаляются при превышении квоты."""
+
+        self.cache.max_bytes = 10
+        for key in ("a", "b", "c"):
+            self.cache.root.mkdir(exist_ok=True)
+            self.cache.path(key).write_bytes(b"12345")
+            self.cache.add(key)
+            self.cache.get("a")
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertFalse(os.path.isfile(self.cache.path("b")))
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_reload_from_disk(self):
+        """Новый объект кеша находит файлы на диске."""
+
+        self.cache.get("none")
+        self.cache.path("a").write_bytes(b"123")
+        self.cache.add("a")
+        self.assertIsNotNone(AudioCache(self.cache.root).get("a"))
+
+    def test_pdf_speaker_skips_synthesis(self):
+        """Повторная озвучка страницы берётся из кеша."""
+
+        file = Path(self.tmp, "temp_user.pdf")
+        shutil.copy(TEST_FILE, file)
+        first = PDFSpeaker(str(file), StubSpeaker, self.cache)
+        second = PDFSpeaker(str(file), StubSpeaker, self.cache)
+        self.assertEqual(first[1], second[1])
+        self.assertEqual(StubSpeaker.calls, 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
@@ -0,0 +1,37 @@
+"""
+Тесты набора замеров."""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from benchmarks.bench import compare, make_book, run
+from core.speakers import PDFSpeaker
+
+
+def result(**medians: float) -> dict:
+    return {"results": {name: {"median_s": s} for name, s in medians.items()}}
+
+
+class TestBench(TestCase):
+    """Тестируем сборку книг и сравнение с базовой линией."""
+
+    def test_make_book(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            book = make_book(10, Path(tmp, "large.pdf"))
+            self.assertEqual(len(PDFSpeaker(str(book), object)), 10)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_compare(self):
+        baseline = result(fast=0.0001, slow=1.0, same=1.0)
+        current = result(fast=0.0005, slow=1.5, same=1.1, new=1.0)
+        regressions = compare(baseline, current, threshold=0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("slow"))
+
+    def test_run(self):
+        baseline = run(repeat=1, large_pages=())
+        self.assertIn("test_pdf.worker_iter", baseline["results"])
+        self.assertEqual(compare(baseline, baseline), [])
@@ -0,0 +1,120 @@
+"""
+Тесты кеша разобранных документов."""
+import io
+import os
+import mmap
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+import PyPDF2
+from core.cache import DocumentCache
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestDocumentCache(TestCase):
+    """Тестируем кеш документов."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.file = Path(self.tmp, "test.pdf")
+        shutil.copy(TEST_FILE, self.file)
+        return super().setUp()
+
+    def test_hit_miss(self):
+        """Повторное открытие документа не разбирает его заново."""
+
+        cache = DocumentCache()
+        with cache.open(self.file, PyPDF2.PdfReader) as first:
+            pass
+        with cache.open(self.file, PyPDF2.PdfReader) as second:
+            self.assertIs(first, second)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_mtime_invalidates(self):
+        """Изменённый файл разбирается заново."""
+
+        cache = DocumentCache()
+        with cache.open(self.file, PyPDF2.PdfReader):
+            pass
+        stat = os.stat(self.file)
+        os.utime(self.file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with cache.open(self.file, PyPDF2.PdfReader):
+            pass
+        self.assertEqual(cache.misses, 2)
+
+    def test_evict_by_budget(self):
+        """Документы сверх бюджета вытесняются."""
+
+        other = Path(self.tmp, "other.pdf")
+        shutil.copy(TEST_FILE, other)
+        cache = DocumentCache()
+        for path in (self.file, other):
+            with cache.open(path, PyPDF2.PdfReader):
+                pass
+            cache.max_bytes = cache.size
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.evictions, 1)
+        self.assertLessEqual(cache.size, cache.max_bytes)
+
+    def test_mmap(self):
+        """Разборщик читает отображение файла, а не копию."""
+
+        streams = []
+
+        def loader(stream):
+            streams.append(stream)
+            return PyPDF2.PdfReader(stream)
+
+        with DocumentCache().open(self.file, loader) as reader:
+            self.assertIn("Hi", reader.pages[0].extract_text())
+        self.assertIsInstance(streams[0], mmap.mmap)
+        with DocumentCache(use_mmap=False).open(self.file, loader):
+            pass
+        self.assertIsInstance(streams[1], io.BytesIO)
+
+    def test_mmap_size(self):
+        """Отображение не входит в бюджет, только разобранные объекты."""
+
+        cache = DocumentCache()
+        with cache.open(self.file, PyPDF2.PdfReader):
+            pass
+        self.assertLess(cache.size, os.path.getsize(self.file))
+        copied = DocumentCache(use_mmap=False)
+        with copied.open(self.file, PyPDF2.PdfReader):
+            pass
+        self.assertEqual(copied.size, os.path.getsize(self.file))
+
+    def test_close_evicted(self):
+        """Вытесненное отображение закрывается когда документ отпущен."""
+
+        streams = []
+
+        def loader(stream):
+            streams.append(stream)
+            return PyPDF2.PdfReader(stream)
+
+        cache = DocumentCache()
+        with cache.open(self.file, loader):
+            cache.discard(self.file)
+            self.assertFalse(streams[0].closed)
+        self.assertTrue(streams[0].closed)
+        with cache.open(self.file, loader):
+            pass
+        cache.clear()
+        self.assertTrue(streams[1].closed)
+
+    def test_empty_file(self):
+        """Пустой файл не отображается, разборщик получает пустой поток."""
+
+        empty = Path(self.tmp, "empty.pdf")
+        empty.touch()
+        with DocumentCache().open(empty, lambda stream: stream.read()) as data:
+            self.assertEqual(data, b"")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
@@ -0,0 +1,134 @@
+"""
+Тесты озвучки страницы по кускам."""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import TestCase
+from core.audio import AudioCache
+from core.chunks import ChunkedJob, join_audio, release, split_text
+from core.engine import Worker
+from core.scheduler import Scheduler
+from core.speakers import PDFSpeaker
+from core.voices import SynthesisJob
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class GatedSpeaker(StubSpeaker):
+    """Первый кусок страницы озвучивает сразу, остальные - после release."""
+
+    release = threading.Event()
+
+    def save_to_file(self, text: str, file_name: str):
+        if not text.startswith("Страница"):
+            self.release.wait(5)
+        super().save_to_file(text, file_name)
+
+
+class TestChunks(TestCase):
+    """Тестируем нарезку и склейку."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        return super().setUp()
+
+    def test_split_text(self):
+        """Куски не длиннее лимита и режутся по предложениям."""
+
+        text = "Первое предложение. Второе! Третье? " * 20
+        chunks = split_text(text, 50)
+        self.assertTrue(all(len(chunk) <= 50 for chunk in chunks))
+        self.assertIn(chunks[0][-1], ".!?")
+        self.assertEqual(" ".join(chunks).split(), text.split())
+        self.assertEqual(split_text("коротко", 50), ["коротко"])
+        self.assertEqual(split_text("x" * 120, 50), ["x" * 50, "x" * 50, "x" * 20])
+
+    def test_join_wav(self):
+        """wav склеивается в один корректный файл."""
+
+        parts = []
+        for num in range(3):
+            part = str(Path(self.tmp, f"{num}.wav"))
+            with wave.open(part, "wb") as f:
+                f.setparams((1, 2, 8000, 0, "NONE", "not compressed"))
+                f.writeframes(b"\x00\x00" * 100)
+            parts.append(part)
+        target = join_audio(parts, str(Path(self.tmp, "all.mp3")))
+        with wave.open(target, "rb") as f:
+            self.assertEqual(f.getnframes(), 300)
+
+    def test_chunked_job(self):
+        """Куски озвучиваются параллельно и склеиваются по порядку."""
+
+        job = SynthesisJob(
+            StubSpeaker, "Раз. Два. Три.", str(Path(self.tmp, "page.mp3"))
+        )
+        chunked = ChunkedJob(job, 5)
+        self.assertEqual(len(chunked), 3)
+        with ThreadPoolExecutor(3) as pool:
+            first, rest, whole = chunked.submit(
+                lambda part: pool.submit(part), then=Path
+            )
+            self.assertEqual(Path(whole.result()).read_text(), "Раз.Два.Три.")
+        self.assertEqual(Path(first.result()).read_text(), "Раз.")
+        self.assertEqual(Path(rest.result()).read_text(), "Два.Три.")
+
+    def test_release(self):
+        """В кеш попадает только весь текст, куски удаляются после отправки."""
+
+        cache = AudioCache(Path(self.tmp, "audio"))
+        cache.root.mkdir()
+        job = SynthesisJob(StubSpeaker, "Раз. Два. Три.", str(cache.path("a" * 64)))
+        with ThreadPoolExecutor(3) as pool:
+            first, rest, whole = ChunkedJob(job, 5).submit(
+                lambda part: pool.submit(part), then=lambda name: cache.add("a" * 64)
+            )
+            whole.result()
+        self.assertEqual(len(cache), 1)
+        self.assertTrue(first.result().name.startswith("."))
+        release(first, rest, whole)
+        self.assertEqual(os.listdir(cache.root), [whole.result().name])
+
+    def test_worker_stream(self):
+        """Длинная страница приходит первым куском и остатком."""
+
+        file = Path(self.tmp, "temp_user.pdf")
+        shutil.copy(TEST_FILE, file)
+        reader = PDFSpeaker(str(file), GatedSpeaker, AudioCache(Path(self.tmp, "a")))
+        scheduler = Scheduler(2, ThreadPoolExecutor(2))
+        worker = Worker(reader, scheduler=scheduler, user="user", chunk_chars=10)
+        GatedSpeaker.release.clear()
+        try:
+            parts = worker.stream()
+            first = next(parts)
+            # Остальные куски ещё ждут, а первый уже готов к отправке.
+            self.assertTrue(first.read_text().startswith("Страница 0"))
+            self.assertIsNone(reader.cached(reader.page_text(0)))
+            self.assertEqual(worker.page, 1)
+            GatedSpeaker.release.set()
+            rest = next(parts)
+            self.assertEqual(
+                "".join((first.read_text() + rest.read_text()).split()),
+                "".join(reader.page_text(0).split()),
+            )
+            self.assertRaises(StopIteration, next, parts)
+            # Целая страница склеивается сразу после остатка.
+            deadline = time.monotonic() + 5
+            while reader.cached(reader.page_text(0)) is None:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+        finally:
+            GatedSpeaker.release.set()
+            scheduler.shutdown()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
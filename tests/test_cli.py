@@ -0,0 +1,84 @@
+"""
+Тесты пакетной озвучки из командной строки."""
+
+import wave
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import TestCase, mock
+from benchmarks.bench import make_text_book
+from cli import convert, find_books, page_path
+from core import index
+from core.chunks import audio_seconds
+from core.scheduler import Scheduler
+from core.speakers import PDFSpeaker
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestCli(TestCase):
+    """Тестируем озвучку каталога книг."""
+
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp())
+        Path(self.tmp, "books", "nested").mkdir(parents=True)
+        shutil.copy(TEST_FILE, Path(self.tmp, "books", "a.pdf"))
+        shutil.copy(TEST_FILE, Path(self.tmp, "books", "nested", "b.pdf"))
+        Path(self.tmp, "books", "notes.txt").write_text("")
+        self.out = Path(self.tmp, "out")
+        self.scheduler = Scheduler(2, ThreadPoolExecutor(2))
+        return super().setUp()
+
+    def test_find_books(self):
+        books = find_books([str(Path(self.tmp, "books"))], PDFSpeaker)
+        self.assertEqual([book.name for book in books], ["a.pdf", "b.pdf"])
+        pattern = str(Path(self.tmp, "**", "a.pdf"))
+        self.assertEqual(len(find_books([pattern, pattern], PDFSpeaker)), 1)
+
+    def test_resume(self):
+        """Повторный запуск пропускает озвученные страницы."""
+
+        books = find_books([str(Path(self.tmp, "books"))], PDFSpeaker)
+        first = convert(books, self.out, StubSpeaker, PDFSpeaker, self.scheduler)
+        self.assertEqual(first["failed"], 0)
+        self.assertGreater(first["converted"], 0)
+        self.assertTrue(page_path(self.out, books[0], 0).is_file())
+        page_path(self.out, books[0], 0).unlink()
+        second = convert(books, self.out, StubSpeaker, PDFSpeaker, self.scheduler)
+        self.assertEqual(second["converted"], 1)
+        self.assertEqual(second["skipped"], first["converted"] - 1)
+
+    def test_same_name(self):
+        """Книги с одним именем из разных каталогов озвучиваются отдельно."""
+
+        make_text_book(2, Path(self.tmp, "books", "nested", "a.pdf"))
+        books = find_books([str(Path(self.tmp, "books"))], PDFSpeaker)
+        self.assertEqual([book.name for book in books], ["a.pdf", "a.pdf", "b.pdf"])
+        self.assertNotEqual(
+            page_path(self.out, books[0], 0).parent,
+            page_path(self.out, books[1], 0).parent,
+        )
+        with mock.patch.object(index, "INDEX_DIR", Path(self.out, ".index")):
+            result = convert(books, self.out, StubSpeaker, PDFSpeaker, self.scheduler)
+        self.assertEqual(result["skipped"], 0)
+        self.assertEqual(result["failed"], 0)
+        self.assertEqual(list(Path(self.tmp, "books").rglob("*.sqlite")), [])
+
+    def test_audio_seconds(self):
+        wav = Path(self.tmp, "a.wav")
+        with wave.open(str(wav), "wb") as f:
+            f.setparams((1, 2, 8000, 0, "NONE", "not compressed"))
+            f.writeframes(b"\0\0" * 16000)
+        self.assertEqual(audio_seconds(wav), 2.0)
+        mp3 = Path(self.tmp, "a.mp3")
+        # Кадр MPEG2 layer III 32 кбит/с и 4000 байт - секунда звука.
+        mp3.write_bytes(b"\xff\xf3\x44\xc4" + b"\0" * 3996)
+        self.assertEqual(audio_seconds(mp3), 1.0)
+
+    def tearDown(self) -> None:
+        self.scheduler.shutdown()
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
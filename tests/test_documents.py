@@ -0,0 +1,77 @@
+"""
+Тесты хранилища книг по хешу."""
+
+import shutil
+import time
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from core.documents import DocumentStore
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestDocumentStore(TestCase):
+    """Тестируем общие книги и подсчёт ссылок."""
+
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp())
+        self.store = DocumentStore(Path(self.tmp, "docs"))
+        return super().setUp()
+
+    def upload(self, name: str, data: bytes | None = None) -> Path:
+        path = Path(self.tmp, f"temp_{name}.pdf")
+        if data is None:
+            shutil.copy(TEST_FILE, path)
+        else:
+            path.write_bytes(data)
+        return path
+
+    def test_dedup(self):
+        """Одинаковые загрузки хранятся одной книгой."""
+
+        blobs = {self.store.add(f"{n}.pdf", self.upload(n)) for n in "abc"}
+        self.assertEqual(len(blobs), 1)
+        blob = blobs.pop()
+        self.assertEqual(self.store.refcount(blob.stem), 3)
+        self.assertEqual(self.store.resolve("b.pdf"), blob)
+        self.assertEqual(self.store.stats()["blobs"], 1)
+        self.assertFalse(Path(self.tmp, "temp_a.pdf").exists())
+
+    def test_release(self):
+        """Книга удаляется вместе с последней ссылкой."""
+
+        blob = self.store.add("a.pdf", self.upload("a"))
+        self.store.add("b.pdf", self.upload("b"))
+        self.store.release("a.pdf")
+        self.assertTrue(blob.is_file())
+        self.store.add("b.pdf", self.upload("b", b"other"))
+        self.assertFalse(blob.is_file())
+        self.assertIsNone(self.store.resolve("a.pdf"))
+
+    def test_persist(self):
+        """Ссылки переживают перезапуск."""
+
+        blob = self.store.add("a.pdf", self.upload("a"))
+        store = DocumentStore(self.store.root)
+        self.assertEqual(store.resolve("a.pdf"), blob)
+        self.assertEqual(store.expire(-1), 1)
+        self.assertFalse(blob.is_file())
+
+    def test_flush(self):
+        """Обращение к книге не переписывает ссылки, их пишет flush."""
+
+        self.store.add("a.pdf", self.upload("a"))
+        refs = Path(self.store.root, "refs.json")
+        written = refs.read_text()
+        time.sleep(0.01)
+        self.store.resolve("a.pdf")
+        self.assertEqual(refs.read_text(), written)
+        self.assertTrue(self.store.flush())
+        self.assertNotEqual(refs.read_text(), written)
+        self.assertFalse(self.store.flush())
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
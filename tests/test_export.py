@@ -0,0 +1,90 @@
+"""
+Тесты выгрузки книги целиком."""
+
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import TestCase
+from core.audio import AudioCache
+from core.export import Export, split_volumes
+from core.scheduler import Priority, Scheduler
+from core.speakers import PDFSpeaker
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestExport(TestCase):
+    """Тестируем озвучку диапазона страниц."""
+
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp())
+        file = Path(self.tmp, "temp_user.pdf")
+        shutil.copy(TEST_FILE, file)
+        self.reader = PDFSpeaker(
+            str(file), StubSpeaker, AudioCache(Path(self.tmp, "audio"))
+        )
+        self.scheduler = Scheduler(2, ThreadPoolExecutor(2))
+        return super().setUp()
+
+    def test_split_volumes(self):
+        parts = []
+        for num, size in enumerate((3, 3, 5, 1)):
+            parts.append(str(Path(self.tmp, f"{num}.mp3")))
+            Path(parts[-1]).write_bytes(b"x" * size)
+        self.assertEqual(
+            split_volumes(parts, max_bytes=5),
+            [parts[:1], parts[1:2], parts[2:3], parts[3:]],
+        )
+
+    def test_export(self):
+        """Все страницы озвучены по порядку, прогресс доходит до конца."""
+
+        seen: list[tuple[int, int]] = []
+        pages = range(len(self.reader))
+        export = Export(
+            self.reader,
+            pages,
+            Path(self.tmp, "book"),
+            progress=lambda *a: seen.append(a),
+        )
+        files = export.submit(self.scheduler, "user").result(timeout=10)
+        text = "".join(file.read_text() for file in files)
+        self.assertEqual(text, "".join(self.reader.page_text(n) for n in pages))
+        self.assertEqual(max(seen), (len(pages), len(pages)))
+
+    def test_volume_limit(self):
+        """Выгрузка делится на тома по размеру."""
+
+        pages = range(min(3, len(self.reader)))
+        export = Export(self.reader, pages, Path(self.tmp, "book"), max_bytes=1)
+        files = export.submit(self.scheduler, "user").result(timeout=10)
+        self.assertEqual(len(files), len(pages))
+        self.assertEqual(files[0].name, "book-1.mp3")
+
+    def test_slow_progress(self):
+        """Медленный прогресс не задерживает задачи других пользователей."""
+
+        release = threading.Event()
+        export = Export(
+            self.reader,
+            range(len(self.reader)),
+            Path(self.tmp, "book"),
+            progress=lambda *a: release.wait(10),
+        )
+        result = export.submit(self.scheduler, "user")
+        try:
+            other = self.scheduler.submit("other", Priority.INTERACTIVE, sum, (1, 2))
+            self.assertEqual(other.result(timeout=5), 3)
+            self.assertFalse(result.done())
+        finally:
+            release.set()
+        self.assertEqual(len(result.result(timeout=10)), 1)
+
+    def tearDown(self) -> None:
+        self.scheduler.shutdown()
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
@@ -0,0 +1,96 @@
+"""
+Тесты кеша file_id отправленной озвучки."""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+from core import file_ids
+from core.file_ids import FileIdCache
+from core.voices import AudioData
+
+
+class TestFileIdCache(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.cache = FileIdCache(Path(self.tmp, "ids.sqlite"))
+
+    def test_audio_cache_key(self):
+        """Файлы кеша озвучки не читаются, ключ берётся из имени."""
+
+        root = Path(self.tmp, "audio")
+        root.mkdir()
+        cache = FileIdCache(Path(self.tmp, "keyed.sqlite"), audio_root=root)
+        key = "ab" * 32
+        page = Path(root, f"{key}.ogg")
+        page.write_bytes(b"audio")
+        other = Path(self.tmp, f"{key}.ogg")
+        other.write_bytes(b"audio")
+        with mock.patch("core.file_ids.hash_file") as hash_file:
+            self.assertEqual(cache.digest(page), key)
+            self.assertEqual(cache.digest(AudioData(str(page), b"audio")), key)
+            hash_file.assert_not_called()
+        self.assertEqual(cache.digest(other), self.cache.digest(other))
+        part = Path(root, f".{key}.0.ogg")
+        part.write_bytes(b"audio")
+        self.assertNotEqual(cache.digest(part), key)
+        cache.close()
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_put_get(self):
+        audio = Path(self.tmp, "page.mp3")
+        audio.write_bytes(b"audio")
+        copy = Path(self.tmp, "copy.mp3")
+        copy.write_bytes(b"audio")
+        digest = self.cache.digest(audio)
+        self.assertEqual(digest, self.cache.digest(copy))
+        self.assertIsNone(self.cache.get(digest))
+        self.cache.put(digest, "id-1")
+        self.assertEqual(self.cache.get(digest), "id-1")
+        self.assertIsNone(self.cache.get(digest, kind="voice"))
+        self.assertEqual(
+            self.cache.stats(), {"hits": 1, "misses": 2, "stale": 0, "ids": 1}
+        )
+
+    def test_persistent(self):
+        self.cache.put("digest", "id-1")
+        self.cache.close()
+        self.cache = FileIdCache(Path(self.tmp, "ids.sqlite"))
+        self.assertEqual(self.cache.get("digest"), "id-1")
+
+    def test_discard(self):
+        self.cache.put("digest", "id-1")
+        self.cache.discard("digest")
+        self.assertIsNone(self.cache.get("digest"))
+        self.assertEqual(self.cache.stale, 1)
+
+    def test_keep(self):
+        self.cache.keep = 2
+        with mock.patch.object(file_ids, "_TRIM_EVERY", 1):
+            for num in range(4):
+                self.cache.put(f"digest{num}", f"id-{num}")
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.get("digest3"), "id-3")
+
+    def test_is_stale(self):
+        def error(code: int, description: str) -> Exception:
+            e = Exception(description)
+            e.error_code, e.description = code, description
+            return e
+
+        self.assertTrue(
+            file_ids.is_stale(
+                error(400, "Bad Request: wrong file identifier/HTTP URL specified")
+            )
+        )
+        self.assertFalse(
+            file_ids.is_stale(error(429, "Too Many Requests: retry after 5"))
+        )
+        self.assertFalse(
+            file_ids.is_stale(error(403, "Forbidden: bot was blocked by the user"))
+        )
+        self.assertFalse(file_ids.is_stale(error(400, "Bad Request: chat not found")))
+        self.assertFalse(file_ids.is_stale(ValueError("wrong file identifier")))
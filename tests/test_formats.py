@@ -0,0 +1,129 @@
+"""
+Тесты формата озвучки и перекодирования в Opus."""
+
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock, skipUnless
+from core import formats
+from core.audio import AudioCache, audio_key
+from core.chunks import audio_seconds, join_audio
+from core.formats import FFMPEG, MP3, audio_format, is_voice, ogg_seconds, opus
+from core.voices import SpeakerSynthetic, SynthesisJob
+from tests.stubs import StubSpeaker
+
+
+def ogg_page(granule: int, payload: bytes) -> bytes:
+    """Страница Ogg без контрольной суммы, её ogg_seconds не проверяет."""
+
+    return b"OggS\x00\x00" + granule.to_bytes(8, "little") + bytes(12) + payload
+
+
+class TestFormats(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_audio_format(self):
+        self.assertIs(audio_format("mp3"), MP3)
+        self.assertIs(audio_format("flac"), MP3)
+        with mock.patch.object(formats, "FFMPEG", None):
+            self.assertIs(audio_format("opus"), MP3)
+        with mock.patch.object(formats, "FFMPEG", "/usr/bin/ffmpeg"):
+            fmt = audio_format("opus", "16k")
+        self.assertEqual(fmt, opus("16k"))
+        self.assertTrue(fmt.voice and fmt.encoded)
+        self.assertEqual(fmt.suffix, ".ogg")
+        args = fmt.ffmpeg_args("pipe:0", "out.ogg")
+        self.assertIn("libopus", args)
+        self.assertEqual(args[args.index("-b:a") + 1], "16k")
+        self.assertTrue(is_voice("page.ogg"))
+        self.assertFalse(is_voice("page.mp3"))
+
+    def test_cache_format(self):
+        cache = AudioCache(Path(self.tmp, "audio"), format=opus())
+        self.assertEqual(cache.path("key").suffix, ".ogg")
+        speaker = StubSpeaker()
+        self.assertNotEqual(
+            audio_key("a", speaker), audio_key("a", speaker, opus().tag)
+        )
+        self.assertEqual(audio_key("a", speaker), audio_key("a", speaker, MP3.tag))
+
+    def test_ogg_seconds(self):
+        head = b"OpusHead\x01\x01" + (312).to_bytes(2, "little") + bytes(8)
+        file = Path(self.tmp, "page.ogg")
+        file.write_bytes(ogg_page(0, head) + ogg_page(48000 * 2 + 312, b"x" * 100))
+        self.assertAlmostEqual(ogg_seconds(file), 2.0)
+        self.assertAlmostEqual(audio_seconds(file), 2.0)
+
+    def test_encode_stream(self):
+        """Генератор с потоковой озвучкой пишет в кодировщик без файла."""
+
+        chunks: list[bytes] = []
+
+        def encode(stream, target, fmt):
+            chunks.extend(stream)
+            Path(target).write_bytes(b"OggS")
+
+        target = str(Path(self.tmp, "page.ogg"))
+        job = SynthesisJob(
+            SpeakerSynthetic, "Раз два.", target, {"latency": 0}, encoding=opus()
+        )
+        with mock.patch("core.voices.encode_stream", encode), mock.patch(
+            "core.voices.encode_file"
+        ) as encode_file:
+            job()
+        encode_file.assert_not_called()
+        self.assertTrue(b"".join(chunks).startswith(b"\xff\xf3"))
+        self.assertEqual(Path(target).read_bytes(), b"OggS")
+
+    def test_encode_file(self):
+        """Остальные генераторы пишут во временный файл, он удаляется."""
+
+        def encode(source, target, fmt):
+            self.assertEqual(Path(source).read_bytes(), "Раз.".encode())
+            Path(target).write_bytes(b"OggS")
+
+        target = str(Path(self.tmp, "page.ogg"))
+        with mock.patch("core.voices.encode_file", encode):
+            SynthesisJob(StubSpeaker, "Раз.", target, encoding=opus())(StubSpeaker())
+        self.assertEqual([p.name for p in self.tmp.iterdir()], ["page.ogg"])
+
+    def test_encode_broken_pipe(self):
+        """Упавший ffmpeg даёт EncodeError с его stderr, а не BrokenPipeError."""
+
+        code = "import sys; sys.stderr.write('Invalid data'); sys.exit(1)"
+
+        def run(args, stdin=None, stdout=subprocess.DEVNULL):
+            return subprocess.Popen(
+                [sys.executable, "-c", code],
+                stdin=stdin,
+                stdout=stdout,
+                stderr=subprocess.PIPE,
+            )
+
+        chunks = [b"\0" * 65536] * 64
+        with mock.patch("core.formats._run", run):
+            with self.assertRaisesRegex(formats.EncodeError, "Invalid data"):
+                formats.encode_stream(chunks, Path(self.tmp, "page.ogg"), opus())
+            with self.assertRaisesRegex(formats.EncodeError, "Invalid data"):
+                formats.encode_bytes(chunks, opus())
+
+    @skipUnless(FFMPEG, "нет ffmpeg")
+    def test_ffmpeg(self):
+        parts = []
+        for num, text in enumerate(("Раз. " * 30, "Два. " * 30)):
+            part = str(Path(self.tmp, f"part{num}.ogg"))
+            SynthesisJob(
+                SpeakerSynthetic, text, part, {"latency": 0}, encoding=opus("16k")
+            )()
+            parts.append(part)
+        whole = join_audio(parts, str(Path(self.tmp, "page.ogg")))
+        self.assertEqual(Path(whole).read_bytes()[:4], b"OggS")
+        self.assertAlmostEqual(
+            audio_seconds(whole), sum(map(audio_seconds, parts)), delta=0.2
+        )
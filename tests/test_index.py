@@ -0,0 +1,129 @@
+"""
+Тесты индекса текста страниц."""
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Generator
+from unittest import TestCase, mock
+from core import index
+from core.cache import DocumentCache
+from core.index import PageIndex, file_hash, get_index, index_path, normalize
+from core.speakers import PDFSpeaker
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestPageIndex(TestCase):
+    """Тестируем индекс страниц."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.file = Path(self.tmp, "temp_user.pdf")
+        shutil.copy(TEST_FILE, self.file)
+        return super().setUp()
+
+    def test_normalize(self):
+        """Нормализация текста страницы."""
+
+        self.assertEqual(normalize(" a   b \n\n  c "), "a b\nc")
+        self.assertEqual(normalize(None), "")
+
+    def test_write_and_read(self):
+        """Пустые страницы попадают в битовую карту."""
+
+        path = Path(self.tmp, "book.index.sqlite")
+        PageIndex.write(path, "digest", ["one", "", "  ", "two"])
+        index = PageIndex(path, "digest")
+        self.assertEqual(len(index), 4)
+        self.assertEqual(
+            [index.is_empty(i) for i in range(4)], [False, True, True, False]
+        )
+        self.assertEqual(index.text(3), "two")
+        self.assertEqual(index.text(1), "")
+        self.assertRaises(IndexError, lambda: index.text(4))
+        index.close()
+
+    def test_built_once(self):
+        """Индекс строится один раз и лежит рядом с файлом."""
+
+        calls: list[int] = []
+
+        def extract():
+            calls.append(1)
+            return ["page"]
+
+        book = Path(self.tmp, "book.pdf")
+        book.write_bytes(self.tmp.encode())
+        first = get_index(book, extract)
+        second = get_index(book, extract)
+        self.assertIs(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(index_path(book, file_hash(book)).is_file())
+
+    def test_lru(self):
+        """Лишние индексы закрываются, закрытый снова открывается при обращении."""
+
+        books = []
+        for num in range(3):
+            books.append(Path(self.tmp, f"lru{num}.pdf"))
+            books[-1].write_bytes(f"{self.tmp}{num}".encode())
+        with mock.patch.object(index, "INDEXES_MAX", 2):
+            first = get_index(books[0], lambda: ["one"])
+            for book in books[1:]:
+                get_index(book, lambda: ["two"])
+            self.assertNotIn(first.digest, index._indexes)
+            self.assertEqual(first.text(0), "one")
+            self.assertIsNot(get_index(books[0], lambda: ["one"]), first)
+
+    def test_parallel_build(self):
+        """Построение большой книги не задерживает другие."""
+
+        release = threading.Event()
+        slow, fast = Path(self.tmp, "slow.pdf"), Path(self.tmp, "fast.pdf")
+        slow.write_bytes(b"slow" + self.tmp.encode())
+        fast.write_bytes(b"fast" + self.tmp.encode())
+
+        def extract():
+            release.wait(5)
+            return ["slow"]
+
+        thread = threading.Thread(target=get_index, args=(slow, extract))
+        thread.start()
+        try:
+            self.assertEqual(get_index(fast, lambda: ["fast"]).text(0), "fast")
+            self.assertTrue(thread.is_alive())
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(get_index(slow, extract).text(0), "slow")
+
+    def test_pdf_speaker(self):
+        """PDFSpeaker берёт текст из индекса."""
+
+        obj = PDFSpeaker(str(self.file), StubSpeaker)
+        self.assertEqual(len(obj), 4)
+        self.assertIn("Страница 1", obj.page_text(1))
+        self.assertIsInstance(obj[1], Path)
+        gen: Generator
+        self.assertIsInstance(gen := obj.extract_text_from_file(3), Generator)
+        self.assertIsInstance(next(gen), str)
+        self.assertRaises(StopIteration, lambda: next(gen))
+
+    def test_document_released(self):
+        """После построения индекса разобранный pdf не остаётся в памяти."""
+
+        file = Path(self.tmp, "released.pdf")
+        file.write_bytes(self.file.read_bytes() + b"\n% released\n")
+        cache = DocumentCache()
+        with mock.patch.object(PDFSpeaker, "documents", cache):
+            self.assertEqual(len(PDFSpeaker.build_index(file)), 4)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
+        self.assertEqual(cache.misses, 1)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
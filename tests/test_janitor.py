@@ -0,0 +1,104 @@
+"""
+Тесты уборки временных файлов."""
+
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+from core.audio import AudioCache
+from core.documents import DocumentStore
+from core.index import INDEX_SUFFIX
+from core.janitor import Janitor
+from core.voices import SynthesisJob
+from tests.stubs import StubSpeaker
+
+
+def make_old(path: Path, age: float) -> None:
+    """Состариваем файл."""
+
+    old = time.time() - age
+    os.utime(path, (old, old))
+
+
+class TestJanitor(TestCase):
+    """Тестируем уборку temp."""
+
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp())
+        self.cache = AudioCache(Path(self.tmp, "audio"))
+        self.janitor = Janitor(
+            self.tmp, self.cache, audio_max_age=100, upload_max_age=100
+        )
+        return super().setUp()
+
+    def test_atomic_job(self):
+        """Озвучка пишется во временный файл и переименовывается."""
+
+        target = str(Path(self.tmp, "page.mp3"))
+        self.assertEqual(SynthesisJob(StubSpeaker, "text", target)(), target)
+        self.assertEqual(os.listdir(self.tmp), ["page.mp3"])
+
+    def test_old_audio(self):
+        """Старая озвучка удаляется, свежая остаётся."""
+
+        for key in ("old", "new"):
+            self.cache.root.mkdir(exist_ok=True)
+            self.cache.path(key).write_bytes(b"1")
+            self.cache.add(key)
+        make_old(self.cache.path("old"), 1000)
+        Path(self.cache.root, ".stale.1-1.mp3").write_bytes(b"1")
+        make_old(Path(self.cache.root, ".stale.1-1.mp3"), 1000)
+        self.assertEqual(self.janitor.run_once()["audio"], 2)
+        self.assertNotIn("old", self.cache)
+        self.assertIn("new", self.cache)
+
+    def test_old_uploads(self):
+        """Старые загрузки и их индексы удаляются."""
+
+        old, new = Path(self.tmp, "temp_old.pdf"), Path(self.tmp, "temp_new.pdf")
+        old.write_bytes(b"old")
+        new.write_bytes(b"new")
+        index = Path(self.tmp, "digest.index.sqlite")
+        index.write_bytes(b"")
+        for path in (old, index):
+            make_old(path, 1000)
+        result = self.janitor.run_once()
+        self.assertEqual((result["uploads"], result["indexes"]), (1, 1))
+        self.assertTrue(new.is_file())
+        self.assertFalse(old.is_file())
+
+    def test_store_indexes(self):
+        """Индексы в хранилище книг без ссылок удаляются, с ссылками - нет."""
+
+        documents = DocumentStore(Path(self.tmp, "docs"))
+        janitor = Janitor(
+            self.tmp,
+            self.cache,
+            audio_max_age=100,
+            upload_max_age=100,
+            documents=documents,
+        )
+        upload = Path(self.tmp, "upload.pdf")
+        upload.write_bytes(b"book")
+        blob = documents.add("user.pdf", upload)
+        kept = blob.with_name(f"{blob.stem}{INDEX_SUFFIX}")
+        orphan = Path(documents.root, f"orphan{INDEX_SUFFIX}")
+        for path in (kept, orphan):
+            path.write_bytes(b"")
+            make_old(path, 1000)
+        self.assertEqual(janitor.run_once()["indexes"], 1)
+        self.assertTrue(kept.is_file())
+        self.assertFalse(orphan.is_file())
+
+    def test_thread(self):
+        """Фоновый поток запускается и останавливается."""
+
+        self.janitor.interval = 0.01
+        self.janitor.start()
+        self.janitor.stop()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
@@ -0,0 +1,60 @@
+"""
+Тесты синтетического генератора голоса и нагрузочного замера."""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from benchmarks.load import main
+from core.chunks import audio_seconds, join_audio
+from core.settings import SPEAKERS
+from core.voices import SYNTHETIC_CHARS_PER_SECOND, SpeakerSynthetic
+
+
+class TestSynthetic(TestCase):
+    """Тестируем синтетический генератор голоса."""
+
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp())
+        return super().setUp()
+
+    def test_silence(self):
+        """Пишется mp3 длиной по тексту, куски склеиваются."""
+
+        speaker = SPEAKERS["synthetic"](latency=0, char_latency=0)
+        self.assertEqual(speaker.params, {"latency": 0, "char_latency": 0})
+        text = "x" * 150
+        parts = [str(Path(self.tmp, f"{n}.mp3")) for n in range(2)]
+        for part in parts:
+            speaker.save_to_file(text, part)
+        seconds = len(text) / SYNTHETIC_CHARS_PER_SECOND
+        self.assertAlmostEqual(audio_seconds(parts[0]), seconds, delta=0.05)
+        whole = join_audio(parts, str(Path(self.tmp, "whole.mp3")))
+        self.assertAlmostEqual(audio_seconds(whole), 2 * seconds, delta=0.1)
+
+    def test_env_latency(self):
+        """Задержку по умолчанию видят и процессы пула через окружение."""
+
+        os.environ["speaker_synthetic_latency"] = "0.5"
+        try:
+            self.assertEqual(SpeakerSynthetic().params["latency"], 0.5)
+        finally:
+            del os.environ["speaker_synthetic_latency"]
+
+    def test_load(self):
+        """Короткий прогон нагрузочного замера без ошибок."""
+
+        out = Path(self.tmp, "load.json")
+        result = main(
+            "--users 3 --pages 2 --think 0.01 --ramp 0 --books 2 --book-pages 2 "
+            f"--latency 0 --char-latency 0 --workers 1 --out {out}".split()
+        )
+        self.assertEqual(result["errors"], {})
+        self.assertEqual(result["pages"], 6)
+        self.assertLessEqual(result["p50_s"], result["p99_s"])
+        self.assertTrue(out.is_file())
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
@@ -0,0 +1,62 @@
+"""
+Тесты асинхронного бота."""
+
+import os
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import TestCase, mock
+import main_async
+from core.engine import Worker
+from core.speakers import PDFSpeaker
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestSpeakText(TestCase):
+    """Тестируем перелистывание страниц."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.file = Path(self.tmp, "temp_user.pdf")
+        shutil.copy(TEST_FILE, self.file)
+        return super().setUp()
+
+    def test_past_end(self):
+        """Страница за концом книги даёт ответ, а не вечное ожидание."""
+
+        worker = Worker(PDFSpeaker(str(self.file), StubSpeaker), page=999)
+        message = SimpleNamespace(chat=SimpleNamespace(id=1, username="user"))
+        with mock.patch.object(
+            main_async.GENERATORS, "get_worker", return_value=worker
+        ), mock.patch.object(
+            main_async.bot, "reply_to", mock.AsyncMock()
+        ) as reply, mock.patch.object(
+            main_async, "menu", mock.AsyncMock()
+        ):
+            asyncio.run(asyncio.wait_for(main_async.speak_text(message), 5))
+        reply.assert_awaited_once_with(message, "Книга закончилась")
+        worker.close()
+
+    def test_simulate(self):
+        """Замер идёт во временном Engine и не оставляет следов в temp бота."""
+
+        before = set(Path(main_async.GENERATORS.temp_path).iterdir())
+        with mock.patch.dict(
+            os.environ,
+            {"speaker_synthetic_latency": "0", "speaker_synthetic_char_latency": "0"},
+        ):
+            result = asyncio.run(main_async.simulate(2, 2, TEST_FILE, "synthetic"))
+        self.assertEqual(result["errors"], {})
+        self.assertEqual(result["pages"], 4)
+        self.assertLessEqual(result["p50_s"], result["p99_s"])
+        self.assertEqual(set(Path(main_async.GENERATORS.temp_path).iterdir()), before)
+        self.assertNotIn("simulated_0", main_async.GENERATORS.sessions)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
@@ -0,0 +1,98 @@
+"""
+Тесты озвучки в память без временных файлов."""
+
+import io
+import os
+import shutil
+import tempfile
+import time
+import wave
+from pathlib import Path
+from unittest import TestCase
+from core.audio import AudioCache
+from core.chunks import join_data
+from core.engine import Worker
+from core.scheduler import Scheduler
+from core.speakers import PDFSpeaker
+from core.voices import AudioData, SynthesisJob, write_to_fp
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestInMemory(TestCase):
+    """Тестируем озвучку в память и запись в кеш в фоне."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        return super().setUp()
+
+    def test_write_to_fp(self):
+        """Генератор без write_to_fp пишет через временный файл."""
+
+        fp = io.BytesIO()
+        write_to_fp(StubSpeaker(), "текст", fp)
+        self.assertEqual(fp.getvalue(), "текст".encode())
+
+    def test_job_in_memory(self):
+        """С in_memory файл озвучки не создаётся."""
+
+        file_name = str(Path(self.tmp, "page.mp3"))
+        job = SynthesisJob(StubSpeaker, "текст", file_name, in_memory=True)
+        audio = job(StubSpeaker())
+        self.assertIsInstance(audio, AudioData)
+        self.assertEqual(audio.data, "текст".encode())
+        self.assertEqual(os.listdir(self.tmp), [])
+        with audio.open() as f:
+            self.assertEqual(f.name, "page.mp3")
+            self.assertEqual(f.read(), audio.data)
+
+    def test_join_data(self):
+        """Куски в памяти склеиваются как файлы."""
+
+        parts = [AudioData(f"{num}.mp3", b"ID3" + bytes([num])) for num in range(3)]
+        self.assertEqual(join_data(parts, "all.mp3").data, b"ID3\x00ID3\x01ID3\x02")
+        waves = []
+        for num in range(3):
+            out = io.BytesIO()
+            with wave.open(out, "wb") as f:
+                f.setparams((1, 2, 8000, 0, "NONE", "not compressed"))
+                f.writeframes(b"\x00\x00" * 100)
+            waves.append(AudioData(f"{num}.wav", out.getvalue()))
+        joined = join_data(waves, "all.wav")
+        with wave.open(io.BytesIO(joined.data), "rb") as f:
+            self.assertEqual(f.getnframes(), 300)
+
+    def test_add_later(self):
+        """Кеш записывает озвучку из памяти в фоне и учитывает её."""
+
+        cache = AudioCache(Path(self.tmp, "audio"))
+        path = cache.path("a" * 64)
+        cache.add_later(AudioData(str(path), b"sound")).result(timeout=5)
+        self.assertEqual(path.read_bytes(), b"sound")
+        self.assertEqual(len(cache), 1)
+
+    def test_worker_in_memory(self):
+        """Ожидаемая страница приходит из памяти, в кеш попадает позже."""
+
+        file = Path(self.tmp, "temp_user.pdf")
+        shutil.copy(TEST_FILE, file)
+        reader = PDFSpeaker(str(file), StubSpeaker, AudioCache(Path(self.tmp, "a")))
+        scheduler = Scheduler(max_workers=2)
+        worker = Worker(reader, scheduler=scheduler, user="user", in_memory=True)
+        try:
+            audio = next(worker)
+            self.assertIsInstance(audio, AudioData)
+            text = reader.page_text(0)
+            self.assertEqual(audio.data, text.encode())
+            deadline = time.monotonic() + 5
+            while reader.cached(text) is None:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+        finally:
+            scheduler.shutdown()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
@@ -0,0 +1,85 @@
+"""
+Тесты метрик."""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from urllib.request import urlopen
+from core.metrics import (
+    STAGE_SECONDS,
+    Counter,
+    Histogram,
+    MetricsServer,
+    Registry,
+    Stats,
+    summary,
+)
+from core.speakers import PDFSpeaker
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestMetrics(TestCase):
+    """Тестируем формат Prometheus и замеры этапов."""
+
+    def test_render(self):
+        registry = Registry()
+        hist = registry.register(Histogram("h", "время", ("stage",), (0.1, 1)))
+        hist.observe(0.05, stage="a")
+        hist.observe(0.5, stage="a")
+        registry.register(Counter("c_total", "ошибки", ("stage",))).inc(stage='x"y')
+        registry.register(Stats("s", "кеш", lambda: {"hits": 2, "name": "skip"}))
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE h histogram", lines)
+        self.assertIn('h_bucket{stage="a",le="0.1"} 1', lines)
+        self.assertIn('h_bucket{stage="a",le="1"} 2', lines)
+        self.assertIn('h_count{stage="a"} 2', lines)
+        self.assertIn('c_total{stage="x\\"y"} 1', lines)
+        self.assertIn("# TYPE s_hits gauge", lines)
+        self.assertIn("s_hits 2", lines)
+        self.assertFalse(any(line.startswith("s_name") for line in lines))
+
+    def test_stages(self):
+        """Разбор, извлечение, страница и озвучка попадают в гистограмму."""
+
+        tmp = tempfile.mkdtemp()
+        try:
+            file = Path(tmp, "temp_metrics.pdf")
+            file.write_bytes(Path(TEST_FILE).read_bytes() + b"\n% metrics\n")
+            reader = PDFSpeaker(str(file), StubSpeaker)
+            labels = {"speaker": "StubSpeaker", "reader": ".pdf"}
+            before = STAGE_SECONDS.count(stage="page", **labels)
+            reader[0]
+            self.assertEqual(STAGE_SECONDS.count(stage="page", **labels), before + 1)
+            self.assertGreater(STAGE_SECONDS.count(stage="synthesis", **labels), 0)
+            self.assertGreater(STAGE_SECONDS.count(stage="parse", reader=".pdf"), 0)
+            self.assertGreater(STAGE_SECONDS.count(stage="extract", reader=".pdf"), 0)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_server(self):
+        server = MetricsServer(port=0)
+        server.start()
+        try:
+            with urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+                body = response.read().decode()
+            self.assertIn("speaker_stage_seconds", body)
+            self.assertNotIn("_bucket", summary())
+        finally:
+            server.stop()
+
+    def test_port_busy(self):
+        """Занятый порт не роняет бота, сервер просто не запускается."""
+
+        server = MetricsServer(port=0)
+        server.start()
+        try:
+            busy = MetricsServer(port=server.port)
+            with self.assertLogs("core.metrics", "ERROR"):
+                busy.start()
+            busy.stop()
+        finally:
+            server.stop()
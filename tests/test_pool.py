@@ -0,0 +1,89 @@
+"""
+Тесты пула генераторов голоса."""
+
+import threading
+from unittest import TestCase
+from core.voices import PooledSpeaker, SpeakerPool, speaker_params
+
+
+class Counted:
+    """Генератор голоса который считает созданные экземпляры и потоки."""
+
+    created: int = 0
+    thread_safe: bool = True
+
+    def __init__(self, speed: int = 100) -> None:
+        Counted.created += 1
+        self.speed = speed
+        self.threads: set[int] = {threading.get_ident()}
+
+    def save_to_file(self, text: str, file_name: str):
+        self.threads.add(threading.get_ident())
+        return self.threads
+
+
+class Pinned(Counted):
+    """Генератор голоса который нельзя вызывать из разных потоков."""
+
+    thread_safe: bool = False
+
+
+class TestSpeakerPool(TestCase):
+    """Тестируем пул генераторов голоса."""
+
+    def setUp(self) -> None:
+        Counted.created = 0
+        self.pool = SpeakerPool(size=2)
+        return super().setUp()
+
+    def test_params(self):
+        """Настройки дополняются значениями по умолчанию."""
+
+        self.assertEqual(speaker_params(Counted), {"speed": 100})
+        self.assertEqual(speaker_params(Counted, {"speed": 1}), {"speed": 1})
+        self.assertEqual(PooledSpeaker(Counted).params, {"speed": 100})
+
+    def test_warm_and_reuse(self):
+        """Прогретый генератор используется без создания нового."""
+
+        self.assertEqual(self.pool.warm(Counted), 1)
+        for _ in range(3):
+            with self.pool.checkout(Counted, {"speed": 100}):
+                pass
+        self.assertEqual(Counted.created, 1)
+        with self.pool.checkout(Counted) as first:
+            with self.pool.checkout(Counted) as second:
+                self.assertIsNot(first, second)
+        self.assertEqual(Counted.created, 2)
+        self.assertEqual(self.pool.stats()["idle"], 2)
+
+    def test_pinned_thread(self):
+        """Не потокобезопасный генератор всегда вызывается из своего потока."""
+
+        results = []
+
+        def speak():
+            with self.pool.checkout(Pinned) as engine:
+                results.append(engine.save_to_file("text", "file.mp3"))
+
+        speak()
+        thread = threading.Thread(target=speak)
+        thread.start()
+        thread.join()
+        self.assertEqual(len(results[-1]), 1)
+        self.assertNotIn(threading.get_ident(), results[-1])
+
+    def test_pinned_serialized(self):
+        """
+        Не потокобезопасный генератор один на настройки, и все его
+        экземпляры вызываются из одного потока по очереди.
+        """
+
+        with self.pool.checkout(Pinned) as engine:
+            threads = engine.save_to_file("text", "file.mp3")
+        with self.pool.checkout(Pinned, {"speed": 200}) as other:
+            threads |= other.save_to_file("text", "file.mp3")
+        self.assertEqual(len(threads), 1)
+        self.assertEqual(self.pool.limit(Pinned), 1)
+        self.assertEqual(self.pool.limit(Counted), 2)
+        self.assertEqual(self.pool.warm(Pinned, count=2), 1)
@@ -0,0 +1,62 @@
+"""
+Тесты профилирования медленных запросов."""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from core.index import file_hash
+from core.profiling import Profiler
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestProfiler(TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_disabled(self):
+        profiler = Profiler(self.root, threshold=0)
+        with profiler.profile("page", "user", TEST_FILE, 1):
+            sum(range(1000))
+        self.assertEqual(profiler.dumps, 0)
+        self.assertEqual(list(self.root.iterdir()), [])
+
+    def test_dump(self):
+        profiler = Profiler(self.root, threshold=0, enabled=True)
+        try:
+            with profiler.profile("page", "user", TEST_FILE, 3):
+                sum(range(1000))
+        finally:
+            profiler.disable()
+        self.assertEqual(profiler.dumps, 1)
+        (prof,) = self.root.glob("*.prof")
+        self.assertIn("_page_user_", prof.name)
+        self.assertIn(file_hash(TEST_FILE)[:16], prof.name)
+        self.assertIn("_p3_", prof.name)
+        text = prof.with_suffix(".txt").read_text(encoding="utf-8")
+        self.assertIn("page: 3", text)
+        self.assertIn("memory_peak_bytes", text)
+
+    def test_fast_request(self):
+        profiler = Profiler(self.root, threshold=60, enabled=True)
+        try:
+            with profiler.profile("page", "user"):
+                pass
+        finally:
+            profiler.disable()
+        self.assertEqual(profiler.dumps, 0)
+
+    def test_nested(self):
+        profiler = Profiler(self.root, threshold=0, enabled=True)
+        try:
+            with profiler.profile("page", "user"):
+                with profiler.profile("synthesis", tag="inner"):
+                    pass
+        finally:
+            profiler.disable()
+        self.assertEqual(profiler.dumps, 1)
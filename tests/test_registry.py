@@ -0,0 +1,89 @@
+"""
+Тесты ленивого реестра обработчиков."""
+
+import sys
+import subprocess
+from pathlib import Path
+from unittest import TestCase, mock
+from core.engine import find_or_default
+from core.registry import LazyRegistry, load_object
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestLazyRegistry(TestCase):
+    def test_lazy_import(self):
+        registry = LazyRegistry({"stub": "tests.test_registry:TestLazyRegistry"})
+        self.assertEqual(list(registry), ["stub"])
+        self.assertIn("stub", registry)
+        self.assertEqual(registry.loaded(), [])
+        self.assertIs(registry["stub"], TestLazyRegistry)
+        self.assertEqual(registry.loaded(), ["stub"])
+
+    def test_unavailable(self):
+        registry = LazyRegistry({"broken": "no_such_module_here:Speaker", "ok": 1})
+        self.assertIn("broken", registry)
+        self.assertIsNone(registry.get("broken"))
+        with self.assertRaises(KeyError):
+            registry["missing"]
+        self.assertEqual(registry["ok"], 1)
+
+    def test_failed_hidden(self):
+        """Неудачный импорт запоминается и не повторяется."""
+
+        registry = LazyRegistry({"broken": "no_such_module_here:Speaker", "ok": 1})
+        with mock.patch("core.registry.load_object", side_effect=ImportError) as load:
+            self.assertIsNone(registry.get("broken"))
+            self.assertIsNone(registry.get("broken"))
+            load.assert_called_once()
+        self.assertNotIn("broken", registry)
+        self.assertEqual(list(registry), ["ok"])
+        self.assertEqual(len(registry), 1)
+        self.assertEqual(registry.failed(), ["broken"])
+
+    def test_find_or_default(self):
+        """Если недоступен и обработчик по умолчанию, берём первый рабочий."""
+
+        registry = LazyRegistry(
+            {"broken": "no_such_module_here:Speaker", "ok": 1, "other": 2}
+        )
+        self.assertEqual(find_or_default(registry, "other", "broken"), 2)
+        self.assertEqual(find_or_default(registry, "missing", "ok"), 1)
+        self.assertEqual(find_or_default(registry, "missing", "broken"), 1)
+        with self.assertRaises(KeyError):
+            find_or_default(LazyRegistry({"broken": "no_such:X"}), "x", "broken")
+
+    def test_load_object(self):
+        self.assertIs(load_object("pathlib:Path"), Path)
+        self.assertEqual(load_object("pathlib:Path.cwd"), Path.cwd)
+
+    def test_entry_points(self):
+        point = mock.Mock(group="speaker.speakers", load=lambda: "plugin")
+        point.name = "plugin"
+        builtin = mock.Mock(group="speaker.speakers")
+        builtin.name = "own"
+        with mock.patch(
+            "core.registry.entry_points", return_value=[point, builtin]
+        ) as found:
+            registry = LazyRegistry({"own": 1}, group="speaker.speakers")
+            self.assertEqual(list(registry), ["own", "plugin"])
+            self.assertEqual(registry["plugin"], "plugin")
+            self.assertEqual(registry["own"], 1)
+            found.assert_called_once_with(group="speaker.speakers")
+
+    def test_engine_startup(self):
+        """Импорт бота не тянет движки синтеза и разбора pdf."""
+
+        code = (
+            "import sys, core.engine\n"
+            "print(sorted({'pyttsx3', 'gtts', 'PyPDF2'} & set(sys.modules)))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
@@ -0,0 +1,151 @@
+"""
+Тесты планировщика озвучки."""
+
+import os
+import shutil
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from unittest import TestCase
+from core.audio import AudioCache
+from core.engine import Worker
+from core.scheduler import Priority, Scheduler
+from core.speakers import PDFSpeaker
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestScheduler(TestCase):
+    """Тестируем очереди планировщика."""
+
+    def setUp(self) -> None:
+        self.gate = threading.Event()
+        self.order: list[str] = []
+        self.scheduler = Scheduler(1, ThreadPoolExecutor(1))
+        # Занимаем единственный поток пока ставим задачи в очередь.
+        self.first = self.scheduler.submit("blocker", Priority.BATCH, self.gate.wait)
+        return super().setUp()
+
+    def run_all(self, futures: list) -> None:
+        self.gate.set()
+        for future in futures:
+            future.result(timeout=5)
+
+    def test_round_robin(self):
+        """Пользователи обслуживаются по очереди."""
+
+        futures = [
+            self.scheduler.submit(user, Priority.PREFETCH, self.order.append, user)
+            for user in ("a", "a", "a", "b", "c")
+        ]
+        self.run_all(futures)
+        self.assertEqual(self.order, ["a", "b", "c", "a", "a"])
+
+    def test_priority(self):
+        """Запросы пользователя важнее чтения наперёд."""
+
+        futures = [
+            self.scheduler.submit("a", Priority.BATCH, self.order.append, "batch"),
+            self.scheduler.submit("a", Priority.PREFETCH, self.order.append, "ahead"),
+            self.scheduler.submit("b", Priority.INTERACTIVE, self.order.append, "now"),
+        ]
+        self.assertTrue(self.scheduler.promote(futures[0], Priority.INTERACTIVE))
+        self.run_all(futures)
+        self.assertEqual(self.order, ["now", "batch", "ahead"])
+
+    def test_job_stats(self):
+        """У задачи есть глубина очереди, ожидание и выполнение."""
+
+        future = self.scheduler.submit("a", Priority.INTERACTIVE, len, "abc", then=str)
+        self.assertEqual(future.job.depth, 0)
+        self.run_all([future])
+        self.assertEqual(future.result(), "3")
+        self.assertGreaterEqual(future.job.wait, 0)
+        self.assertGreaterEqual(self.first.job.run, 0)
+        self.assertEqual(self.scheduler.stats()["finished"], 2)
+
+    def test_cancel(self):
+        """Отменённая задача не выполняется."""
+
+        future = self.scheduler.submit("a", Priority.PREFETCH, self.order.append, 1)
+        self.assertTrue(future.cancel())
+        self.run_all([])
+        self.first.result(timeout=5)
+        self.assertEqual(self.order, [])
+
+    def tearDown(self) -> None:
+        self.gate.set()
+        self.scheduler.shutdown()
+        return super().tearDown()
+
+
+def crash() -> None:
+    """Процесс пула падает как при segfault движка синтеза."""
+
+    os._exit(1)
+
+
+def mark_started(path: str) -> None:
+    """Initializer процесса пула: отмечаем что он запущен."""
+
+    Path(path, str(os.getpid())).touch()
+
+
+class TestWorkerScheduler(TestCase):
+    """Озвучка страниц обработчиком через пул процессов."""
+
+    def test_pages_in_processes(self):
+        tmp = tempfile.mkdtemp()
+        file = Path(tmp, "temp_user.pdf")
+        shutil.copy(TEST_FILE, file)
+        scheduler = Scheduler(max_workers=2)
+        reader = PDFSpeaker(str(file), StubSpeaker, AudioCache(Path(tmp, "audio")))
+        worker = Worker(reader, read_ahead=2, scheduler=scheduler, user="user")
+        try:
+            self.assertIn("Страница 0", next(worker).read_text())
+            self.assertIn("Страница 1", next(worker).read_text())
+            self.assertEqual(worker.stats["missed"], 1)
+        finally:
+            worker.close()
+            scheduler.shutdown()
+            shutil.rmtree(tmp)
+
+    def test_crashed_process(self):
+        """Упавший процесс роняет только свою задачу, пул создаётся заново."""
+
+        scheduler = Scheduler(max_workers=1)
+        try:
+            self.assertEqual(
+                scheduler.submit("a", Priority.BATCH, abs, -1).result(timeout=30), 1
+            )
+            crashed = scheduler.submit("a", Priority.INTERACTIVE, crash)
+            with self.assertRaises(BrokenProcessPool):
+                crashed.result(timeout=30)
+            after = [
+                scheduler.submit(user, Priority.INTERACTIVE, abs, -num)
+                for num, user in enumerate("abc")
+            ]
+            self.assertEqual([f.result(timeout=30) for f in after], [0, 1, 2])
+        finally:
+            scheduler.shutdown()
+
+    def test_start(self):
+        """start поднимает и прогревает процессы пула до первой задачи."""
+
+        tmp = tempfile.mkdtemp()
+        scheduler = Scheduler(max_workers=2, initializer=mark_started, initargs=(tmp,))
+        try:
+            scheduler.start()
+            deadline = time.monotonic() + 30
+            while not os.listdir(tmp):
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+            self.assertEqual(scheduler.running, 0)
+        finally:
+            scheduler.shutdown()
+            shutil.rmtree(tmp)
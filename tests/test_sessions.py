@@ -0,0 +1,137 @@
+"""
+Тесты таблицы сессий."""
+
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+from core.engine import Engine
+from core.sessions import Session, SessionStore, SessionTable
+from core.voices import speaker_type
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+TEST_USER = "test_sessions_user"
+
+
+class Closable:
+    """Обработчик который помнит что его закрыли."""
+
+    closed: bool = False
+    page: int = 0
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class TestSessionStore(TestCase):
+    """Тестируем вытеснение сессий."""
+
+    def test_lru(self):
+        """Сверх лимита вытесняется давно не использованная сессия."""
+
+        evicted: list[str] = []
+        store = SessionStore(max_sessions=2, on_evict=lambda n, w: evicted.append(n))
+        workers = {name: Closable() for name in "abc"}
+        store["a"], store["b"] = workers["a"], workers["b"]
+        store["a"]
+        store["c"] = workers["c"]
+        self.assertEqual(evicted, ["b"])
+        self.assertTrue(workers["b"].closed)
+        self.assertEqual(sorted(store), ["a", "c"])
+        self.assertEqual(store.stats(), {"live": 2, "evictions": 1, "expired": 0})
+
+    def test_ttl(self):
+        """Простаивающая сессия вытесняется по TTL."""
+
+        store = SessionStore(ttl=0.01)
+        store["a"] = Closable()
+        time.sleep(0.02)
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.expired, 1)
+
+
+class TestSessionTable(TestCase):
+    """Описания сессий в SQLite."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.path = Path(self.tmp, "sessions.sqlite")
+        return super().setUp()
+
+    def test_persist(self):
+        """Описание переживает переоткрытие базы."""
+
+        table = SessionTable(self.path)
+        table["a"] = Session("gTTS", "pdf", 3)
+        self.assertTrue(table.change("a", page=5))
+        self.assertFalse(table.change("b", page=1))
+        self.assertRaises(ValueError, lambda: table.change("a", size=1))
+        table.close()
+        table = SessionTable(self.path)
+        self.assertEqual(table["a"], Session("gTTS", "pdf", 5))
+        self.assertEqual(list(table), ["a"])
+        del table["a"]
+        self.assertEqual(len(table), 0)
+        self.assertRaises(KeyError, lambda: table["a"])
+        table.close()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
+
+
+class TestEngineSessions(TestCase):
+    """Вытесненный обработчик пересоздаётся при обращении."""
+
+    def setUp(self) -> None:
+        # Свой temp_path: описания сессий лежат в нём между перезапусками.
+        self.tmp = tempfile.mkdtemp()
+        self.eng = Engine(temp_path=self.tmp)
+        self.eng.speakers = {"stub": StubSpeaker}
+        self.eng.read_ahead = 0
+        self.file = Path(self.eng.temp_path, f"temp_{TEST_USER}.pdf")
+        shutil.copy(TEST_FILE, self.file)
+        return super().setUp()
+
+    def test_rehydrate(self):
+        self.assertTrue(self.eng.set_worker(TEST_USER, "stub", page=1))
+        next(self.eng.get_worker(TEST_USER))
+        self.eng.generators.max_sessions = 0
+        self.eng.generators["other"] = Closable()
+        self.assertNotIn(TEST_USER, self.eng.generators)
+        self.eng.generators.max_sessions = 10
+        worker = self.eng.get_worker(TEST_USER)
+        self.assertEqual(worker.page, 2)
+        self.assertIs(speaker_type(worker.reader.get_engine), StubSpeaker)
+        self.assertRaises(KeyError, lambda: self.eng.get_worker("name"))
+
+    def test_restart(self):
+        """После перезапуска обработчик пересоздаётся с той же страницы."""
+
+        self.assertTrue(self.eng.set_worker(TEST_USER, "stub", page=1))
+        worker = self.eng.get_worker(TEST_USER)
+        text = worker.reader.page_text(1)
+        next(worker)
+        restarted = Engine(temp_path=self.tmp)
+        restarted.speakers = {"stub": StubSpeaker}
+        try:
+            worker = restarted.get_worker(TEST_USER)
+            self.assertEqual(worker.page, 2)
+            self.assertIsNotNone(worker.reader.cached(text))
+            # Книгу убрали, пока обработчика не было в памяти.
+            restarted.remove_document(TEST_USER)
+            del restarted.generators[TEST_USER]
+            self.assertRaises(KeyError, lambda: restarted.get_worker(TEST_USER))
+            self.assertNotIn(TEST_USER, restarted.sessions)
+        finally:
+            restarted.scheduler.shutdown()
+            restarted.sessions.close()
+
+    def tearDown(self) -> None:
+        self.eng.scheduler.shutdown()
+        self.eng.sessions.close()
+        shutil.rmtree(self.tmp)
+        return super().tearDown()
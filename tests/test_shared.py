@@ -0,0 +1,31 @@
+"""
+Тесты замера памяти процессов с общей книгой."""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, skipUnless
+import PyPDF2
+from benchmarks.shared import SMAPS, make_large_book, measure
+
+
+@skipUnless(SMAPS.exists(), "нужен /proc/self/smaps_rollup")
+class TestShared(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.book = make_large_book(16, Path(self.tmp, "large.pdf"), pages=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_make_large_book(self):
+        self.assertGreater(self.book.stat().st_size, 16 * 1024 * 1024)
+        self.assertEqual(len(PyPDF2.PdfReader(self.book).pages), 2)
+
+    def test_mmap_not_copied(self):
+        """С mmap процесс не держит свою копию книги."""
+
+        mapped = measure(self.book, 2, use_mmap=True)
+        copied = measure(self.book, 2, use_mmap=False)
+        self.assertEqual(mapped["processes"], 2)
+        self.assertGreater(copied["mean_private_mb"] - mapped["mean_private_mb"], 8)
@@ -0,0 +1,42 @@
+"""
+Тесты потоковой загрузки файлов."""
+
+import os
+import shutil
+import hashlib
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from core.index import file_hash
+from core.uploads import UploadTooLarge, save_stream
+
+
+class TestUploads(TestCase):
+    """Тестируем запись загрузки на диск."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.file_name = Path(self.tmp, "upload.pdf")
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        return super().tearDown()
+
+    def test_save_stream(self):
+        """Файл записан целиком, хеш посчитан по ходу записи и запомнен."""
+
+        chunks = [b"%PDF-", b"upload " * 1000, b"%%EOF"]
+        digest = save_stream(iter(chunks), self.file_name)
+        data = b"".join(chunks)
+        self.assertEqual(self.file_name.read_bytes(), data)
+        self.assertEqual(digest, hashlib.sha256(data).hexdigest())
+        self.assertEqual(file_hash(self.file_name), digest)
+
+    def test_too_large(self):
+        """Большой файл отбрасывается и не оставляет следов."""
+
+        with self.assertRaises(UploadTooLarge):
+            save_stream(iter([b"x" * 10, b"x" * 10]), self.file_name, max_bytes=15)
+        self.assertFalse(self.file_name.exists())
+        self.assertEqual(os.listdir(self.tmp), [])
@@ -0,0 +1,95 @@
+"""
+Тесты чтения наперёд обработчика пользователя."""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+from core.audio import AudioCache
+from core.engine import Worker
+from core.index import PageIndex
+from core.speakers import PDFSpeaker
+from tests.stubs import StubSpeaker
+
+
+TEST_FILE = str(Path(__file__).resolve().with_name("test.pdf"))
+
+
+class TestWorker(TestCase):
+    """Тестируем итерацию по страницам с чтением наперёд."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.mkdtemp()
+        self.file = Path(self.tmp, "temp_user.pdf")
+        shutil.copy(TEST_FILE, self.file)
+        self.cache = AudioCache(Path(self.tmp, "audio"))
+        return super().setUp()
+
+    def reader(self) -> PDFSpeaker:
+        return PDFSpeaker(str(self.file), StubSpeaker, self.cache)
+
+    def test_read_ahead(self):
+        """Следующие страницы озвучиваются в фоне."""
+
+        worker = Worker(self.reader(), page=0, read_ahead=2)
+        first = next(worker)
+        self.assertEqual(worker.stats["missed"], 1)
+        second = next(worker)
+        self.assertNotEqual(first, second)
+        self.assertEqual(worker.stats["missed"], 1)
+        self.assertEqual(worker.stats["ready"] + worker.stats["waited"], 1)
+        self.assertIn("Страница 1", second.read_text())
+        worker.close()
+
+    def test_without_cache(self):
+        """Без кеша озвучки чтение наперёд выключено."""
+
+        worker = Worker(PDFSpeaker(str(self.file), StubSpeaker), read_ahead=2)
+        self.assertFalse(worker.prefetching)
+        self.assertEqual(next(worker), worker.reader.file_name_mp3)
+
+    def test_seek_cancels(self):
+        """Переход на другую страницу отменяет чтение наперёд."""
+
+        worker = Worker(self.reader(), page=0, read_ahead=2)
+        next(worker)
+        worker.page = 3
+        self.assertIn("Страница 3", next(worker).read_text())
+        self.assertEqual(worker.stats["missed"], 2)
+        worker.close()
+
+    def test_batch(self):
+        """Короткие страницы подряд озвучиваются одним файлом."""
+
+        worker = Worker(self.reader(), read_ahead=2, batch_chars=16)
+        self.assertEqual(worker.span(0), range(0, 2))
+        first = next(worker).read_text()
+        self.assertIn("Страница 0", first)
+        self.assertIn("Страница 1", first)
+        self.assertEqual(worker.page, 2)
+        self.assertIn("Страница 3", next(worker).read_text())
+        self.assertEqual(worker.page, 4)
+        self.assertEqual(worker.stats["missed"], 1)
+        worker.close()
+
+    def test_batch_skips_empty(self):
+        """Пустые страницы не озвучиваются и не занимают места в пачке."""
+
+        path = Path(self.tmp, "book.index.sqlite")
+        PageIndex.write(path, "digest", ["one", "", "", "two", "long" * 10, ""])
+        index = PageIndex(path, "digest")
+        reader = self.reader()
+        with mock.patch.object(PDFSpeaker, "index", index):
+            self.assertEqual(reader.batch(0, 10), range(0, 4))
+            self.assertEqual(reader.batch(4, 10), range(4, 6))
+            self.assertEqual(reader.batch(5, 10), range(5, 6))
+            text = reader.batch_text(range(0, 4))
+            self.assertEqual(text, "Страница 0 \n one\nСтраница 3 \n two")
+            self.assertIn("пусты", reader.batch_text(range(1, 3)))
+            self.assertEqual(reader.batch_text(range(5, 6)), "Страница 5 пуста.")
+            self.assertEqual(reader.batch_text(range(3, 4)), reader.page_text(3))
+        index.close()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmp)
+        return super().tearDown()